@@ -1,6 +1,31 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+# argv[0] of management commands: manage.py, django-admin and python -m django
+MANAGEMENT_SCRIPTS = ("manage.py", "django-admin", "__main__.py")
+
+
+def _serves_requests(argv):
+    """False for management commands (migrate, test, run_ingest_worker...) and the runserver autoreloader."""
+    if os.path.basename(argv[0]) not in MANAGEMENT_SCRIPTS:
+        return True
+    if argv[1:2] != ["runserver"]:
+        return False
+    # The autoreloader's parent only watches files; the child it starts serves
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in argv
 
 
 class JobroleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app.jobrole'
+
+    def ready(self):
+        # Jobs queued before a restart are picked up without waiting for the next enqueue. Under a
+        # preloading server the thread does not survive the fork; enqueue then starts it per worker
+        if settings.INGEST_QUEUE_LOCAL_WORKER and _serves_requests(sys.argv):
+            from app.jobrole.tasks import start_local_worker
+            start_local_worker()
@@ -0,0 +1,159 @@
+"""
+Native async counterparts of the jobrole API for ASGI deployments.
+Upstream LLM calls are awaited on the event loop and CPU-bound embedding/FAISS work
+runs on a bounded executor, so one worker can serve many concurrent searches.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+
+from app.global_constants import ErrorMessage
+from app.jobrole.pipeline import asearch_jobs_for_resume, astream_jobs_for_resume, run_cpu_bound
+from app.jobrole.serializers import JobRoleSerializer, IngestJobSerializer
+from app.jobrole.tasks import enqueue_job_description
+from app.langchain_utils.aggregation import AGGREGATION_STRATEGIES
+from app.langchain_utils.search import hybrid_search, FUSION_METHODS
+from app.utils import get_json_response_schema, get_event_response_schema
+
+logger = logging.getLogger('django')
+
+
+def _parse_json_body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class AsyncStoreJobRoleView(View):
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        data = _parse_json_body(request)
+        if data is None:
+            return get_json_response_schema({}, "Request body must be a JSON object", status.HTTP_400_BAD_REQUEST)
+
+        title = data.get("title")
+        description = data.get("description")
+        metadata = data.get("metadata") or {}
+
+        if not title or not description:
+            return get_json_response_schema({}, "Title and description are required", status.HTTP_400_BAD_REQUEST)
+        if not isinstance(metadata, dict):
+            return get_json_response_schema({}, "Metadata must be an object", status.HTTP_400_BAD_REQUEST)
+
+        # Validated before enqueueing, so rejected descriptions never reach a worker
+        serializer = JobRoleSerializer(data={
+            "title": title,
+            "description": description
+        })
+        if not serializer.is_valid():
+            return get_json_response_schema(serializer.errors, "Validation failed", status.HTTP_400_BAD_REQUEST)
+
+        # Extraction, embedding and indexing run on an ingest worker, as for StoreJobRoleApiView
+        job = await sync_to_async(enqueue_job_description)(title, description, metadata)
+        return get_json_response_schema(IngestJobSerializer(job).data, "JobRole queued for ingestion",
+                                        status.HTTP_202_ACCEPTED)
+
+
+class AsyncHybridSearchView(View):
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        data = _parse_json_body(request)
+        if data is None:
+            return get_json_response_schema({}, "Request body must be a JSON object", status.HTTP_400_BAD_REQUEST)
+
+        query = data.get("query")
+        target = data.get("target")
+        top_k = int(data.get("top_k", 5))
+        alpha = float(data.get("alpha", settings.HYBRID_SEARCH_ALPHA))
+        fusion = data.get("fusion", settings.HYBRID_SEARCH_FUSION)
+        filters = data.get("filters") or {}
+        nprobe = data.get("nprobe")
+        ef_search = data.get("ef_search")
+        aggregation = data.get("aggregation", settings.SEARCH_AGGREGATION)
+
+        nprobe = int(nprobe) if nprobe else None
+        ef_search = int(ef_search) if ef_search else None
+
+        if not isinstance(filters, dict):
+            return get_json_response_schema({}, "Filters must be an object", status.HTTP_400_BAD_REQUEST)
+
+        if not query or target not in ["resume", "job"] or not 0 <= alpha <= 1 or fusion not in FUSION_METHODS \
+                or aggregation not in AGGREGATION_STRATEGIES:
+            return get_json_response_schema({}, "Invalid or missing parameters", status.HTTP_400_BAD_REQUEST)
+
+        results = await run_cpu_bound(hybrid_search, query, top_k, target, alpha, fusion, filters,
+                                      nprobe, ef_search, aggregation)
+        return get_json_response_schema(results, f"Top {top_k} matches retrieved", status.HTTP_200_OK)
+
+
+class AsyncCandidateSearchFromResumeTextView(View):
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        data = _parse_json_body(request)
+        if data is None:
+            return get_json_response_schema({}, "Request body must be a JSON object", status.HTTP_400_BAD_REQUEST)
+
+        resume_text = data.get("resume_text")
+        top_k = int(data.get("top_k", 5))
+
+        if not resume_text:
+            return get_json_response_schema({}, "Resume text is required", status.HTTP_400_BAD_REQUEST)
+
+        results, included_titles, timings = await asearch_jobs_for_resume(resume_text, top_k=top_k)
+
+        response = get_json_response_schema(results, f"Top {top_k} matching job roles retrieved", status.HTTP_200_OK)
+        response["Server-Timing"] = timings.as_header()
+        return response
+
+
+class AsyncCandidateSearchStreamView(View):
+    """
+    Server-Sent Events variant of the resume search. Each stage is sent as soon as it is ready,
+    in the standard response envelope: sections, titles, hits (before the title filter),
+    results, then timings. A failure mid-stream ends it with an error event.
+    """
+    http_method_names = ["post"]
+
+    EVENT_MESSAGES = {
+        "sections": "Relevant sections extracted",
+        "titles": "Job titles inferred",
+        "hits": "First matching job roles retrieved",
+        "results": "Matching job roles retrieved",
+        "timings": "Search completed",
+    }
+
+    async def post(self, request):
+        data = _parse_json_body(request)
+        if data is None:
+            return get_json_response_schema({}, "Request body must be a JSON object", status.HTTP_400_BAD_REQUEST)
+
+        resume_text = data.get("resume_text")
+        top_k = int(data.get("top_k", 5))
+
+        if not resume_text:
+            return get_json_response_schema({}, "Resume text is required", status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(self._events(resume_text, top_k), content_type="text/event-stream")
+        # Keep proxies from buffering the stream
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def _events(self, resume_text, top_k):
+        try:
+            async for event, results in astream_jobs_for_resume(resume_text, top_k=top_k):
+                yield get_event_response_schema(event, results, self.EVENT_MESSAGES[event], status.HTTP_200_OK)
+        except Exception:
+            logger.error("Streaming resume search failed", exc_info=True)
+            yield get_event_response_schema("error", {}, ErrorMessage.SOMETHING_WENT_WRONG.value,
+                                            status.HTTP_500_INTERNAL_SERVER_ERROR)
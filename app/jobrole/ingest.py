@@ -0,0 +1,139 @@
+import csv
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import transaction
+
+from app.jobrole.models import JobRole, vector_fields
+from app.jobrole.serializers import JobRoleIngestSerializer
+from app.jobrole.utils import extract_relevant_sections_with_llm
+from app.langchain_utils.store import iter_document_chunks, store_documents
+from app.langchain_utils.vectorstore import embedding_model
+
+logger = logging.getLogger('django')
+
+INGEST_FORMATS = ("jsonl", "csv")
+
+
+class StageTimer:
+    """Accumulates wall time and item counts per ingestion stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def record(self, stage, seconds, items):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "items": 0})
+        entry["seconds"] += seconds
+        entry["items"] += items
+
+    def report(self):
+        stages = {}
+        for stage, entry in self.stages.items():
+            stages[stage] = {
+                "seconds": round(entry["seconds"], 3),
+                "items": entry["items"],
+                "items_per_second": round(entry["items"] / entry["seconds"], 2) if entry["seconds"] else None,
+            }
+        return {"total_seconds": round(time.perf_counter() - self.started, 3), "stages": stages}
+
+
+def parse_job_description_stream(stream, fmt, fields=("title", "description")):
+    """
+    Yields (line_number, row) pairs from a JSONL or CSV text stream.
+    CSV columns other than fields (title and description by default) are collected into metadata.
+    """
+    if fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+    elif fmt == "csv":
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            values = {field: row.pop(field, None) for field in fields}
+            metadata = {key: value for key, value in row.items() if key and value not in (None, "")}
+            yield line_number, {**values, "metadata": metadata}
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(INGEST_FORMATS)}")
+
+
+def extract_sections(texts, timer, llm_workers):
+    # LLM extraction is network bound, so it runs concurrently within the batch
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=llm_workers) as executor:
+        relevant_texts = list(executor.map(extract_relevant_sections_with_llm, texts))
+    timer.record("llm", time.perf_counter() - start, len(relevant_texts))
+    return relevant_texts
+
+
+def _ingest_batch(batch, timer, llm_workers):
+    relevant_texts = extract_sections([item["description"] for item in batch], timer, llm_workers)
+
+    # Chunks stream into fixed-size embedding calls while later descriptions are still being split
+    start = time.perf_counter()
+    chunk_docs = (
+        doc
+        for item, relevant_text in zip(batch, relevant_texts)
+        for doc in iter_document_chunks(relevant_text,
+                                        {**item.get("metadata", {}), "type": "job", "title": item["title"]})
+    )
+    chunk_count = store_documents(chunk_docs)
+    timer.record("chunk_embed_index", time.perf_counter() - start, chunk_count)
+
+    start = time.perf_counter()
+    description_embeddings = embedding_model.embed_documents([item["description"] for item in batch])
+    timer.record("embed", time.perf_counter() - start, len(batch))
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        JobRole.objects.bulk_create([
+            JobRole(
+                title=item["title"],
+                description=item["description"],
+                **vector_fields(vector),
+            )
+            for item, vector in zip(batch, description_embeddings)
+        ])
+    timer.record("db", time.perf_counter() - start, len(batch))
+
+
+def ingest_rows(rows, serializer_class, ingest_batch, batch_size=64, llm_workers=4, max_errors=100, label="rows"):
+    """
+    Validates an iterable of (line_number, row) pairs with serializer_class and passes each
+    batch of valid rows to ingest_batch(batch, timer, llm_workers).
+    Invalid rows are reported instead of aborting the run.
+    """
+    timer = StageTimer()
+    stored = 0
+    failed = 0
+    errors = []
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+
+        batch = []
+        for line_number, row in chunk:
+            serializer = serializer_class(data=row)
+            if serializer.is_valid():
+                batch.append(serializer.validated_data)
+                continue
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({"line": line_number, "errors": serializer.errors})
+
+        if batch:
+            ingest_batch(batch, timer, llm_workers)
+            stored += len(batch)
+            logger.info(f"Ingested {stored} {label} so far")
+
+    return {"stored": stored, "failed": failed, "errors": errors, **timer.report()}
+
+
+def ingest_job_descriptions(rows, batch_size=64, llm_workers=4, max_errors=100):
+    return ingest_rows(rows, JobRoleIngestSerializer, _ingest_batch, batch_size=batch_size, llm_workers=llm_workers,
+                       max_errors=max_errors, label="job descriptions")
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger('django')
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMResultCache:
+    """
+    TTL + LRU cache for LLM completions, persisted to SQLite so results survive restarts.
+
+    Concurrent misses for the same key are coalesced: the first caller computes the
+    result and every other caller waits for it, so a burst of identical prompts
+    produces a single upstream call.
+    """
+
+    def __init__(self, cache_path: str = None, ttl_seconds: float = 7 * 24 * 3600,
+                 memory_entries: int = 2000, disk_entries: int = 100000):
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._local = threading.local()
+        self._inserts_since_trim = 0
+        self._schema_ready = False
+
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "expired": 0}
+
+    def _connection(self):
+        # SQLite connections cannot be shared across threads. Opened on first use, so importing the
+        # cache (e.g. for manage.py migrate) creates no files
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if not self._schema_ready:
+                os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.cache_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            if not self._schema_ready:
+                with connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                        "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS llm_results_last_access ON llm_results (last_access)")
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def _memory_get(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._memory[key]
+            self._metrics["expired"] += 1
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        if not self.cache_path:
+            return None
+
+        connection = self._connection()
+        row = connection.execute("SELECT value, expires_at FROM llm_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        with connection:
+            if expires_at <= now:
+                connection.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self._metrics["expired"] += 1
+                return None
+            connection.execute("UPDATE llm_results SET last_access = ? WHERE key = ?", (now, key))
+        return value, expires_at
+
+    def _disk_put(self, key, value, expires_at):
+        if not self.cache_path:
+            return
+
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_results (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+
+        self._inserts_since_trim += 1
+        if self._inserts_since_trim >= max(self.disk_entries // 100, 1):
+            self._inserts_since_trim = 0
+            with connection:
+                connection.execute("DELETE FROM llm_results WHERE expires_at <= ?", (now,))
+                connection.execute(
+                    "DELETE FROM llm_results WHERE key IN "
+                    "(SELECT key FROM llm_results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,),
+                )
+
+    def _get_from_memory(self, key):
+        with self._lock:
+            value = self._memory_get(key, time.time())
+        if value is not None:
+            self._metrics["memory_hits"] += 1
+        return value
+
+    def _get_from_disk(self, key):
+        entry = self._disk_get(key, time.time())
+        if entry is None:
+            return None
+        with self._lock:
+            self._memory_put(key, *entry)
+        self._metrics["disk_hits"] += 1
+        return entry[0]
+
+    def get(self, key):
+        value = self._get_from_memory(key)
+        return value if value is not None else self._get_from_disk(key)
+
+    def _set_in_memory(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+        return expires_at
+
+    def set(self, key, value):
+        self._disk_put(key, value, self._set_in_memory(key, value))
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            leader = in_flight is None
+            if leader:
+                in_flight = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            self._metrics["coalesced"] += 1
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        self._metrics["misses"] += 1
+        try:
+            in_flight.result = compute()
+            self.set(key, in_flight.result)
+            return in_flight.result
+        except Exception as exc:
+            in_flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+
+    async def aget_or_compute(self, key, compute):
+        """
+        Async variant of get_or_compute; compute returns an awaitable and concurrent misses share one task.
+        Only the memory tier is read on the event loop; SQLite reads and writes run on a thread.
+        """
+        value = self._get_from_memory(key)
+        if value is None and self.cache_path:
+            value = await asyncio.to_thread(self._get_from_disk, key)
+        if value is not None:
+            return value
+
+        # Futures belong to one event loop, so in-flight calls are tracked per loop
+        flight_key = (id(asyncio.get_running_loop()), key)
+        in_flight = self._async_in_flight.get(flight_key)
+        if in_flight is not None:
+            self._metrics["coalesced"] += 1
+            return await asyncio.shield(in_flight)
+
+        self._metrics["misses"] += 1
+        in_flight = self._async_in_flight[flight_key] = asyncio.ensure_future(compute())
+        try:
+            value = await asyncio.shield(in_flight)
+        finally:
+            self._async_in_flight.pop(flight_key, None)
+
+        expires_at = self._set_in_memory(key, value)
+        if self.cache_path:
+            await asyncio.to_thread(self._disk_put, key, value, expires_at)
+        return value
+
+    def stats(self):
+        return {
+            **self._metrics,
+            "memory_entries": len(self._memory),
+            "in_flight": len(self._in_flight) + len(self._async_in_flight),
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from types import SimpleNamespace
+
+from django.conf import settings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger('django')
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the provider failed after all retries or the circuit breaker is open."""
+
+
+class StubLLMClient:
+    """
+    Offline stand-in for the Groq client with the same chat.completions.create interface.
+    By default it echoes the prompt back; pass a responder to return canned content.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda model, prompt: prompt.strip())
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.calls.append({"model": model, "prompt": prompt})
+        message = SimpleNamespace(content=self.responder(model, prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures and rejects calls until reset_seconds have passed.
+    One trial call is then let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def _is_retryable(exc):
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code in (408, 409, 429) or status_code >= 500
+    # Connection errors and timeouts carry no status code
+    return isinstance(exc, (ConnectionError, TimeoutError)) or \
+        type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class LLMClient:
+    """
+    Process-wide chat completion client.
+    Wraps one pooled provider client with retry/backoff with jitter, a circuit breaker and latency metrics.
+    Async provider clients are bound to the event loop they first ran on, so one is built per running
+    loop by async_client_factory (async_to_sync starts a new loop per call).
+    """
+
+    def __init__(self, client, async_client_factory=None, max_retries=2, backoff_base=0.5, backoff_max=8.0,
+                 breaker=None):
+        self.client = client
+        self.async_client_factory = async_client_factory
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._latencies = deque(maxlen=500)
+        self._metrics = {"requests": 0, "failures": 0, "retries": 0, "circuit_rejections": 0}
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying workers from synchronising against the provider
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _before_request(self):
+        if not self.breaker.allow():
+            self._metrics["circuit_rejections"] += 1
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        self._metrics["requests"] += 1
+
+    def _on_error(self, exc, attempt):
+        """Returns the delay before the next attempt, or raises LLMUnavailableError when giving up."""
+        if attempt < self.max_retries and _is_retryable(exc):
+            self._metrics["retries"] += 1
+            return self._backoff(attempt)
+
+        self._metrics["failures"] += 1
+        self.breaker.record_failure()
+        logger.error(f"LLM request failed after {attempt + 1} attempts: {exc}")
+        raise LLMUnavailableError(str(exc)) from exc
+
+    def _on_success(self, response):
+        self.breaker.record_success()
+        return response.choices[0].message.content.strip()
+
+    def complete(self, model, prompt):
+        self._before_request()
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+            except Exception as exc:
+                self._latencies.append(time.perf_counter() - start)
+                time.sleep(self._on_error(exc, attempt))
+                continue
+
+            self._latencies.append(time.perf_counter() - start)
+            return self._on_success(response)
+
+    def _async_client(self):
+        # Dropped together with its loop once the loop is garbage collected
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            async_client = self._async_clients.get(loop)
+            if async_client is None:
+                async_client = self._async_clients[loop] = self.async_client_factory()
+        return async_client
+
+    async def acomplete(self, model, prompt):
+        if self.async_client_factory is None:
+            # Providers without an async client (e.g. the stub) run on a worker thread
+            return await asyncio.to_thread(self.complete, model, prompt)
+
+        async_client = self._async_client()
+        self._before_request()
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await async_client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+            except Exception as exc:
+                self._latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(self._on_error(exc, attempt))
+                continue
+
+            self._latencies.append(time.perf_counter() - start)
+            return self._on_success(response)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 4) if latencies else None
+
+        return {
+            **self._metrics,
+            "circuit_state": self.breaker.state,
+            "latency_p50_seconds": percentile(0.5),
+            "latency_p95_seconds": percentile(0.95),
+            "latency_max_seconds": round(latencies[-1], 4) if latencies else None,
+        }
+
+
+def _build_provider_clients():
+    """Returns the sync provider client and a factory of async ones, which may be None."""
+    if settings.LLM_CLIENT == "stub":
+        return StubLLMClient(), None
+
+    import httpx
+    from groq import AsyncGroq, Groq
+
+    # One pooled HTTP client per process (per event loop for async calls) keeps connections and TLS sessions
+    # alive between calls
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    timeout = httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS)
+    api_key = os.getenv("GROQ_API_KEY")
+
+    # Retries are handled by LLMClient so they can be counted and combined with the breaker
+    client = Groq(api_key=api_key, http_client=httpx.Client(limits=limits, timeout=timeout), max_retries=0)
+
+    def async_client_factory():
+        return AsyncGroq(api_key=api_key, http_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+                         max_retries=0)
+
+    return client, async_client_factory
+
+
+def _wrap(provider_client, async_client_factory=None):
+    return LLMClient(
+        provider_client,
+        async_client_factory=async_client_factory,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+        breaker=CircuitBreaker(settings.LLM_CIRCUIT_FAILURES, settings.LLM_CIRCUIT_RESET_SECONDS),
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _wrap(*_build_provider_clients())
+    return _client
+
+
+def set_llm_client(provider_client, async_client_factory=None):
+    """Replaces the process-wide client, e.g. with a StubLLMClient in tests."""
+    global _client
+    with _client_lock:
+        _client = _wrap(provider_client, async_client_factory)
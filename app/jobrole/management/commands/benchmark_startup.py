@@ -0,0 +1,59 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# `python -X importtime` lines: "import time:      self [us] |  cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)")
+
+STARTUP_SCRIPT = """
+import os, django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+import {module}
+"""
+
+
+class Command(BaseCommand):
+    help = "Break down process startup cost: import time per top-level package, then the embedding model load."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default=settings.ROOT_URLCONF,
+                            help="Module imported after django.setup(), as a serving worker would (default: URLconf)")
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--with-model", action="store_true", help="Also time loading the embedding model")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(settings.BASE_DIR),
+                                                                        os.environ.get("PYTHONPATH")]))}
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT.format(module=options["module"])],
+            capture_output=True, text=True, env=env,
+        )
+        wall = time.perf_counter() - start
+        if completed.returncode:
+            self.stderr.write(completed.stderr[-2000:])
+            return
+
+        by_package = defaultdict(int)
+        for line in completed.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if match:
+                by_package[match.group(4).split(".")[0]] += int(match.group(1))
+
+        total = sum(by_package.values())
+        self.stdout.write(f"Importing {options['module']}: {total / 1e6:.2f}s of imports, {wall:.2f}s wall")
+        for package, micros in sorted(by_package.items(), key=lambda item: -item[1])[:options["top"]]:
+            self.stdout.write(f"  {package:<30} {micros / 1e6:7.3f}s  {100 * micros / total:5.1f}%")
+
+        if options["with_model"]:
+            from app.langchain_utils.vectorstore import local_embeddings
+
+            local_embeddings.preload()
+            self.stdout.write(f"Embedding model load: {local_embeddings.load_seconds}s")
@@ -0,0 +1,103 @@
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.langchain_utils.bm25 import BM25Index
+from app.langchain_utils.docstore import documents_at
+from app.langchain_utils.vectorstore import vectorstore_manager
+
+# Runs in a fresh interpreter per worker so RSS reflects one cold start; Django is not needed to load an index
+WORKER_SCRIPT = """
+import json, pickle, sys, time
+import faiss
+import numpy as np
+from app.langchain_utils.bm25 import BM25Index
+from app.langchain_utils.metadata_index import MetadataIndex
+
+def rss():
+    fields = dict(line.split(":", 1) for line in open("/proc/self/status"))
+    return {name: int(fields[name].split()[0]) / 1024 for name in ("RssAnon", "RssFile")}
+
+mode, prefix, pickle_path = sys.argv[1:4]
+before = rss()
+start = time.perf_counter()
+if mode == "mmap":
+    from app.langchain_utils.docstore import MappedDocstore
+    index = faiss.read_index(prefix + ".faiss", faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    docstore = MappedDocstore(prefix)
+    document_at = docstore.document_at
+    lexical_index = BM25Index.load(prefix)
+    metadata_index = MetadataIndex.load(prefix, index.ntotal)
+else:
+    index = faiss.read_index(prefix + ".faiss")
+    with open(pickle_path, "rb") as pickle_file:
+        docs = pickle.load(pickle_file)
+    document_at = docs.__getitem__
+    lexical_index = BM25Index()
+    lexical_index.add(doc.page_content for doc in docs)
+    metadata_index = MetadataIndex()
+    metadata_index.add(doc.metadata for doc in docs)
+load_seconds = time.perf_counter() - start
+
+query = np.random.default_rng(0).standard_normal((1, index.d)).astype(np.float32)
+start = time.perf_counter()
+_, positions = index.search(query, 10)
+candidates = metadata_index.select("job")
+lexical_positions, _ = lexical_index.search("python developer", 10, candidates)
+[document_at(int(position)) for position in [*positions[0], *lexical_positions] if position >= 0]
+first_query_seconds = time.perf_counter() - start
+
+after = rss()
+print(json.dumps({
+    "load_seconds": round(load_seconds, 4),
+    "first_query_seconds": round(first_query_seconds, 4),
+    "rss_anon_mb": round(after["RssAnon"] - before["RssAnon"], 1),
+    "rss_file_mb": round(after["RssFile"] - before["RssFile"], 1),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Measure cold start time and per-worker memory of the current index generation and its BM25 and "
+            "metadata side indexes, pickled and rebuilt (before) against memory-mapped (after).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes per mode")
+
+    def handle(self, *args, **options):
+        manifest = vectorstore_manager._read_manifest()
+        prefix = os.path.join(vectorstore_manager.index_path, manifest.get("index_name", ""))
+        if manifest.get("format") != "mapped" or BM25Index.load(prefix) is None:
+            raise CommandError("The current generation predates the mapped layout or its saved side indexes; "
+                               "run compact_vectorstore first")
+
+        with vectorstore_manager.read() as vectorstore:
+            docs = documents_at(vectorstore, range(vectorstore.index.ntotal))
+
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(settings.BASE_DIR),
+                                                                        os.environ.get("PYTHONPATH")]))}
+        with tempfile.NamedTemporaryFile(suffix=".pkl") as pickle_file:
+            pickle.dump(docs, pickle_file)
+            pickle_file.flush()
+            del docs
+
+            for mode in ("pickle", "mmap"):
+                # Started together so mapped workers can share page cache with each other
+                workers = [
+                    subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, mode, prefix, pickle_file.name],
+                                     stdout=subprocess.PIPE, env=env)
+                    for _ in range(options["workers"])
+                ]
+                results = [json.loads(worker.communicate()[0]) for worker in workers]
+                summary = {key: round(sum(result[key] for result in results) / len(results), 4) for key in results[0]}
+                self.stdout.write(f"{mode}: " + ", ".join(f"{key}={value}" for key, value in summary.items()))
+
+        self.stdout.write(self.style.SUCCESS(
+            "rss_anon_mb is private memory per worker; rss_file_mb are page-cache pages shared between workers"
+        ))
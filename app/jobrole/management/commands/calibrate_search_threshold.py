@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.langchain_utils.search import calibrate_thresholds
+
+
+class Command(BaseCommand):
+    help = "Report similarity percentiles of the stored corpus to calibrate SEARCH_SCORE_THRESHOLD."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=["job", "resume"], help="Only sample chunks of this type")
+        parser.add_argument("--sample", type=int, default=1000, help="Number of stored chunks used as queries")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--percentile", type=int, default=90,
+                            help="Percentile of the k-th neighbour similarity suggested as the threshold")
+
+    def handle(self, *args, **options):
+        percentiles = sorted({50, 75, 90, 95, 99, options["percentile"]})
+        report = calibrate_thresholds(sample_size=options["sample"], k=options["k"], filter_type=options["type"],
+                                      percentiles=percentiles)
+        if report is None:
+            self.stdout.write(self.style.WARNING("Not enough stored documents to calibrate"))
+            return
+
+        self.stdout.write(f"sampled: {report['sampled']}, k: {report['k']}, metric: {report['metric']}")
+        for name in ("nearest", "kth"):
+            self.stdout.write(f"{name}: " + ", ".join(f"{p}={v}" for p, v in report[name].items()))
+
+        suggested = report["kth"][f"p{options['percentile']}"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Suggested SEARCH_SCORE_THRESHOLD={suggested} (current {settings.SEARCH_SCORE_THRESHOLD})"
+        ))
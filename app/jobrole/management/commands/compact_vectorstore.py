@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from app.langchain_utils.vectorstore import INDEX_PARTITIONS
+
+
+class Command(BaseCommand):
+    help = "Fold append-only vectorstore segments into a new main FAISS index generation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-wait", action="store_true",
+                            help="Exit instead of waiting if another process is compacting")
+        parser.add_argument("--partition", choices=list(INDEX_PARTITIONS), default="job")
+
+    def handle(self, *args, **options):
+        vectorstore_manager = INDEX_PARTITIONS[options["partition"]]
+        if not vectorstore_manager.compact(blocking=not options["no_wait"]):
+            self.stdout.write(self.style.WARNING("Another process is compacting the vectorstore"))
+            return
+
+        stats = vectorstore_manager.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Vectorstore compacted: version {stats['disk_version']}, "
+            f"{stats['pending_segments']} segments pending"
+        ))
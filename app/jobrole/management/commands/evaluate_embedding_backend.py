@@ -0,0 +1,58 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.langchain_utils.docstore import documents_at
+from app.langchain_utils.embedding_backends import EMBEDDING_BACKENDS, build_embeddings, evaluate_embeddings
+from app.langchain_utils.vectorstore import vectorstore_manager
+
+
+def _query_view(text, fraction):
+    """The leading part of a chunk, a stand-in for a short query about it."""
+    words = text.split()
+    return " ".join(words[:max(1, int(len(words) * fraction))])
+
+
+class Command(BaseCommand):
+    help = ("Compare an embedding backend/model against the current one on stored chunks: "
+            "recall@k of the baseline neighbours, hit@k and latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("backend", choices=EMBEDDING_BACKENDS)
+        parser.add_argument("--model-name", default=settings.EMBEDDING_MODEL_NAME)
+        parser.add_argument("--baseline-backend", choices=EMBEDDING_BACKENDS, default=settings.EMBEDDING_BACKEND)
+        parser.add_argument("--baseline-model-name", default=settings.EMBEDDING_MODEL_NAME)
+        parser.add_argument("--corpus", type=int, default=2000, help="Stored chunks embedded by both models")
+        parser.add_argument("--queries", type=int, default=200, help="Chunks whose leading words are used as queries")
+        parser.add_argument("--query-fraction", type=float, default=0.5,
+                            help="Share of a chunk's words kept as its query")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not vectorstore_manager.has_index():
+            raise CommandError("No stored chunks to evaluate on")
+        with vectorstore_manager.read() as vectorstore:
+            total = vectorstore.index.ntotal
+            rng = np.random.default_rng(options["seed"])
+            sample = np.sort(rng.choice(total, min(options["corpus"], total), replace=False))
+            corpus_texts = [doc.page_content for doc in documents_at(vectorstore, sample.tolist())]
+
+        query_sources = rng.choice(len(corpus_texts), min(options["queries"], len(corpus_texts)), replace=False)
+        query_texts = [_query_view(corpus_texts[source], options["query_fraction"]) for source in query_sources]
+
+        threads = settings.EMBEDDING_TORCH_THREADS
+        baseline = build_embeddings(options["baseline_backend"], options["baseline_model_name"],
+                                    onnx_dir=settings.EMBEDDING_ONNX_DIR, threads=threads)
+        candidate = build_embeddings(options["backend"], options["model_name"],
+                                     onnx_dir=settings.EMBEDDING_ONNX_DIR, threads=threads)
+        report = evaluate_embeddings(baseline, candidate, corpus_texts, query_texts, query_sources.tolist(),
+                                     k=options["k"])
+
+        self.stdout.write(f"corpus: {report['corpus']}, queries: {report['queries']}, k: {report['k']}")
+        for name, label in (("baseline", f"{options['baseline_backend']} {options['baseline_model_name']}"),
+                            ("candidate", f"{options['backend']} {options['model_name']}")):
+            self.stdout.write(f"{name} ({label}): " + ", ".join(f"{key}={value}" for key, value in report[name].items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"recall@{report['k']} vs baseline: {report['recall_at_k']}, corpus embedding speedup: {report['speedup']}x"
+        ))
@@ -0,0 +1,26 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.langchain_utils.embedding_backends import export_onnx, onnx_model_dir
+
+
+class Command(BaseCommand):
+    help = "Export a sentence-transformers model to ONNX (and a dynamically int8-quantized copy) for the onnx backends."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model-name", default=settings.EMBEDDING_MODEL_NAME,
+                            help="Hugging Face model id, e.g. a smaller distilled sentence-transformers model")
+        parser.add_argument("--output", help="Export directory (default: the model's directory under EMBEDDING_ONNX_DIR)")
+        parser.add_argument("--no-quantize", action="store_true", help="Only export the float32 model")
+        parser.add_argument("--opset", type=int, default=17)
+
+    def handle(self, *args, **options):
+        output = options["output"] or onnx_model_dir(settings.EMBEDDING_ONNX_DIR, options["model_name"])
+        paths = export_onnx(options["model_name"], output, quantize=not options["no_quantize"], opset=options["opset"])
+        for path in paths:
+            self.stdout.write(f"{path}: {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {options['model_name']}; compare it with evaluate_embedding_backend before switching"
+        ))
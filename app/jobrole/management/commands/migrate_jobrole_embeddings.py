@@ -0,0 +1,82 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from app.jobrole.models import JobRole, EMBEDDING_DTYPES, decode_vector, encode_vector, vector_fields
+
+
+def _table_bytes():
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_total_relation_size(%s)", [JobRole._meta.db_table])
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = "Convert JobRole JSON embeddings to the binary embedding column and report the size/speed difference."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dtype", choices=EMBEDDING_DTYPES, default=settings.JOBROLE_EMBEDDING_DTYPE)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--measure-only", action="store_true", help="Report the comparison without converting")
+
+    def handle(self, *args, **options):
+        pending = JobRole.objects.filter(embedding__isnull=True, embedding_vector__isnull=False)
+        self._measure(pending, options["dtype"])
+        if options["measure_only"]:
+            return
+
+        size_before = _table_bytes()
+        converted = 0
+        last_id = 0
+        while True:
+            # Keyset pagination, so each batch is one indexed range scan
+            batch = list(pending.filter(id__gt=last_id).order_by("id").only("id", "embedding_vector")
+                         [:options["batch_size"]])
+            if not batch:
+                break
+            for job_role in batch:
+                for field, value in vector_fields(job_role.embedding_vector, options["dtype"]).items():
+                    setattr(job_role, field, value)
+            with transaction.atomic():
+                JobRole.objects.bulk_update(batch, ["embedding", "embedding_dtype", "embedding_vector"])
+            converted += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Converted {converted} job roles")
+
+        size_after = _table_bytes()
+        if size_before is not None:
+            # Dead tuples are only reclaimed by VACUUM FULL, so run it before comparing on-disk size
+            self.stdout.write(f"table size: {size_before} -> {size_after} bytes")
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} job roles to {options['dtype']} embeddings"))
+
+    def _measure(self, queryset, dtype, sample_size=200):
+        sample = [job_role.embedding_vector for job_role in queryset.only("embedding_vector")[:sample_size]]
+        if not sample:
+            self.stdout.write("No JSON embeddings left to convert")
+            return
+
+        encoded_json = [json.dumps(vector) for vector in sample]
+        start = time.perf_counter()
+        for text in encoded_json:
+            json.loads(text)
+        json_decode = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        encoded = [encode_vector(vector, dtype) for vector in sample]
+        binary_encode = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        for buffer in encoded:
+            decode_vector(buffer, dtype)
+        binary_decode = (time.perf_counter() - start) / len(sample)
+
+        json_bytes = sum(map(len, encoded_json)) / len(sample)
+        binary_bytes = sum(map(len, encoded)) / len(sample)
+        self.stdout.write(
+            f"{len(sample)} sampled rows: JSON {json_bytes:.0f} B/row, {dtype} {binary_bytes:.0f} B/row "
+            f"({json_bytes / binary_bytes:.1f}x smaller); decode JSON {json_decode * 1e6:.1f} us, "
+            f"binary {binary_decode * 1e6:.2f} us; binary encode {binary_encode * 1e6:.1f} us"
+        )
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.langchain_utils.index_factory import INDEX_TYPES, METRICS, evaluate_recall
+from app.langchain_utils.vectorstore import INDEX_PARTITIONS
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FAISS index as another tier (flat, ivf_flat, hnsw, ivf_pq) and report recall against flat."
+
+    def add_arguments(self, parser):
+        parser.add_argument("index_type", choices=INDEX_TYPES)
+        parser.add_argument("--partition", choices=list(INDEX_PARTITIONS), default="job")
+        parser.add_argument("--metric", choices=METRICS,
+                            help="Switch the similarity metric; cosine normalizes the stored vectors (default: keep)")
+        parser.add_argument("--nlist", type=int, help="Inverted lists for IVF tiers (default ~4*sqrt(n))")
+        parser.add_argument("--hnsw-m", type=int, default=32, help="Graph neighbours per node for hnsw")
+        parser.add_argument("--pq-m", type=int, default=48, help="Bytes per vector code for ivf_pq")
+        parser.add_argument("--train-sample", type=int, default=100000,
+                            help="Maximum number of vectors used to train IVF/PQ tiers")
+        parser.add_argument("--no-evaluate", action="store_true", help="Skip the recall@k evaluation")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--nprobe", type=int, default=settings.VECTORSTORE_NPROBE)
+        parser.add_argument("--ef-search", type=int, default=settings.VECTORSTORE_EF_SEARCH)
+
+    def handle(self, *args, **options):
+        index_options = {"hnsw_m": options["hnsw_m"], "pq_m": options["pq_m"]}
+        if options["nlist"]:
+            index_options["nlist"] = options["nlist"]
+
+        vectors, old_index, new_index = INDEX_PARTITIONS[options["partition"]].rebuild(
+            options["index_type"], metric=options["metric"], train_sample=options["train_sample"], **index_options)
+        self.stdout.write(self.style.SUCCESS(
+            f"Vectorstore rebuilt as {options['index_type']}: {new_index.ntotal} vectors"
+        ))
+
+        if options["no_evaluate"] or not len(vectors):
+            return
+
+        report = evaluate_recall(vectors, new_index, k=options["k"], num_queries=options["queries"],
+                                 nprobe=options["nprobe"], ef_search=options["ef_search"])
+        for name, value in report.items():
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app.jobrole.matrix_search import jobrole_matrix
+from app.jobrole.models import JobRole
+from app.resume.models import Resume
+from app.langchain_utils.embedding_backends import EMBEDDING_BACKENDS, build_embeddings, embedding_model_id
+from app.langchain_utils.vectorstore import INDEX_PARTITIONS
+
+# Models with a stored embedding of their full text, and the field it is computed from
+EMBEDDED_ROWS = ((JobRole, "description", ["embedding", "embedding_dtype", "embedding_vector", "updated"]),
+                 (Resume, "content", ["embedding", "embedding_dtype", "updated"]))
+
+
+class Command(BaseCommand):
+    help = ("Re-embed every vectorstore partition and the JobRole/Resume embeddings with another embedding "
+            "backend/model. Workers keep serving the old generations until they restart with the matching "
+            "EMBEDDING_BACKEND and EMBEDDING_MODEL_NAME.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default=settings.EMBEDDING_BACKEND)
+        parser.add_argument("--model-name", default=settings.EMBEDDING_MODEL_NAME)
+        parser.add_argument("--partition", choices=list(INDEX_PARTITIONS),
+                            help="Only re-embed this partition (default: all)")
+        parser.add_argument("--batch-size", type=int, default=256)
+        parser.add_argument("--pq-m", type=int, default=48, help="Bytes per vector code when the index is ivf_pq")
+        parser.add_argument("--skip-rows", action="store_true",
+                            help="Only re-embed the vectorstore, not the JobRole/Resume embeddings")
+
+    def handle(self, *args, **options):
+        embedding_id = embedding_model_id(options["backend"], options["model_name"])
+        embeddings = build_embeddings(options["backend"], options["model_name"], onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                                      threads=settings.EMBEDDING_TORCH_THREADS)
+
+        def progress(done, total):
+            self.stdout.write(f"Re-embedded {done}/{total} chunks")
+
+        partitions = [options["partition"]] if options["partition"] else list(INDEX_PARTITIONS)
+        for partition in partitions:
+            count = INDEX_PARTITIONS[partition].reembed(embedding_id, embeddings, batch_size=options["batch_size"],
+                                                        progress=progress, pq_m=options["pq_m"])
+            self.stdout.write(self.style.SUCCESS(f"{partition} vectorstore re-embedded with {embedding_id}: "
+                                                 f"{count} chunks"))
+
+        if options["skip_rows"]:
+            return
+        for model, text_field, fields in EMBEDDED_ROWS:
+            converted = self._reembed_rows(model, text_field, fields, embeddings, options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__} embeddings re-embedded with {embedding_id}: "
+                                                 f"{converted} rows"))
+        # The matrix dimension may have changed, so it is rebuilt rather than synced
+        jobrole_matrix.sync(full=True)
+
+    def _reembed_rows(self, model, text_field, fields, embeddings, batch_size):
+        converted = 0
+        last_id = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by("id").only("id", text_field)[:batch_size])
+            if not batch:
+                return converted
+            # One model call per batch; the backends embed queries and documents the same way
+            vectors = embeddings.embed_documents([getattr(row, text_field) for row in batch])
+            now = timezone.now()
+            for row, vector in zip(batch, vectors):
+                row.set_vector(vector)
+                row.updated = now
+            with transaction.atomic():
+                model.objects.bulk_update(batch, fields)
+            converted += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Re-embedded {converted} {model._meta.verbose_name_plural}")
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.langchain_utils.embedding_server import EmbeddingServer, pin_torch_threads
+from app.langchain_utils.vectorstore import local_embeddings
+
+
+class Command(BaseCommand):
+    help = "Serve the embedding model over a unix socket, micro-batching concurrent requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET)
+        parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SERVER_MAX_BATCH)
+        parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_SERVER_MAX_WAIT_MS)
+        parser.add_argument("--threads", type=int, default=settings.EMBEDDING_TORCH_THREADS,
+                            help="Torch intra-op threads (0 keeps the torch default)")
+
+    def handle(self, *args, **options):
+        if not options["socket"]:
+            raise CommandError("Pass --socket or set EMBEDDING_SERVER_SOCKET")
+        if options["threads"]:
+            pin_torch_threads(options["threads"])
+
+        local_embeddings.preload()
+        server = EmbeddingServer(options["socket"], local_embeddings, max_batch=options["max_batch"],
+                                 max_wait=options["max_wait_ms"] / 1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding server listening on {options['socket']} "
+            f"(batch {options['max_batch']}, wait {options['max_wait_ms']}ms)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Batching stats: {server.batcher.stats()}")
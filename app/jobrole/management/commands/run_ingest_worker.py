@@ -0,0 +1,46 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.jobrole.tasks import IngestWorker
+
+
+class Command(BaseCommand):
+    help = ("Process job descriptions queued by the store-jd API in batches. "
+            "Any number of workers can run side by side, on one host or several.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1,
+                            help="Worker threads; stages are still limited by INGEST_QUEUE_*_CONCURRENCY")
+        parser.add_argument("--batch-size", type=int, default=settings.INGEST_QUEUE_BATCH_SIZE,
+                            help="Jobs claimed and committed to the index together")
+        parser.add_argument("--poll-seconds", type=float, default=settings.INGEST_QUEUE_POLL_SECONDS)
+        parser.add_argument("--once", action="store_true", help="Exit once no job is ready instead of polling")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            worker = IngestWorker(batch_size=options["batch_size"])
+            processed = 0
+            while claimed := worker.run_once():
+                processed += claimed
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} ingest jobs"))
+            return
+
+        stop_event = threading.Event()
+        workers = [IngestWorker(batch_size=options["batch_size"], poll_seconds=options["poll_seconds"])
+                   for _ in range(options["threads"])]
+        threads = [threading.Thread(target=worker.run, args=(stop_event,), name=f"ingest-worker-{number}")
+                   for number, worker in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Ingest workers {', '.join(worker.name for worker in workers)} started")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the current batches")
+            stop_event.set()
+            for thread in threads:
+                thread.join()
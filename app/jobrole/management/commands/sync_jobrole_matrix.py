@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.jobrole.matrix_search import jobrole_matrix
+
+
+class Command(BaseCommand):
+    help = "Sync the memory-mapped JobRole embedding matrix used as the brute-force search fallback."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild from all active rows instead of syncing changes")
+        parser.add_argument("--watch", action="store_true",
+                            help="Keep syncing every JOBROLE_MATRIX_SYNC_SECONDS instead of serving processes")
+
+    def handle(self, *args, **options):
+        jobrole_matrix.sync(full=options["full"])
+        self.report()
+        while options["watch"]:
+            time.sleep(jobrole_matrix.sync_interval)
+            close_old_connections()
+            jobrole_matrix.sync()
+
+    def report(self):
+        stats = jobrole_matrix.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"JobRole matrix holds {stats['active_rows']} active of {stats['rows']} rows, "
+            f"synced until {stats['synced_until']}"
+        ))
@@ -0,0 +1,315 @@
+"""
+Brute-force job role search straight over the JobRole table.
+
+Embeddings of JobRole rows are mirrored into memory-mapped arrays (float32 vectors, ids and an
+active flag) that every worker maps read-only, so a restart only re-maps the files. A query is
+one matrix-vector product plus argpartition. The mirror is refreshed incrementally from the
+`updated` timestamps, by a background thread of whichever process holds the sync lock or by
+sync_jobrole_matrix, and serves as a fallback when the FAISS index is unavailable.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from app.jobrole.models import JobRole, decode_vector
+from app.langchain_utils.locks import ReadWriteLock, atomic_write, file_lock
+
+logger = logging.getLogger('django')
+
+MATRIX_MANIFEST_FILE = "MANIFEST"
+
+
+class JobRoleMatrix:
+    """
+    Memory-mapped mirror of active JobRole embeddings.
+
+    On disk a generation is three arrays of equal capacity; MANIFEST names the generation and
+    how many rows are in use. Readers only see rows below the published count, and a published
+    vector is never overwritten: a changed role is appended past the count, and its old row is
+    retired by clearing its active flag one sync later, once readers have picked up the new count.
+    Deactivated roles are cleared right away. A generation is only rewritten, without its retired
+    rows, when the capacity is exhausted.
+    """
+
+    def __init__(self, path, sync_interval=5.0, growth=1.5, batch_size=1000, background_sync=True):
+        self.path = path
+        self.manifest_path = os.path.join(path, MATRIX_MANIFEST_FILE)
+        self.lock_path = f"{path}.lock"
+        self.sync_interval = sync_interval
+        self.growth = growth
+        self.batch_size = batch_size
+        self.background_sync = background_sync
+
+        self._manifest = None
+        self._vectors = None
+        self._ids = None
+        self._active = None
+        self._last_load = 0.0
+        self._rw_lock = ReadWriteLock()
+        self._load_lock = threading.Lock()
+        self._sync_thread = None
+
+    # Disk layout
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+
+    def _files(self, generation):
+        return {name: os.path.join(self.path, f"{name}-{generation}.npy") for name in ("vectors", "ids", "active")}
+
+    def _create_generation(self, capacity, dimension):
+        generation = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        files = self._files(generation)
+        arrays = (
+            np.lib.format.open_memmap(files["vectors"], mode="w+", dtype=np.float32, shape=(capacity, dimension)),
+            np.lib.format.open_memmap(files["ids"], mode="w+", dtype=np.int64, shape=(capacity,)),
+            np.lib.format.open_memmap(files["active"], mode="w+", dtype=np.bool_, shape=(capacity,)),
+        )
+        return generation, arrays
+
+    def _open(self, manifest, mode="r"):
+        # Only sync() maps the arrays writable
+        files = self._files(manifest["generation"])
+        return tuple(np.load(files[name], mmap_mode=mode) for name in ("vectors", "ids", "active"))
+
+    def _write_manifest(self, manifest):
+        atomic_write(self.manifest_path, lambda manifest_file: manifest_file.write(json.dumps(manifest).encode()))
+
+    def _remove_generations(self, keep):
+        for name in os.listdir(self.path):
+            if name.endswith(".npy") and not any(generation in name for generation in keep):
+                os.remove(os.path.join(self.path, name))
+
+    # Synchronization with the JobRole table
+
+    @staticmethod
+    def _row_vector(embedding, dtype, legacy):
+        if embedding is not None:
+            vector = decode_vector(embedding, dtype).astype(np.float32)
+        elif legacy is not None:
+            vector = np.asarray(legacy, dtype=np.float32)
+        else:
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _changed_rows(self, since):
+        queryset = JobRole.objects.all()
+        if since is not None:
+            # >= rather than >, so rows committed late with the same timestamp are not missed; re-applying is harmless
+            queryset = queryset.filter(updated__gte=since)
+        else:
+            queryset = queryset.filter(Q(embedding__isnull=False) | Q(embedding_vector__isnull=False), is_active=True)
+        return queryset.order_by("updated").values_list(
+            "id", "is_active", "embedding", "embedding_dtype", "embedding_vector", "updated"
+        ).iterator(chunk_size=self.batch_size)
+
+    def _apply(self, manifest, arrays, rows, retired, changes):
+        """
+        Appends changed rows past the published count and collects the rows they replace in retired.
+        rows maps JobRole ids to their live row. Returns (count, complete); incomplete when out of capacity.
+        """
+        vectors, ids, active = arrays
+        count = manifest["count"]
+        for job_role_id, is_active, embedding, dtype, legacy, updated in changes:
+            vector = self._row_vector(embedding, dtype, legacy)
+            row = rows.get(job_role_id)
+            if not is_active or vector is None:
+                if row is not None:
+                    active[rows.pop(job_role_id)] = False
+            elif row is None or not np.array_equal(vectors[row], vector):
+                if count == len(ids):
+                    return count, False
+                vectors[count] = vector
+                ids[count] = job_role_id
+                active[count] = True
+                if row is not None:
+                    retired.append(row)
+                rows[job_role_id] = count
+                count += 1
+            manifest["synced_until"] = updated.isoformat()
+        return count, True
+
+    def sync(self, full=False, blocking=True):
+        """
+        Mirrors JobRole changes since the last sync into the arrays (all rows with full).
+        Returns False when another process is already syncing and blocking is off.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self.lock_path, blocking=blocking) as acquired:
+            if not acquired:
+                return False
+
+            start = time.perf_counter()
+            manifest = None if full else self._read_manifest()
+            # Rows replaced by the previous sync, whose replacements readers have had time to map
+            retiring = manifest.pop("retired", []) if manifest else []
+            retired = []
+            while True:
+                if manifest is None:
+                    # Full build: a fresh generation sized for the current table
+                    first = JobRole.objects.filter(is_active=True).exclude(embedding__isnull=True,
+                                                                         embedding_vector__isnull=True).first()
+                    if first is None or first.vector is None:
+                        return True
+                    capacity = max(int(JobRole.objects.filter(is_active=True).count() * self.growth), 16)
+                    generation, arrays = self._create_generation(capacity, len(first.vector))
+                    manifest = {"generation": generation, "count": 0, "dimension": len(first.vector),
+                                "synced_until": None}
+                    rows = {}
+                else:
+                    arrays = self._open(manifest, mode="r+")
+                    if retiring:
+                        arrays[2][retiring] = False
+                        retiring = []
+                    # The newest active row of a role wins
+                    count = manifest["count"]
+                    rows = {job_role_id: row for row, job_role_id in enumerate(arrays[1][:count].tolist())
+                            if arrays[2][row]}
+
+                since = parse_datetime(manifest["synced_until"]) if manifest["synced_until"] else None
+                count, complete = self._apply(manifest, arrays, rows, retired, self._changed_rows(since))
+                manifest["count"] = count
+                for array in arrays:
+                    array.flush()
+
+                if complete:
+                    break
+                # Out of capacity: copy the live rows into a larger generation and continue from where this pass
+                # stopped; rows retired so far are simply not copied
+                manifest = self._grow(manifest, arrays, rows)
+                retired = []
+
+            if retired:
+                manifest["retired"] = retired
+            previous = self._read_manifest()
+            if manifest != previous:
+                self._write_manifest(manifest)
+                self._remove_generations(keep={manifest["generation"], previous["generation"] if previous else ""})
+                logger.info(f"JobRole matrix synced ({count} rows) in {time.perf_counter() - start:.3f}s")
+        self._load()
+        return True
+
+    def _grow(self, manifest, arrays, rows):
+        vectors, ids, active = arrays
+        live = sorted(rows.values())
+        generation, (new_vectors, new_ids, new_active) = self._create_generation(
+            max(int(len(live) * self.growth), len(live) + 16), manifest["dimension"])
+        new_vectors[:len(live)] = vectors[live]
+        new_ids[:len(live)] = ids[live]
+        new_active[:len(live)] = True
+        for array in (new_vectors, new_ids, new_active):
+            array.flush()
+        return {**manifest, "generation": generation, "count": len(live)}
+
+    def _sync_forever(self):
+        while True:
+            try:
+                # Whichever process gets the file lock pulls the latest table changes for everyone
+                self.sync(blocking=False)
+            except Exception:
+                logger.error("JobRole matrix sync failed", exc_info=True)
+            finally:
+                close_old_connections()
+            time.sleep(self.sync_interval)
+
+    def start_background_sync(self):
+        with self._load_lock:
+            if self._sync_thread is None or not self._sync_thread.is_alive():
+                self._sync_thread = threading.Thread(target=self._sync_forever, name="jobrole-matrix-sync",
+                                                     daemon=True)
+                self._sync_thread.start()
+
+    # Reading
+
+    def _load(self):
+        """Maps the generation named by MANIFEST read-only; rows appended by sync show up through the shared mapping."""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return
+        if self._manifest is not None and manifest["generation"] == self._manifest["generation"]:
+            self._manifest = manifest
+            return
+        arrays = self._open(manifest)
+        with self._rw_lock.write():
+            self._manifest = manifest
+            self._vectors, self._ids, self._active = arrays
+
+    def _refresh(self):
+        # Searches only re-read the manifest; the table is scanned by the sync thread or sync_jobrole_matrix
+        if self.background_sync:
+            self.start_background_sync()
+        now = time.monotonic()
+        if self._manifest is not None and now - self._last_load < self.sync_interval:
+            return
+        with self._load_lock:
+            if self._manifest is not None and now - self._last_load < self.sync_interval:
+                return
+            self._last_load = now
+            self._load()
+
+    def search(self, query_vector, k: int):
+        """Returns (JobRole ids, similarities in [0, 1]) of the k most similar active roles, best first."""
+        self._refresh()
+        with self._rw_lock.read():
+            if self._manifest is None or not self._manifest["count"]:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            count = self._manifest["count"]
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1)
+            scores = self._vectors[:count] @ query
+            scores[~self._active[:count]] = -np.inf
+
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            top = top[np.isfinite(scores[top])]
+            # Until sync retires a replaced row, a role can briefly appear twice; keep its best row
+            ids = np.array(self._ids[top])
+            _, first = np.unique(ids, return_index=True)
+            first = np.sort(first)
+            return ids[first], np.clip((1 + scores[top[first]]) / 2, 0, 1)
+
+    def search_documents(self, query_vector, k: int, min_score: float = None):
+        """Search results shaped like the FAISS document results, for use as a drop-in fallback."""
+        ids, scores = self.search(query_vector, k)
+        job_roles = JobRole.objects.in_bulk(ids.tolist())
+        results = []
+        for job_role_id, score in zip(ids.tolist(), scores.tolist()):
+            job_role = job_roles.get(job_role_id)
+            if job_role is None or (min_score is not None and score < min_score):
+                continue
+            results.append({
+                "score": round(score, 3),
+                "matched_chunks": 1,
+                "metadata": {"type": "job", "title": job_role.title, "job_role_id": job_role_id},
+                "content": job_role.description
+            })
+        return results
+
+    def stats(self):
+        manifest = self._manifest
+        return {
+            "path": self.path,
+            "rows": manifest["count"] if manifest else 0,
+            "active_rows": int(self._active[:manifest["count"]].sum()) if manifest else 0,
+            "synced_until": manifest["synced_until"] if manifest else None,
+        }
+
+
+jobrole_matrix = JobRoleMatrix(settings.JOBROLE_MATRIX_PATH, sync_interval=settings.JOBROLE_MATRIX_SYNC_SECONDS,
+                               background_sync=settings.JOBROLE_MATRIX_BACKGROUND_SYNC)
@@ -1,14 +1,80 @@
+import numpy as np
+from django.conf import settings
 from django.db import models
 
+EMBEDDING_DTYPES = ("float32", "float16")
+
+
+def encode_vector(vector, dtype: str = "float32") -> bytes:
+    """Packs an embedding as raw little-endian float bytes (3 KB for 768 float32s instead of ~15 KB of JSON)."""
+    return np.asarray(vector, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()
+
+
+def decode_vector(buffer, dtype: str = "float32") -> np.ndarray:
+    """Read-only view over stored bytes; no copy and no parsing."""
+    return np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"))
+
+
+def vector_fields(vector, dtype: str = None) -> dict:
+    """Model field values for an embedding, e.g. for serializer.save(**vector_fields(vector))."""
+    dtype = dtype or settings.JOBROLE_EMBEDDING_DTYPE
+    return {"embedding": encode_vector(vector, dtype), "embedding_dtype": dtype, "embedding_vector": None}
+
 
 # Create your models here.
 class JobRole(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
-    embedding_vector = models.JSONField()
+    # Deprecated JSON copy of the embedding, only read for rows not yet converted by migrate_jobrole_embeddings
+    embedding_vector = models.JSONField(null=True, blank=True)
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dtype = models.CharField(max_length=8, default="float32")
 
     # Additional fields
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    @property
+    def vector(self):
+        if self.embedding is not None:
+            return decode_vector(self.embedding, self.embedding_dtype)
+        if self.embedding_vector is not None:
+            return np.asarray(self.embedding_vector, dtype=np.float32)
+        return None
+
+    def set_vector(self, vector, dtype: str = None):
+        for field, value in vector_fields(vector, dtype).items():
+            setattr(self, field, value)
+
+
+class IngestJob(models.Model):
+    """ Model: Job description queued for background ingestion (see app.jobrole.tasks) """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [(status, status) for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, STATUS_FAILED)]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Pipeline stage of a running job: llm, embed, db or index
+    stage = models.CharField(max_length=16, blank=True)
+    # Validated title, description and metadata
+    payload = models.JSONField()
+    job_role = models.ForeignKey(JobRole, on_delete=models.SET_NULL, null=True, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    error = models.TextField(blank=True)
+    # Worker holding the job; the claim expires after INGEST_QUEUE_LEASE_SECONDS so a crashed worker's jobs are retried
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
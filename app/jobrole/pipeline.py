@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from app.jobrole.matrix_search import jobrole_matrix
+from app.jobrole.utils import extract_relevant_sections_with_llm, extract_job_keywords_from_resume, \
+    aextract_relevant_sections_with_llm, aextract_job_keywords_from_resume
+from app.langchain_utils.search import similarity_search_by_vector, filter_matching_documents, chunks_to_fetch
+from app.langchain_utils.vectorstore import embedding_model, vectorstore_manager
+
+logger = logging.getLogger('django')
+
+# Shared by all requests so concurrent resume searches cannot spawn unbounded threads
+pipeline_executor = ThreadPoolExecutor(max_workers=settings.RESUME_PIPELINE_WORKERS,
+                                       thread_name_prefix="resume-pipeline")
+
+# CPU-bound embedding and FAISS work from async views; bounded so the event loop never oversubscribes the CPU
+cpu_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_CPU_WORKERS, thread_name_prefix="cpu-bound")
+
+
+async def run_cpu_bound(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, func, *args)
+
+
+class StageTimings:
+    """Collects per-stage durations of one request, including stages run on other threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def timed(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.stages[stage] = (time.perf_counter() - start) * 1000
+
+    async def atimed(self, stage, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            with self._lock:
+                self.stages[stage] = (time.perf_counter() - start) * 1000
+
+    def total(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        """Stage durations and the total so far, in milliseconds."""
+        with self._lock:
+            stages = {stage: round(duration, 1) for stage, duration in self.stages.items()}
+        return {**stages, "total": round(self.total(), 1)}
+
+    def as_header(self):
+        """Formats the timings as a Server-Timing header value (milliseconds)."""
+        entries = [f"{stage};dur={duration:.1f}" for stage, duration in self.stages.items()]
+        entries.append(f"total;dur={self.total():.1f}")
+        return ", ".join(entries)
+
+
+def _search_with_titles(query_vector, top_k, included_titles):
+    if not vectorstore_manager.has_index():
+        # Nothing indexed in FAISS (fresh volume, lost index): rank the JobRole table directly
+        return jobrole_matrix.search_documents(query_vector, top_k, min_score=settings.SEARCH_SCORE_THRESHOLD)
+    try:
+        return _search_index_with_titles(query_vector, top_k, included_titles)
+    except (OSError, RuntimeError):
+        logger.error("FAISS search failed, falling back to the JobRole matrix", exc_info=True)
+        return jobrole_matrix.search_documents(query_vector, top_k, min_score=settings.SEARCH_SCORE_THRESHOLD)
+
+
+def _search_index_with_titles(query_vector, top_k, included_titles):
+    # Titles are applied as a FAISS pre-filter; inferred titles are free text, so fall back
+    # to similarity alone when none of them match a stored title
+    fetch_k = chunks_to_fetch(top_k)
+    min_score = settings.SEARCH_SCORE_THRESHOLD
+    raw_results = similarity_search_by_vector(query_vector, fetch_k, filter_type="job", include_titles=included_titles,
+                                              min_score=min_score)
+    if not raw_results and included_titles:
+        raw_results = similarity_search_by_vector(query_vector, fetch_k, filter_type="job", min_score=min_score)
+    return filter_matching_documents(raw_results, top_k=top_k, filter_type="job")
+
+
+def search_jobs_for_resume(resume_text: str, top_k: int = 5):
+    """
+    Runs the resume search as overlapping stages.
+
+    Section extraction and title inference are independent LLM calls and run concurrently.
+    The query embedding starts as soon as the sections are ready, while title inference may
+    still be in flight; the pre-filtered vector search runs once both are available.
+    Returns (results, included_titles, timings).
+    """
+    timings = StageTimings()
+
+    sections_future = pipeline_executor.submit(
+        timings.timed, "sections", extract_relevant_sections_with_llm, resume_text)
+    titles_future = pipeline_executor.submit(
+        timings.timed, "titles", extract_job_keywords_from_resume, resume_text)
+
+    filtered_resume = sections_future.result()
+    query_vector = timings.timed("embed", embedding_model.embed_query, filtered_resume)
+
+    included_titles = titles_future.result()
+    results = timings.timed("search", _search_with_titles, query_vector, top_k, included_titles)
+
+    return results, included_titles, timings
+
+
+async def asearch_jobs_for_resume(resume_text: str, top_k: int = 5):
+    """
+    Event-loop version of search_jobs_for_resume.
+    LLM calls are awaited directly; embedding and FAISS search run on the bounded CPU executor.
+    """
+    timings = StageTimings()
+
+    titles_task = asyncio.ensure_future(timings.atimed("titles", aextract_job_keywords_from_resume(resume_text)))
+    try:
+        filtered_resume = await timings.atimed("sections", aextract_relevant_sections_with_llm(resume_text))
+        query_vector = await timings.atimed("embed", run_cpu_bound(embedding_model.embed_query, filtered_resume))
+        included_titles = await titles_task
+    finally:
+        titles_task.cancel()
+
+    results = await timings.atimed("search", run_cpu_bound(_search_with_titles, query_vector, top_k, included_titles))
+
+    return results, included_titles, timings
+
+
+async def astream_jobs_for_resume(resume_text: str, top_k: int = 5):
+    """
+    Streaming version of asearch_jobs_for_resume; yields (event, results) as stages complete:
+    "sections", "titles", "hits", "results" and finally "timings".
+
+    "hits" is the vector search without the title pre-filter, started as soon as the query is
+    embedded so it overlaps title inference. "results" applies the inferred titles and is the
+    same as asearch_jobs_for_resume would return.
+    """
+    timings = StageTimings()
+
+    titles_task = asyncio.ensure_future(timings.atimed("titles", aextract_job_keywords_from_resume(resume_text)))
+    hits_task = None
+    try:
+        filtered_resume = await timings.atimed("sections", aextract_relevant_sections_with_llm(resume_text))
+        yield "sections", {"sections": filtered_resume}
+
+        query_vector = await timings.atimed("embed", run_cpu_bound(embedding_model.embed_query, filtered_resume))
+        hits_task = asyncio.ensure_future(
+            timings.atimed("hits", run_cpu_bound(_search_with_titles, query_vector, top_k, [])))
+
+        included_titles = await titles_task
+        yield "titles", {"titles": included_titles}
+
+        hits = await hits_task
+        yield "hits", hits
+
+        if included_titles:
+            hits = await timings.atimed("search",
+                                        run_cpu_bound(_search_with_titles, query_vector, top_k, included_titles))
+        yield "results", hits
+    finally:
+        # Also reached when the client disconnects mid-stream
+        titles_task.cancel()
+        if hits_task is not None:
+            hits_task.cancel()
+
+    yield "timings", timings.as_dict()
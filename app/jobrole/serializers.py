@@ -1,16 +1,13 @@
 from rest_framework import serializers
 
-from app.jobrole.models import JobRole
+from app.jobrole.models import IngestJob, JobRole
 
 
 class JobRoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = JobRole
-        fields = ('title', 'description', 'embedding_vector')
-
-        extra_kwargs = {
-            'embedding_vector': {'write_only': True}
-        }
+        # The embedding is binary and set by the caller through serializer.save(**vector_fields(vector))
+        fields = ('title', 'description')
 
     def validate_title(self, value):
         if not value.strip():
@@ -20,4 +17,24 @@ class JobRoleSerializer(serializers.ModelSerializer):
     def validate_description(self, value):
         if len(value.strip()) < 100:
             raise serializers.ValidationError("Description must be at least 100 characters.")
-        return value
\ No newline at end of file
+        return value
+
+class JobRoleIngestSerializer(JobRoleSerializer):
+    """ Serializer: Validate one row of a bulk job description ingest """
+
+    metadata = serializers.DictField(required=False, default=dict)
+
+    class Meta(JobRoleSerializer.Meta):
+        fields = ('title', 'description', 'metadata')
+
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    """ Serializer: Status of a queued job description """
+
+    title = serializers.CharField(source='payload.title', read_only=True)
+
+    class Meta:
+        model = IngestJob
+        fields = ('id', 'title', 'status', 'stage', 'attempts', 'max_attempts', 'next_attempt_at', 'error',
+                  'job_role', 'created', 'updated', 'finished')
+        read_only_fields = fields
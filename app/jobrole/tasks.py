@@ -0,0 +1,222 @@
+"""
+Background ingestion queue backed by the IngestJob table, so no broker is needed.
+
+StoreJobRoleApiView only validates and enqueues. Workers (the run_ingest_worker command, or a
+thread of each web process with INGEST_QUEUE_LOCAL_WORKER) claim up to INGEST_QUEUE_BATCH_SIZE
+ready jobs at a time and run them through the ingestion stages together, so a batch becomes
+one index segment and one bulk insert. Claims are compare-and-set updates, so any number of
+worker threads and processes can share the queue on any database.
+
+A failed batch is retried job by job, so one bad description does not hold back the others;
+jobs that still fail are rescheduled with exponential backoff until max_attempts. The JobRole
+row is committed before the chunks are indexed, and a retry finds it and skips creating it
+again; only a failure between the index append and the final status update can leave
+duplicate chunks behind.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.jobrole.models import IngestJob, JobRole, vector_fields
+from app.jobrole.utils import extract_relevant_sections_with_llm
+from app.langchain_utils.store import iter_document_chunks, embed_in_batches
+from app.langchain_utils.vectorstore import embedding_model, vectorstore_manager
+
+logger = logging.getLogger('django')
+
+INGEST_STAGES = ("llm", "embed", "db", "index")
+
+
+class StageLimits:
+    """Bounded concurrency per ingestion stage, shared by all worker threads of the process."""
+
+    def __init__(self, llm: int, embed: int, index: int):
+        self._semaphores = {
+            "llm": threading.BoundedSemaphore(llm),
+            "embed": threading.BoundedSemaphore(embed),
+            "index": threading.BoundedSemaphore(index),
+        }
+
+    def __call__(self, stage):
+        return self._semaphores[stage]
+
+
+stage_limits = StageLimits(settings.INGEST_QUEUE_LLM_CONCURRENCY, settings.INGEST_QUEUE_EMBED_CONCURRENCY,
+                           settings.INGEST_QUEUE_INDEX_CONCURRENCY)
+
+
+def enqueue_job_description(title: str, description: str, metadata: dict = None) -> IngestJob:
+    job = IngestJob.objects.create(
+        payload={"title": title, "description": description, "metadata": metadata or {}},
+        max_attempts=settings.INGEST_QUEUE_MAX_ATTEMPTS,
+    )
+    if settings.INGEST_QUEUE_LOCAL_WORKER:
+        start_local_worker()
+    return job
+
+
+def claim_jobs(worker_id: str, limit: int) -> list[IngestJob]:
+    """
+    Claims up to limit ready jobs: queued ones whose retry time has come, and running ones whose
+    worker's lease expired. Each claim counts as an attempt.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.INGEST_QUEUE_LEASE_SECONDS)
+    IngestJob.objects.filter(status=IngestJob.STATUS_RUNNING, locked_at__lt=expired,
+                             attempts__gte=F("max_attempts")).update(
+        status=IngestJob.STATUS_FAILED, error="Worker stopped responding", locked_by="", finished=now)
+
+    ready = (Q(status=IngestJob.STATUS_QUEUED, next_attempt_at__lte=now) |
+             Q(status=IngestJob.STATUS_RUNNING, locked_at__lt=expired))
+    candidates = IngestJob.objects.filter(ready).order_by("next_attempt_at", "id").values_list(
+        "id", "status", "locked_at")[:limit * 2]
+
+    claimed = []
+    for job_id, status, locked_at in candidates:
+        # Only one worker's update matches the row as it was read
+        if IngestJob.objects.filter(id=job_id, status=status, locked_at=locked_at).update(
+                status=IngestJob.STATUS_RUNNING, stage="", locked_by=worker_id, locked_at=now,
+                attempts=F("attempts") + 1):
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return list(IngestJob.objects.filter(id__in=claimed, locked_by=worker_id).order_by("id"))
+
+
+def _set_stage(jobs, stage):
+    IngestJob.objects.filter(id__in=[job.id for job in jobs]).update(stage=stage)
+
+
+def _extract(description):
+    with stage_limits("llm"):
+        return extract_relevant_sections_with_llm(description)
+
+
+def process_batch(jobs: list[IngestJob]):
+    """Runs claimed jobs through the ingestion stages together and marks them succeeded; raises on failure."""
+    # A retried job may already have its JobRole from an attempt that failed while indexing
+    job_role_ids = dict(IngestJob.objects.filter(id__in=[job.id for job in jobs]).values_list("id", "job_role_id"))
+    payloads = [job.payload for job in jobs]
+
+    _set_stage(jobs, "llm")
+    with ThreadPoolExecutor(max_workers=min(len(jobs), settings.INGEST_QUEUE_LLM_CONCURRENCY)) as executor:
+        relevant_texts = list(executor.map(_extract, [payload["description"] for payload in payloads]))
+
+    _set_stage(jobs, "embed")
+    new_jobs = [index for index, job in enumerate(jobs) if job_role_ids.get(job.id) is None]
+    with stage_limits("embed"):
+        chunks = list(embed_in_batches(
+            doc
+            for payload, relevant_text in zip(payloads, relevant_texts)
+            for doc in iter_document_chunks(relevant_text,
+                                            {**payload["metadata"], "type": "job", "title": payload["title"]})
+        ))
+        description_embeddings = embedding_model.embed_documents([payloads[index]["description"]
+                                                                  for index in new_jobs])
+
+    # Rows first: a retry after a failed append finds its JobRole instead of creating another one
+    _set_stage(jobs, "db")
+    with transaction.atomic():
+        job_roles = JobRole.objects.bulk_create([
+            JobRole(title=payloads[index]["title"], description=payloads[index]["description"],
+                    **vector_fields(vector))
+            for index, vector in zip(new_jobs, description_embeddings)
+        ])
+        for index, job_role in zip(new_jobs, job_roles):
+            IngestJob.objects.filter(id=jobs[index].id).update(job_role=job_role)
+
+    # One segment for the whole batch
+    _set_stage(jobs, "index")
+    with stage_limits("index"):
+        if chunks:
+            vectorstore_manager.append_documents([doc.page_content for doc, _ in chunks],
+                                                 [vector for _, vector in chunks],
+                                                 [doc.metadata for doc, _ in chunks])
+
+    IngestJob.objects.filter(id__in=[job.id for job in jobs]).update(
+        status=IngestJob.STATUS_SUCCEEDED, stage="", error="", locked_by="", finished=timezone.now())
+
+
+def _retry_later(job, exc):
+    now = timezone.now()
+    error = f"{type(exc).__name__}: {exc}"
+    if job.attempts >= job.max_attempts:
+        IngestJob.objects.filter(id=job.id).update(status=IngestJob.STATUS_FAILED, error=error, locked_by="",
+                                                   finished=now)
+        logger.error(f"Ingest job {job.id} failed after {job.attempts} attempts: {error}")
+        return
+    # Full jitter, like the LLM client, so failed jobs do not come back in lockstep
+    delay = random.uniform(0, min(settings.INGEST_QUEUE_BACKOFF_MAX_SECONDS,
+                                  settings.INGEST_QUEUE_BACKOFF_BASE_SECONDS * 2 ** (job.attempts - 1)))
+    IngestJob.objects.filter(id=job.id).update(status=IngestJob.STATUS_QUEUED, error=error, locked_by="",
+                                               locked_at=None, next_attempt_at=now + timedelta(seconds=delay))
+
+
+class IngestWorker:
+    """Claims and processes batches of ingest jobs until stopped."""
+
+    def __init__(self, name: str = None, batch_size: int = None, poll_seconds: float = None):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size or settings.INGEST_QUEUE_BATCH_SIZE
+        self.poll_seconds = settings.INGEST_QUEUE_POLL_SECONDS if poll_seconds is None else poll_seconds
+
+    def run_once(self) -> int:
+        """Processes one batch; returns the number of jobs claimed."""
+        jobs = claim_jobs(self.name, self.batch_size)
+        if not jobs:
+            return 0
+        try:
+            process_batch(jobs)
+            return len(jobs)
+        except Exception as exc:
+            if len(jobs) == 1:
+                logger.warning(f"Ingest job {jobs[0].id} failed", exc_info=True)
+                _retry_later(jobs[0], exc)
+                return 1
+            logger.warning(f"Ingest batch of {len(jobs)} jobs failed, retrying them one by one", exc_info=True)
+
+        for job in jobs:
+            try:
+                process_batch([job])
+            except Exception as exc:
+                logger.warning(f"Ingest job {job.id} failed", exc_info=True)
+                _retry_later(job, exc)
+        return len(jobs)
+
+    def run(self, stop_event: threading.Event = None):
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                try:
+                    if self.run_once():
+                        continue
+                except Exception:
+                    # E.g. the database went away while claiming; drop the connections and try again after a pause
+                    logger.error(f"Ingest worker {self.name} failed", exc_info=True)
+                    connections.close_all()
+                stop_event.wait(self.poll_seconds)
+        finally:
+            connections.close_all()
+
+
+_local_worker = None
+_local_worker_lock = threading.Lock()
+
+
+def start_local_worker():
+    """Starts the in-process worker thread once per process."""
+    global _local_worker
+    with _local_worker_lock:
+        if _local_worker is None or not _local_worker.is_alive():
+            _local_worker = threading.Thread(target=IngestWorker().run, name="ingest-worker", daemon=True)
+            _local_worker.start()
@@ -1,3 +1,920 @@
-from django.test import TestCase
+import asyncio
+import io
+import math
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import faiss
+import numpy as np
+from django.apps import apps
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.jobrole import tasks
+from app.jobrole.apps import _serves_requests
+from app.jobrole.llm_cache import LLMResultCache
+from app.jobrole.llm_client import CircuitBreaker, LLMClient, LLMUnavailableError, StubLLMClient
+from app.jobrole.management.commands import reembed_vectorstore
+from app.jobrole.matrix_search import JobRoleMatrix
+from app.jobrole.models import IngestJob, JobRole, vector_fields
+from app.langchain_utils import search, store
+from app.langchain_utils.aggregation import aggregate_scores, document_key, rank_documents
+from app.langchain_utils.bm25 import BM25Index, tokenize
+from app.langchain_utils.chunking import iter_chunks, iter_sections
+from app.langchain_utils.docstore import documents_at
+from app.langchain_utils.embedding_cache import CachedEmbeddings
+from app.langchain_utils.embedding_server import (
+    ERROR_COUNT, HEADER, EmbeddingServer, MicroBatcher, RemoteEmbeddings, _recv_message, _send_message
+)
+from app.langchain_utils.index_factory import range_search, similarity_radius, to_similarity
+from app.langchain_utils.metadata_index import MetadataIndex
+from app.langchain_utils.vectorstore import VectorStoreManager
+
+DIMENSION = 8
+
+
+def _count_words(text):
+    return len(text.split())
+
+
+class _HashEmbeddings(Embeddings):
+    """Deterministic vectors, so the index tests do not load a model."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return np.random.default_rng(sum(text.encode())).standard_normal(DIMENSION).tolist()
+
+
+class IndexTestCase(TestCase):
+    """Runs against a VectorStoreManager in a temporary directory, embedding with _HashEmbeddings."""
+
+    def setUp(self):
+        self.index_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_path, ignore_errors=True)
+        self.embeddings = _HashEmbeddings()
+        # The placeholder index of an empty partition is embedded with the module's model
+        patcher = mock.patch("app.langchain_utils.vectorstore.embedding_model", self.embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _manager(self, index_path=None, **options):
+        return VectorStoreManager(index_path or self.index_path,
+                                  **{"check_interval": 0, "compact_after": 1000, "mmap": False,
+                                     "embeddings": self.embeddings, "embedding_id": "test", **options})
+
+    def _append(self, manager, texts, **metadata):
+        return manager.append_documents(texts, self.embeddings.embed_documents(texts),
+                                        [{"type": "job", "title": text, **metadata} for text in texts])
+
+    def _texts(self, manager):
+        vectorstore = manager.get()
+        return sorted(doc.page_content for doc in documents_at(vectorstore, range(vectorstore.index.ntotal))
+                      if doc.metadata.get("type") in ("job", "resume"))
+
+    def _segments(self, manager):
+        return sorted(os.listdir(manager.segments_path)) if os.path.exists(manager.segments_path) else []
+
+
+class ChunkingTests(TestCase):
+    TEXT = ("Intro sentence one. Intro sentence two.\n"
+            "## Responsibilities\n"
+            "- Build APIs with Django\n- Review pull requests\n- Mentor engineers on the team\n"
+            "**Requirements**\n"
+            "Five years of Python. Strong SQL skills. Comfortable with Docker and Kubernetes.\n")
+
+    def test_sections_split_at_headings(self):
+        sections = list(iter_sections(self.TEXT))
+        self.assertEqual([heading for heading, _ in sections], [None, "Responsibilities", "Requirements"])
+        self.assertEqual(sections[1][1], ["- Build APIs with Django", "- Review pull requests",
+                                          "- Mentor engineers on the team"])
+        self.assertEqual(len(sections[2][1]), 3)
+
+    def test_chunks_fit_the_budget_and_stay_in_their_section(self):
+        chunks = list(iter_chunks(self.TEXT, max_tokens=12, overlap_tokens=0, count_tokens=_count_words))
+        for chunk in chunks:
+            self.assertLessEqual(chunk.tokens, 12)
+            if chunk.section:
+                self.assertTrue(chunk.text.startswith(f"{chunk.section}\n"))
+        self.assertEqual({chunk.section for chunk in chunks}, {None, "Responsibilities", "Requirements"})
+        # Without overlap every unit is kept exactly once, in order
+        units = [unit for _, section_units in iter_sections(self.TEXT) for unit in section_units]
+        lines = [line for chunk in chunks for line in chunk.text.splitlines()[1 if chunk.section else 0:]]
+        self.assertEqual(lines, units)
+
+    def test_overlap_repeats_trailing_units(self):
+        text = "## Skills\n" + "\n".join(f"- skill number {i}" for i in range(6))
+        chunks = list(iter_chunks(text, max_tokens=14, overlap_tokens=4, count_tokens=_count_words))
+        self.assertGreater(len(chunks), 1)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.text.splitlines()[-1], chunk.text.splitlines()[1])
+
+    def test_long_unit_is_split_into_word_windows(self):
+        chunks = list(iter_chunks(" ".join(["word"] * 25), max_tokens=10, overlap_tokens=0,
+                                  count_tokens=_count_words))
+        self.assertTrue(all(chunk.tokens <= 10 for chunk in chunks))
+        self.assertEqual(sum(len(chunk.text.split()) for chunk in chunks), 25)
+
+
+@override_settings(EMBEDDING_BATCH_SIZE=2)
+class StoreDocumentsTests(IndexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = self._manager()
+        # Separate from the index's embeddings, which also embed its placeholder
+        self.chunk_embeddings = _HashEmbeddings()
+        for target, value in (("embedding_model", self.chunk_embeddings), ("partition_manager", lambda _: self.manager),
+                              ("iter_chunks", lambda text: iter_chunks(text, max_tokens=12, overlap_tokens=0,
+                                                                       count_tokens=_count_words))):
+            patcher = mock.patch.object(store, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_chunk_total_is_filled_once_the_document_ends(self):
+        docs = store.iter_document_chunks(ChunkingTests.TEXT, {"type": "job"})
+        first = next(docs)
+        self.assertNotIn("chunk_total", first.metadata)
+        rest = list(docs)
+        self.assertEqual({doc.metadata["chunk_total"] for doc in [first] + rest}, {len(rest) + 1})
+        self.assertEqual([doc.metadata["chunk_index"] for doc in [first] + rest], list(range(len(rest) + 1)))
+
+    def test_one_segment_per_call_with_batched_embedding(self):
+        docs = (doc
+                for text, title in ((ChunkingTests.TEXT, "a"), ("Short one. Another sentence.", "b"))
+                for doc in store.iter_document_chunks(text, {"type": "job", "title": title}))
+
+        stored = store.store_documents(docs)
+
+        self.assertGreater(stored, 2)
+        self.assertEqual(self.chunk_embeddings.calls, (stored + 1) // 2)
+        segments = self._segments(self.manager)
+        self.assertEqual(len(segments), 1)
+        metadatas = [doc["metadata"] for doc in self.manager._read_segment(segments[0])[1]]
+        self.assertEqual(len(metadatas), stored)
+        self.assertTrue(all("chunk_total" in metadata for metadata in metadatas))
+
+    def test_chunks_are_split_by_partition(self):
+        resume_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, resume_path, ignore_errors=True)
+        managers = {"job": self.manager, "resume": self._manager(resume_path)}
+
+        with mock.patch.object(store, "partition_manager", managers.get):
+            store.store_documents([Document(page_content="job chunk", metadata={"type": "job"}),
+                                   Document(page_content="resume chunk", metadata={"type": "resume"}),
+                                   Document(page_content="job chunk 2", metadata={"type": "job"})])
+
+        self.assertEqual(self._texts(managers["job"]), ["job chunk", "job chunk 2"])
+        self.assertEqual(self._texts(managers["resume"]), ["resume chunk"])
+        self.assertEqual(len(self._segments(managers["job"])), 1)
+
+
+class SegmentCompactionTests(IndexTestCase):
+
+    def test_appended_segments_survive_compaction_exactly_once(self):
+        manager = self._manager()
+        expected = []
+        for segment in range(3):
+            texts = [f"segment {segment} chunk {chunk}" for chunk in range(4)]
+            self._append(manager, texts)
+            expected.extend(texts)
+
+        self.assertEqual(self._texts(manager), sorted(expected))
+
+        self.assertTrue(manager.compact())
+        self.assertEqual(manager.stats()["pending_segments"], 0)
+        self.assertEqual(self._texts(manager), sorted(expected))
+        # A process starting after the compaction loads the same chunks from the new generation alone
+        self.assertEqual(self._texts(self._manager()), sorted(expected))
+
+        self._append(manager, ["late chunk"])
+        manager.compact()
+        self.assertEqual(self._texts(self._manager()), sorted(expected + ["late chunk"]))
+
+    def test_load_racing_a_compaction_retries_from_the_new_manifest(self):
+        writer = self._manager()
+        texts = [f"chunk {position}" for position in range(3)]
+        for text in texts:
+            self._append(writer, [text])
+
+        reader = self._manager()
+        read_segment = reader._read_segment
+        compacted = []
+
+        def compact_then_read(name):
+            # Another process compacts after this one read the manifest and listed its segments
+            if not compacted:
+                compacted.append(writer.compact())
+            return read_segment(name)
+
+        with mock.patch.object(reader, "_read_segment", side_effect=compact_then_read):
+            self.assertEqual(self._texts(reader), texts)
+        self.assertEqual(compacted, [True])
+        self.assertEqual(reader._manifest["version"], writer._read_manifest()["version"])
+
+
+class SavedSideIndexTests(IndexTestCase):
+    TEXTS = ["Senior Python developer, Django and PostgreSQL", "Frontend engineer with React",
+             "Python data engineer with Spark", "DevOps engineer, Kubernetes and Terraform"]
+
+    def setUp(self):
+        super().setUp()
+        self.writer = self._manager()
+        for position, text in enumerate(self.TEXTS):
+            self._append(self.writer, [text], job_id=position, location="Berlin" if position % 2 else "Paris")
+        self.writer.compact()
+
+    def _assert_match_rebuilt(self, indexes):
+        docs = documents_at(indexes.vectorstore, range(indexes.vectorstore.index.ntotal))
+        lexical, metadata = BM25Index(), MetadataIndex()
+        lexical.add(doc.page_content for doc in docs)
+        metadata.add(doc.metadata for doc in docs)
+
+        for query in ("python engineer", "react", "kubernetes terraform", "cobol"):
+            np.testing.assert_allclose(indexes.lexical.scores(query), lexical.scores(query), rtol=1e-6)
+        for filters in ({"filter_type": "job"}, {"location": "berlin"}, {"include_titles": ["engineer"]},
+                        {"include_titles": ["python"], "location": "Paris"}, {"job_id": 99}):
+            np.testing.assert_array_equal(indexes.metadata.select(**filters), metadata.select(**filters))
+
+    def test_mapped_load_reads_the_saved_indexes(self):
+        reader = self._manager(mmap=True)
+        with mock.patch.object(VectorStoreManager, "_build_side_indexes") as build, reader.read_indexes() as indexes:
+            build.assert_not_called()
+            self.assertIsNotNone(indexes.lexical._saved)
+            self._assert_match_rebuilt(indexes)
+
+    def test_documents_appended_after_the_generation_are_searchable(self):
+        self._append(self.writer, ["Python backend engineer, Django"], job_id=10, location="Berlin")
+        reader = self._manager(mmap=True)
+        with reader.read_indexes() as indexes:
+            self.assertEqual(indexes.lexical.num_docs, indexes.vectorstore.index.ntotal)
+            self._assert_match_rebuilt(indexes)
+            self.assertIn(indexes.vectorstore.index.ntotal - 1, indexes.metadata.ids("job_id", 10))
+
+    def test_compaction_removes_the_previous_generation_files(self):
+        previous = self.writer._read_manifest()["index_name"]
+        # The generation right before the current one is kept for readers of the old manifest
+        for text in ("QA engineer", "Data analyst"):
+            self._append(self.writer, [text])
+            self.writer.compact()
+
+        self.assertEqual([name for name in os.listdir(self.index_path) if name.startswith(f"{previous}.")], [])
+        with self._manager(mmap=True).read_indexes() as indexes:
+            self._assert_match_rebuilt(indexes)
+
+
+class CachedEmbeddingsTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache_path = os.path.join(directory, "cache", "embeddings.sqlite3")
+        self.embeddings = _HashEmbeddings()
+        self.cache = CachedEmbeddings(self.embeddings, "test", cache_path=self.cache_path)
+
+    def test_nothing_is_opened_until_first_use(self):
+        self.assertFalse(os.path.exists(os.path.dirname(self.cache_path)))
+
+        vector = self.cache.embed_query("python developer")
+
+        self.assertEqual(vector, self.embeddings.embed_query("python developer"))
+        self.assertTrue(os.path.exists(self.cache_path))
+
+    def test_repeated_texts_are_served_from_memory_then_disk(self):
+        self.cache.embed_documents(["a  b", "c", "a b"])
+        self.assertEqual(self.embeddings.calls, 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+        restarted = CachedEmbeddings(self.embeddings, "test", cache_path=self.cache_path)
+        restarted.embed_documents(["a b", "c"])
+        self.assertEqual(self.embeddings.calls, 1)
+        self.assertEqual(restarted.stats()["disk_hits"], 2)
+
+    def test_forked_process_opens_its_own_connection(self):
+        self.cache.embed_query("python developer")
+        parent_connection = self.cache._connection()
+
+        with mock.patch("app.langchain_utils.embedding_cache.os.getpid", return_value=os.getpid() + 1):
+            child_connection = self.cache._connection()
+            self.assertIsNot(child_connection, parent_connection)
+            self.assertIs(self.cache._connection(), child_connection)
+
+
+class _ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _AsyncProvider:
+    """Async provider client that records the event loop of each call."""
+
+    def __init__(self):
+        self.loops = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **kwargs):
+        self.loops.append(asyncio.get_running_loop())
+        return StubLLMClient().chat.completions.create(model, messages)
+
+
+class LLMClientTests(TestCase):
+
+    def _client(self, responses, **options):
+        stub = StubLLMClient()
+        responses = iter(responses)
+
+        def create(model, messages, **kwargs):
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return StubLLMClient(lambda model, prompt: response).chat.completions.create(model, messages)
+
+        stub.chat.completions.create = create
+        return LLMClient(stub, **{"backoff_base": 0, **options})
+
+    def test_retryable_errors_are_retried(self):
+        client = self._client([_ProviderError(429), ConnectionError(), " done "], max_retries=2)
+        self.assertEqual(client.complete("model", "prompt"), "done")
+        self.assertEqual(client.stats()["retries"], 2)
+
+    def test_client_errors_fail_without_retrying(self):
+        client = self._client([_ProviderError(400), "unused"])
+        with self.assertRaises(LLMUnavailableError):
+            client.complete("model", "prompt")
+        self.assertEqual(client.stats()["retries"], 0)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        client = self._client([_ProviderError(500)] * 2, max_retries=0,
+                              breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailableError):
+                client.complete("model", "prompt")
+        with self.assertRaisesRegex(LLMUnavailableError, "circuit"):
+            client.complete("model", "prompt")
+        self.assertEqual(client.stats()["circuit_rejections"], 1)
+
+    def test_async_provider_clients_are_built_per_event_loop(self):
+        providers = []
+
+        def factory():
+            providers.append(_AsyncProvider())
+            return providers[-1]
+
+        client = LLMClient(StubLLMClient(), async_client_factory=factory)
+
+        async def complete_twice():
+            return [await client.acomplete("model", "prompt") for _ in range(2)]
+
+        # async_to_sync runs every call on a new event loop
+        for _ in range(2):
+            self.assertEqual(asyncio.run(complete_twice()), ["prompt", "prompt"])
+
+        self.assertEqual(len(providers), 2)
+        for provider in providers:
+            self.assertEqual(len(provider.loops), 2)
+            self.assertIs(provider.loops[0], provider.loops[1])
+
+
+class _BlockingEmbeddings(_HashEmbeddings):
+    """Embeds only once released, so a test can hold requests in flight."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.release.wait(5)
+        return super().embed_documents(texts)
+
+
+class EmbeddingServerTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.socket_path = os.path.join(directory, "embeddings.sock")
+        self.embeddings = _BlockingEmbeddings()
+        self.embeddings.release.set()
+
+    def _serve(self):
+        server = EmbeddingServer(self.socket_path, self.embeddings, max_wait=0.001)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_remote_vectors_match_the_served_model(self):
+        self._serve()
+        remote = RemoteEmbeddings(self.socket_path)
+        vectors = remote.embed_documents(["python", "django"])
+        np.testing.assert_allclose(vectors, self.embeddings.embed_documents(["python", "django"]), rtol=1e-6)
+        self.assertEqual(remote.stats()["remote_calls"], 1)
+
+    def test_malformed_request_gets_an_error_and_the_connection_stays_usable(self):
+        self._serve()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(self.socket_path)
+            for payload in (b"not json", b'{"texts": [1]}'):
+                _send_message(sock, payload)
+                response = _recv_message(sock)
+                self.assertEqual(HEADER.unpack_from(response)[0], ERROR_COUNT)
+
+            _send_message(sock, b'{"texts": ["python"]}')
+            self.assertEqual(HEADER.unpack_from(_recv_message(sock)), (1, DIMENSION))
+
+    def test_missing_server_falls_back_to_in_process_embeddings(self):
+        fallback = _HashEmbeddings()
+        remote = RemoteEmbeddings(self.socket_path, fallback=fallback)
+        self.assertEqual(remote.embed_query("python"), fallback.embed_query("python"))
+        self.assertEqual(remote.stats()["fallback_calls"], 1)
+
+    def test_timeouts_are_raised_instead_of_falling_back(self):
+        self._serve()
+        self.embeddings.release.clear()
+        self.addCleanup(self.embeddings.release.set)
+        fallback = _HashEmbeddings()
+        remote = RemoteEmbeddings(self.socket_path, fallback=fallback, timeout=0.1)
+        with self.assertRaises(TimeoutError):
+            remote.embed_query("python")
+        self.assertEqual(fallback.calls, 0)
+
+    def test_concurrent_requests_share_a_batch(self):
+        batcher = MicroBatcher(self.embeddings, max_batch=4, max_wait=5)
+        # Submitted well within max_wait, so the batch is flushed once it holds max_batch texts
+        futures = [batcher.submit([f"text {position}"]) for position in range(4)]
+
+        for position, future in enumerate(futures):
+            np.testing.assert_allclose(future.result(5)[0], self.embeddings.embed_query(f"text {position}"),
+                                       rtol=1e-6)
+        self.assertEqual(batcher.stats()["batches"], 1)
+        self.assertEqual(batcher.stats()["largest_batch"], 4)
+
+
+class ReembedRowsTests(TestCase):
+
+    def test_rows_are_embedded_one_batch_per_model_call(self):
+        for position in range(3):
+            JobRole.objects.create(title=f"Role {position}", description=f"Description of role {position}")
+        embeddings = _HashEmbeddings()
+        model, text_field, fields = reembed_vectorstore.EMBEDDED_ROWS[0]
+
+        converted = reembed_vectorstore.Command(stdout=io.StringIO())._reembed_rows(
+            model, text_field, fields, embeddings, batch_size=2)
+
+        self.assertEqual(converted, 3)
+        self.assertEqual(embeddings.calls, 2)
+        for job_role in JobRole.objects.all():
+            np.testing.assert_allclose(job_role.vector, embeddings.embed_query(job_role.description), rtol=1e-6)
+
+
+def _job(**fields):
+    return IngestJob.objects.create(payload={"title": "Engineer", "description": "Builds things", "metadata": {}},
+                                    **fields)
+
+
+class ClaimJobsTests(TestCase):
+
+    def test_workers_claim_disjoint_jobs(self):
+        jobs = [_job() for _ in range(5)]
+
+        first = tasks.claim_jobs("worker-a", 3)
+        second = tasks.claim_jobs("worker-b", 10)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertEqual({job.id for job in first} | {job.id for job in second}, {job.id for job in jobs})
+        self.assertTrue(all(job.status == IngestJob.STATUS_RUNNING and job.attempts == 1 for job in first + second))
+
+    def test_stale_candidates_lose_the_compare_and_set(self):
+        _job()
+        _job()
+        values_list = QuerySet.values_list
+        claimed_by_a = []
+
+        def read_then_race(queryset, *fields, **kwargs):
+            # worker-b reads the candidates, then worker-a claims them before worker-b's updates run
+            rows = list(values_list(queryset, *fields, **kwargs))
+            with mock.patch.object(QuerySet, "values_list", values_list):
+                claimed_by_a.extend(tasks.claim_jobs("worker-a", 10))
+            return rows
+
+        with mock.patch.object(QuerySet, "values_list", read_then_race):
+            claimed_by_b = tasks.claim_jobs("worker-b", 10)
+
+        self.assertEqual(len(claimed_by_a), 2)
+        self.assertEqual(claimed_by_b, [])
+        self.assertEqual(set(IngestJob.objects.values_list("locked_by", flat=True)), {"worker-a"})
+        self.assertEqual(set(IngestJob.objects.values_list("attempts", flat=True)), {1})
+
+    @override_settings(INGEST_QUEUE_LEASE_SECONDS=60)
+    def test_expired_lease_is_reclaimed_or_failed(self):
+        expired = timezone.now() - timedelta(seconds=120)
+        retried = _job(status=IngestJob.STATUS_RUNNING, locked_by="gone", locked_at=expired, attempts=1)
+        exhausted = _job(status=IngestJob.STATUS_RUNNING, locked_by="gone", locked_at=expired, attempts=5,
+                         max_attempts=5)
+        held = _job(status=IngestJob.STATUS_RUNNING, locked_by="alive", locked_at=timezone.now(), attempts=1)
+
+        claimed = tasks.claim_jobs("worker-a", 10)
+
+        self.assertEqual([job.id for job in claimed], [retried.id])
+        self.assertEqual(claimed[0].attempts, 2)
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, IngestJob.STATUS_FAILED)
+        held.refresh_from_db()
+        self.assertEqual(held.locked_by, "alive")
+
+
+@override_settings(INGEST_QUEUE_BACKOFF_BASE_SECONDS=10, INGEST_QUEUE_BACKOFF_MAX_SECONDS=100)
+class RetryLaterTests(TestCase):
+
+    def _retry(self, job, bound):
+        with mock.patch.object(tasks.random, "uniform", side_effect=lambda low, high: high) as uniform:
+            tasks._retry_later(job, RuntimeError("boom"))
+        uniform.assert_called_once_with(0, bound)
+        job.refresh_from_db()
+        return job
+
+    def test_backoff_doubles_per_attempt(self):
+        before = timezone.now()
+        job = self._retry(_job(status=IngestJob.STATUS_RUNNING, locked_by="worker-a", attempts=3), 40)
+
+        self.assertEqual(job.status, IngestJob.STATUS_QUEUED)
+        self.assertEqual(job.locked_by, "")
+        self.assertEqual(job.error, "RuntimeError: boom")
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=40))
+
+    def test_backoff_is_capped(self):
+        self._retry(_job(status=IngestJob.STATUS_RUNNING, attempts=9, max_attempts=20), 100)
+
+    def test_last_attempt_fails_the_job(self):
+        job = _job(status=IngestJob.STATUS_RUNNING, locked_by="worker-a", attempts=5, max_attempts=5)
+
+        tasks._retry_later(job, RuntimeError("boom"))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_FAILED)
+        self.assertEqual(job.error, "RuntimeError: boom")
+        self.assertIsNotNone(job.finished)
+
+
+class LocalWorkerStartupTests(TestCase):
+
+    def test_only_serving_processes_start_the_worker(self):
+        for argv, environ, serves in ((["gunicorn", "app.wsgi"], {}, True),
+                                      (["manage.py", "migrate"], {}, False),
+                                      (["manage.py", "run_ingest_worker"], {}, False),
+                                      (["manage.py", "runserver"], {}, False),
+                                      (["manage.py", "runserver"], {"RUN_MAIN": "true"}, True),
+                                      (["manage.py", "runserver", "--noreload"], {}, True)):
+            with self.subTest(argv=argv, environ=environ), mock.patch.dict(os.environ, environ):
+                self.assertEqual(_serves_requests(argv), serves)
+
+    def test_ready_starts_the_worker_when_enabled(self):
+        config = apps.get_app_config("jobrole")
+        for enabled in (False, True):
+            with self.subTest(enabled=enabled), override_settings(INGEST_QUEUE_LOCAL_WORKER=enabled), \
+                    mock.patch("app.jobrole.apps.sys.argv", ["gunicorn", "app.wsgi"]), \
+                    mock.patch.object(tasks, "start_local_worker") as start_local_worker:
+                config.ready()
+            self.assertEqual(start_local_worker.called, enabled)
+
+
+class LLMResultCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache_path = os.path.join(directory, "cache", "llm.sqlite3")
+        self.cache = LLMResultCache(self.cache_path, ttl_seconds=60)
+
+    def test_results_persist_and_expire(self):
+        self.assertFalse(os.path.exists(os.path.dirname(self.cache_path)))
+        self.cache.set("key", "value")
+
+        restarted = LLMResultCache(self.cache_path, ttl_seconds=60)
+        self.assertEqual(restarted.get("key"), "value")
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+        with mock.patch("app.jobrole.llm_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(LLMResultCache(self.cache_path, ttl_seconds=60).get("key"))
+
+    def test_concurrent_misses_compute_once(self):
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_compute("key", compute)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        # Followers wait on the leader's call rather than starting their own
+        deadline = time.monotonic() + 5
+        while self.cache.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, ["value"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_async_misses_compute_once(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def burst():
+            return await asyncio.gather(*(self.cache.aget_or_compute("key", compute) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(burst()), ["value"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.get("key"), "value")
+
+
+class BM25IndexTests(TestCase):
+    TEXTS = ["Python developer with Django", "Python", "Java developer, Spring and C++"]
+
+    def setUp(self):
+        self.index = BM25Index(k1=1.5, b=0.75)
+        self.index.add(self.TEXTS)
+
+    def test_skill_tokens_are_kept_whole(self):
+        self.assertEqual(tokenize("C++, C# and Node.js."), ["c++", "c#", "and", "node.js"])
+
+    def test_scores_follow_okapi_bm25(self):
+        lengths = [len(tokenize(text)) for text in self.TEXTS]
+        average = sum(lengths) / len(lengths)
+        idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+        expected = [idf * 2.5 / (1 + 1.5 * (0.25 + 0.75 * length / average)) for length in lengths[:2]] + [0]
+
+        np.testing.assert_allclose(self.index.scores("python"), expected, rtol=1e-6)
+
+    def test_search_ranks_within_candidates(self):
+        positions, scores = self.index.search("python developer", 3)
+        self.assertEqual(positions[0], 0)
+        self.assertEqual(sorted(positions.tolist()), [0, 1, 2])
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+        positions, _ = self.index.search("python developer", 3, candidates=np.array([1, 2]))
+        self.assertEqual(sorted(positions.tolist()), [1, 2])
+        self.assertEqual(self.index.search("cobol", 3)[0].tolist(), [])
+
+
+class HybridSearchTests(IndexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = self._manager()
+        for target, value in (("embedding_model", self.embeddings), ("partition_manager", lambda _: self.manager)):
+            patcher = mock.patch.object(search, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fusion_favours_candidates_found_by_both_sides(self):
+        for method in ("rrf", "weighted"):
+            with self.subTest(method=method):
+                positions, scores = search.fuse_rankings(np.array([5, 7, 9]), np.array([0.9, 0.85, 0.1]),
+                                                         np.array([7, 3, 9]), np.array([4.0, 3.9, 0.1]),
+                                                         method=method)
+                self.assertEqual(positions[0], 7)
+                self.assertEqual(sorted(positions.tolist()), [3, 5, 7, 9])
+                self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_alpha_selects_one_side(self):
+        dense_only, _ = search.fuse_rankings(np.array([5, 7]), np.array([0.9, 0.8]), np.array([3]), np.array([4.0]),
+                                             alpha=1.0)
+        self.assertEqual(dense_only[:2].tolist(), [5, 7])
+        lexical_only, _ = search.fuse_rankings(np.array([5]), np.array([0.9]), np.array([3, 7]), np.array([4.0, 1.0]),
+                                               alpha=0.0)
+        self.assertEqual(lexical_only[:2].tolist(), [3, 7])
+
+    def test_exact_skill_token_surfaces_through_the_lexical_side(self):
+        texts = [f"Generic engineering role number {position}" for position in range(20)]
+        self._append(self.manager, texts + ["Embedded engineer writing Rust firmware"])
+
+        results = search.hybrid_search("rust", top_k=3, filter_type="job", alpha=0.3)
+
+        self.assertEqual(results[0]["content"], "Embedded engineer writing Rust firmware")
+        self.assertIsNotNone(results[0]["lexical_score"])
+        self.assertTrue(all(result["metadata"]["type"] == "job" for result in results))
+
+
+class MetadataPrefilterTests(IndexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = self._manager()
+        self.jobs = [f"Backend engineer {position}" for position in range(10)]
+        self._append(self.manager, self.jobs, location="Berlin")
+        self._append(self.manager, ["Frontend Engineer"], location=" berlin ", job_id=42)
+        self.manager.append_documents(["Resume of a backend engineer"],
+                                      self.embeddings.embed_documents(["Resume of a backend engineer"]),
+                                      [{"type": "resume", "title": "Backend"}])
+        patcher = mock.patch.object(search, "partition_manager", lambda _: self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_select_intersects_normalized_values(self):
+        metadata = MetadataIndex()
+        metadata.add([{"type": "job", "title": "Senior Backend Engineer", "location": "Berlin"},
+                      {"type": "job", "title": "Frontend", "location": "Paris"},
+                      {"type": "resume", "title": "Backend", "location": "BERLIN "}])
+
+        self.assertIsNone(metadata.select())
+        self.assertEqual(metadata.select("job", location="berlin").tolist(), [0])
+        self.assertEqual(metadata.select(include_titles=["backend"]).tolist(), [0, 2])
+        self.assertEqual(metadata.select("job", include_titles=["backend", "front"]).tolist(), [0, 1])
+        self.assertEqual(metadata.select(job_id=7).tolist(), [])
+
+    def test_search_returns_k_matching_chunks_without_over_fetching(self):
+        query = self.embeddings.embed_query("engineer")
+
+        results = search.similarity_search_by_vector(query, k=5, filter_type="job", location="Berlin")
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(doc.metadata["type"] == "job" for doc, _ in results))
+
+        results = search.similarity_search_by_vector(query, k=5, filter_type="job", job_id=42)
+        self.assertEqual([doc.page_content for doc, _ in results], ["Frontend Engineer"])
+
+        results = search.similarity_search_by_vector(query, k=5, filter_type="resume")
+        self.assertEqual([doc.page_content for doc, _ in results], ["Resume of a backend engineer"])
+
+
+class AggregationTests(TestCase):
+    GROUPS = [0, 0, 0, 1]
+    SCORES = [0.9, 0.6, 0.3, 0.8]
+
+    def _aggregate(self, strategy, **options):
+        ranking, scores, best_chunk, counts = aggregate_scores(self.GROUPS, self.SCORES, strategy=strategy, **options)
+        return dict(zip(ranking.tolist(), scores.tolist())), dict(zip(ranking.tolist(), best_chunk.tolist()))
+
+    def test_strategies(self):
+        self.assertEqual(self._aggregate("max")[0], {0: 0.9, 1: 0.8})
+        np.testing.assert_allclose(list(self._aggregate("mean")[0].values()), [0.8, 0.6])
+        np.testing.assert_allclose(self._aggregate("top_m_mean", top_m=2)[0][0], 0.75)
+        softmax = self._aggregate("softmax", temperature=0.1)[0][0]
+        self.assertTrue(0.6 < softmax < 0.9)
+        self.assertEqual(self._aggregate("mean")[1], {0: 0, 1: 3})
+
+    def test_top_m_mean_does_not_penalize_single_chunk_documents(self):
+        scores, _ = self._aggregate("top_m_mean", top_m=3, chunk_totals=np.array([5, 5, 5, 1]))
+        np.testing.assert_allclose([scores[0], scores[1]], [0.6, 0.8])
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            aggregate_scores(self.GROUPS, self.SCORES, strategy="median")
+
+    def test_documents_are_grouped_by_their_ids(self):
+        self.assertEqual(document_key({"resume_id": 3, "title": "x"}, 0), "resume:3")
+        self.assertEqual(document_key({"job_id": 7, "title": "x"}, 0), "7")
+        self.assertEqual(document_key({}, 4), "chunk:4")
+
+        docs = [Document(page_content=text, metadata={"job_id": job_id})
+                for text, job_id in (("a1", 1), ("b1", 2), ("a2", 1))]
+        ranked = rank_documents(docs, [0.5, 0.7, 0.6], top_k=5, strategy="mean")
+        self.assertEqual([(best, matched) for best, _, matched in ranked], [(1, 1), (2, 2)])
+
+
+class CosineSimilarityTests(IndexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(11)
+        self.vectors = rng.standard_normal((50, DIMENSION)).astype(np.float32)
+        faiss.normalize_L2(self.vectors)
+        self.query = self.vectors[:1] + rng.standard_normal((1, DIMENSION)).astype(np.float32) * 0.3
+        faiss.normalize_L2(self.query)
+        self.expected = np.clip((1 + self.vectors @ self.query[0]) / 2, 0, 1)
+
+    def _indexes(self):
+        for index in (faiss.IndexFlatIP(DIMENSION), faiss.IndexFlatL2(DIMENSION)):
+            index.add(self.vectors)
+            yield index
+
+    def test_inner_product_and_l2_agree_for_unit_vectors(self):
+        for index in self._indexes():
+            with self.subTest(metric=index.metric_type):
+                raw, positions = index.search(self.query, 10)
+                np.testing.assert_allclose(to_similarity(index, raw[0]), self.expected[positions[0]], atol=1e-5)
+                self.assertAlmostEqual(float(to_similarity(index, np.float32([similarity_radius(index, 0.8)]))[0]),
+                                       0.8, places=5)
+
+    def test_range_search_keeps_only_matches_above_the_threshold(self):
+        threshold = float(np.sort(self.expected)[-8])
+        for index in self._indexes():
+            with self.subTest(metric=index.metric_type):
+                positions, similarities = range_search(index, self.query, threshold - 1e-4, k=5)
+                self.assertEqual(positions.tolist(), np.argsort(-self.expected)[:5].tolist())
+                self.assertTrue(np.all(np.diff(similarities) <= 0))
+                self.assertEqual(len(range_search(index, self.query, threshold - 1e-4, k=50)[0]), 8)
+
+    @override_settings(VECTORSTORE_METRIC="cosine")
+    def test_searches_return_cosine_similarities(self):
+        manager = self._manager()
+        texts = ["Python developer", "Data engineer", "Product designer"]
+        self._append(manager, texts)
+        manager.compact()
+        self.assertEqual(manager._read_manifest()["metric"], "cosine")
+
+        query = self.embeddings.embed_query("Python developer")
+        with mock.patch.object(search, "partition_manager", lambda _: manager):
+            results = search.similarity_search_by_vector(query, k=3, filter_type="job")
+            self.assertEqual(results[0][0].page_content, "Python developer")
+            self.assertAlmostEqual(results[0][1], 1.0, places=5)
+            pruned = search.similarity_search_by_vector(query, k=3, filter_type="job", min_score=0.99)
+        self.assertEqual([doc.page_content for doc, _ in pruned], ["Python developer"])
+
+
+@override_settings(JOBROLE_EMBEDDING_DTYPE="float32")
+class JobRoleMatrixTests(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        self.rng = np.random.default_rng(13)
+        self.job_roles = [self._job_role(f"Role {position}") for position in range(6)]
+        self.matrix = self._matrix()
+        self.matrix.sync()
+
+    def _job_role(self, title):
+        return JobRole.objects.create(title=title, description=title, **vector_fields(self._vector()))
+
+    def _vector(self):
+        vector = self.rng.standard_normal(DIMENSION).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _matrix(self):
+        return JobRoleMatrix(self.path, sync_interval=0, background_sync=False)
+
+    def _brute_force(self, query, k):
+        job_roles = [job_role for job_role in JobRole.objects.filter(is_active=True)]
+        similarities = np.array([(1 + job_role.vector @ query) / 2 for job_role in job_roles])
+        order = np.argsort(-similarities, kind="stable")[:k]
+        return [job_roles[position].id for position in order], similarities[order]
+
+    def _assert_matches_brute_force(self, matrix, k=4):
+        query = self._vector()
+        ids, similarities = matrix.search(query, k)
+        expected_ids, expected_similarities = self._brute_force(query, k)
+        self.assertEqual(ids.tolist(), expected_ids)
+        np.testing.assert_allclose(similarities, expected_similarities, rtol=1e-5)
+
+    def test_search_matches_brute_force_and_is_read_only(self):
+        reader = self._matrix()
+        self._assert_matches_brute_force(reader)
+        self.assertFalse(reader._vectors.flags.writeable)
+
+    def test_changed_and_deactivated_roles_are_synced(self):
+        changed, deactivated = self.job_roles[:2]
+        changed.__dict__.update(vector_fields(self._vector()))
+        changed.save()
+        deactivated.is_active = False
+        deactivated.save()
+        added = self._job_role("Added")
+
+        self.matrix.sync()
+        reader = self._matrix()
+        self._assert_matches_brute_force(reader, k=10)
+        self.assertNotIn(deactivated.id, reader.search(self._vector(), 10)[0].tolist())
+        self.assertIn(added.id, reader.search(self._vector(), 10)[0].tolist())
+
+        # The replaced row of the changed role is retired one sync later, once readers see its new row
+        self.assertEqual(reader.stats()["active_rows"], 7)
+        self.matrix.sync()
+        reader._load()
+        self.assertEqual(reader.stats()["active_rows"], 6)
+
+    def test_full_capacity_moves_to_a_larger_generation(self):
+        generation = self.matrix._read_manifest()["generation"]
+        for position in range(20):
+            self._job_role(f"New role {position}")
+
+        self.matrix.sync()
+
+        self.assertNotEqual(self.matrix._read_manifest()["generation"], generation)
+        self._assert_matches_brute_force(self._matrix(), k=10)
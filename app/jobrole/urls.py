@@ -1,12 +1,27 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 
+from app.jobrole.async_views import AsyncStoreJobRoleView, AsyncHybridSearchView, \
+    AsyncCandidateSearchFromResumeTextView, AsyncCandidateSearchStreamView
 from app.jobrole.views import HybridSearchApiView, CandidateSearchFromResumeTextApiView, \
-    StoreJobRoleApiView
+    StoreJobRoleApiView, VectorStoreStatsApiView, StoreJobRoleBulkApiView, IngestJobStatusApiView
 
 urlpatterns = [
 
     path('store-jd', StoreJobRoleApiView.as_view(), name='store-jd-or-resume'),
+    path('ingest-jobs/<int:job_id>', IngestJobStatusApiView.as_view(), name='ingest-job-status'),
+    path('store-jd-bulk', StoreJobRoleBulkApiView.as_view(), name='store-jd-bulk'),
     path("hybrid-search/", HybridSearchApiView.as_view(), name="hybrid_search"),
     path("search-jobs-by-resume/", CandidateSearchFromResumeTextApiView.as_view(), name="search_jobs_by_resume"),
 
+    # Async endpoints for ASGI workers
+    path('async/store-jd', csrf_exempt(AsyncStoreJobRoleView.as_view()), name='async-store-jd'),
+    path("async/hybrid-search/", csrf_exempt(AsyncHybridSearchView.as_view()), name="async_hybrid_search"),
+    path("async/search-jobs-by-resume/", csrf_exempt(AsyncCandidateSearchFromResumeTextView.as_view()),
+         name="async_search_jobs_by_resume"),
+    path("async/search-jobs-by-resume/stream/", csrf_exempt(AsyncCandidateSearchStreamView.as_view()),
+         name="async_search_jobs_by_resume_stream"),
+
+    path("vectorstore-stats/", VectorStoreStatsApiView.as_view(), name="vectorstore_stats"),
+
 ]
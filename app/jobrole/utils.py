@@ -1,38 +1,77 @@
-import os
+import logging
 
-from dotenv import load_dotenv
-from groq import Groq
+from django.conf import settings
 
-load_dotenv()
+from app.jobrole.llm_cache import LLMResultCache, prompt_key
+from app.jobrole.llm_client import get_llm_client, LLMUnavailableError
 
+logger = logging.getLogger('django')
 
-def extract_relevant_sections_with_llm(text: str) -> str:
+llm_cache = LLMResultCache(
+    cache_path=settings.LLM_CACHE_PATH,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+)
+
+
+def complete_with_llm(prompt: str, model: str = None) -> str:
     """
-    Uses Groq LLM to extract relevant sections like Responsibilities, Requirements, Skills, and Summary.
+    Runs a single-message chat completion, served from the result cache when possible.
+    Identical concurrent prompts share one upstream call.
+    Raises LLMUnavailableError when the provider is failing; errors are never cached.
     """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    model = model or settings.LLM_MODEL
+    return llm_cache.get_or_compute(prompt_key(model, prompt), lambda: get_llm_client().complete(model, prompt))
 
-    prompt = f"""
+
+async def acomplete_with_llm(prompt: str, model: str = None) -> str:
+    """Async counterpart of complete_with_llm; the upstream call is awaited on the event loop."""
+    model = model or settings.LLM_MODEL
+    return await llm_cache.aget_or_compute(prompt_key(model, prompt), lambda: get_llm_client().acomplete(model, prompt))
+
+
+def _relevant_sections_prompt(text: str) -> str:
+    return f"""
     You are an AI assistant that extracts only the most relevant and technical parts of a job description or resume.
     From the following text, return a clean summary of these sections:
     - Responsibilities
     - Requirements or Qualifications
     - Skills or Technologies
     - Summary or Role Overview
-    
+
     Return only those parts in bullet or paragraph form. Ignore company background, perks, or filler text.
-    
+
     TEXT:
     {text}
     """
 
 
-    response = client.chat.completions.create(
-        model="openai/gpt-oss-20b",
-        messages=[{"role": "user", "content": prompt}],
-    )
+def _job_keywords_prompt(resume_text: str) -> str:
+    return f"""
+    From the following resume, extract a concise list of job titles or roles the candidate is suited for.
+    Return them as a comma-separated list (e.g., frontend developer, backend engineer, data analyst).
+    Avoid general traits and focus on actual job functions.
+
+    Resume:
+    {resume_text}
+    """
+
+
+def _parse_roles(content: str) -> list[str]:
+    # Parse comma-separated string into clean list
+    return [role.strip().lower() for role in content.split(",") if role.strip()]
+
 
-    content = response.choices[0].message.content.strip()
+def extract_relevant_sections_with_llm(text: str) -> str:
+    """
+    Uses Groq LLM to extract relevant sections like Responsibilities, Requirements, Skills, and Summary.
+    """
+    try:
+        content = complete_with_llm(_relevant_sections_prompt(text))
+    except LLMUnavailableError:
+        # Degrade to the unfiltered text rather than failing the request
+        logger.warning("Section extraction skipped, LLM unavailable")
+        return text
 
     return content
 
@@ -42,24 +81,29 @@ def extract_job_keywords_from_resume(resume_text: str) -> list[str]:
     Uses an LLM to extract job-related keywords or titles from resume text
     (e.g., 'frontend developer', 'data engineer', etc.) for filtering search results.
     """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    try:
+        content = complete_with_llm(_job_keywords_prompt(resume_text))
+    except LLMUnavailableError:
+        # No title filter is applied when keywords cannot be extracted
+        logger.warning("Keyword extraction skipped, LLM unavailable")
+        return []
 
-    prompt = f"""
-    From the following resume, extract a concise list of job titles or roles the candidate is suited for.
-    Return them as a comma-separated list (e.g., frontend developer, backend engineer, data analyst).
-    Avoid general traits and focus on actual job functions.
+    return _parse_roles(content)
 
-    Resume:
-    {resume_text}
-    """
 
-    response = client.chat.completions.create(
-        model="openai/gpt-oss-20b",
-        messages=[{"role": "user", "content": prompt}],
-    )
+async def aextract_relevant_sections_with_llm(text: str) -> str:
+    try:
+        return await acomplete_with_llm(_relevant_sections_prompt(text))
+    except LLMUnavailableError:
+        logger.warning("Section extraction skipped, LLM unavailable")
+        return text
 
-    content = response.choices[0].message.content.strip()
 
-    # Parse comma-separated string into clean list
-    roles = [role.strip().lower() for role in content.split(",") if role.strip()]
-    return roles
\ No newline at end of file
+async def aextract_job_keywords_from_resume(resume_text: str) -> list[str]:
+    try:
+        content = await acomplete_with_llm(_job_keywords_prompt(resume_text))
+    except LLMUnavailableError:
+        logger.warning("Keyword extraction skipped, LLM unavailable")
+        return []
+
+    return _parse_roles(content)
@@ -1,14 +1,24 @@
+import io
+
+from django.conf import settings
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
-
-from app.jobrole.serializers import JobRoleSerializer
-from app.jobrole.utils import extract_relevant_sections_with_llm, extract_job_keywords_from_resume
-from app.langchain_utils.search import search_matching_documents, search_matching_documents_new, \
-    search_matching_documents_new_2
-from app.langchain_utils.store import store_job_description
-from app.langchain_utils.vectorstore import embedding_model, safe_vector_format
+from rest_framework.parsers import JSONParser, MultiPartParser
+
+from app.global_constants import ErrorMessage, SuccessMessage
+from app.jobrole.ingest import ingest_job_descriptions, parse_job_description_stream, INGEST_FORMATS
+from app.jobrole.llm_client import get_llm_client
+from app.jobrole.matrix_search import jobrole_matrix
+from app.jobrole.pipeline import search_jobs_for_resume
+from app.jobrole.models import IngestJob
+from app.jobrole.serializers import JobRoleSerializer, IngestJobSerializer
+from app.jobrole.tasks import enqueue_job_description
+from app.jobrole.utils import llm_cache
+from app.langchain_utils.aggregation import AGGREGATION_STRATEGIES
+from app.langchain_utils.search import hybrid_search, FUSION_METHODS
+from app.langchain_utils.vectorstore import embedding_model, vectorstore_manager, resume_vectorstore_manager
 from app.utils import get_response_schema
 
 
@@ -29,33 +39,70 @@ class StoreJobRoleApiView(GenericAPIView):
     def post(self, request):
         title = request.data.get("title")
         description = request.data.get("description")
-        metadata = request.data.get("metadata", {})
+        metadata = request.data.get("metadata") or {}
 
         if not title or not description:
             return get_response_schema({}, "Title and description are required", status.HTTP_400_BAD_REQUEST)
 
-        metadata["type"] = "job"
-        metadata["title"] = title
+        if not isinstance(metadata, dict):
+            return get_response_schema({}, "Metadata must be an object", status.HTTP_400_BAD_REQUEST)
 
-        # Store and embed in vector DB
-        store_job_description(description, metadata)
+        serializer = JobRoleSerializer(data={"title": title, "description": description})
+        if not serializer.is_valid():
+            return get_response_schema(serializer.errors, "Validation failed", status.HTTP_400_BAD_REQUEST)
 
-        # Embed for relational DB storage
-        embedding_vector = safe_vector_format(embedding_model.embed_query(description))
+        # Extraction, embedding and indexing run on an ingest worker; poll ingest-jobs/<job_id>
+        job = enqueue_job_description(title, description, metadata)
+        return get_response_schema(IngestJobSerializer(job).data, "JobRole queued for ingestion",
+                                   status.HTTP_202_ACCEPTED)
 
-        job_role_data = {
-            "title": title,
-            "description": description,
-            "embedding_vector": embedding_vector
-        }
 
-        serializer = JobRoleSerializer(data=job_role_data)
+class IngestJobStatusApiView(GenericAPIView):
+
+    def get(self, request, job_id):
+        job = IngestJob.objects.filter(id=job_id).first()
+        if job is None:
+            return get_response_schema({}, ErrorMessage.NOT_FOUND.value, status.HTTP_404_NOT_FOUND)
+        return get_response_schema(IngestJobSerializer(job).data, SuccessMessage.RECORD_RETRIEVED.value,
+                                   status.HTTP_200_OK)
+
+
+class StoreJobRoleBulkApiView(GenericAPIView):
+    parser_classes = [MultiPartParser, JSONParser]
+
+    @swagger_auto_schema(
+        operation_description="Upload a JSONL or CSV file of job descriptions (title, description, metadata), "
+                              "or send a JSON body with an `items` list.",
+        manual_parameters=[
+            openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, description="JSONL or CSV file"),
+            openapi.Parameter("format", openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(INGEST_FORMATS),
+                              default="jsonl"),
+            openapi.Parameter("batch_size", openapi.IN_FORM, type=openapi.TYPE_INTEGER,
+                              default=settings.INGEST_BATCH_SIZE),
+        ]
+    )
+    def post(self, request):
+        batch_size = int(request.data.get("batch_size", settings.INGEST_BATCH_SIZE))
+        upload = request.FILES.get("file")
+
+        if upload:
+            fmt = request.data.get("format", "jsonl")
+            if fmt not in INGEST_FORMATS:
+                return get_response_schema({}, f"Format must be one of {', '.join(INGEST_FORMATS)}",
+                                           status.HTTP_400_BAD_REQUEST)
+            rows = parse_job_description_stream(io.TextIOWrapper(upload.file, encoding="utf-8", newline=""), fmt)
+        elif isinstance(request.data.get("items"), list):
+            rows = enumerate(request.data["items"], start=1)
+        else:
+            return get_response_schema({}, "A file or an items list is required", status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = ingest_job_descriptions(rows, batch_size=batch_size, llm_workers=settings.INGEST_LLM_WORKERS)
+        except ValueError as exc:
+            return get_response_schema({}, f"Could not parse upload: {exc}", status.HTTP_400_BAD_REQUEST)
 
-        if serializer.is_valid():
-            serializer.save()
-            return get_response_schema(serializer.data, "JobRole stored successfully", status.HTTP_201_CREATED)
+        return get_response_schema(report, f"{report['stored']} job roles stored", status.HTTP_201_CREATED)
 
-        return get_response_schema(serializer.errors, "Validation failed", status.HTTP_400_BAD_REQUEST)
 
 class HybridSearchApiView(GenericAPIView):
 
@@ -66,7 +113,21 @@ class HybridSearchApiView(GenericAPIView):
                 "query": openapi.Schema(type=openapi.TYPE_STRING, description="Search query text"),
                 "target": openapi.Schema(type=openapi.TYPE_STRING, enum=["resume", "job"],
                                          description="Search target type"),
-                "top_k": openapi.Schema(type=openapi.TYPE_INTEGER, default=5)
+                "top_k": openapi.Schema(type=openapi.TYPE_INTEGER, default=5),
+                "alpha": openapi.Schema(type=openapi.TYPE_NUMBER, default=settings.HYBRID_SEARCH_ALPHA,
+                                        description="Weight of vector similarity vs BM25 (1 = vector only, 0 = BM25 only)"),
+                "fusion": openapi.Schema(type=openapi.TYPE_STRING, enum=list(FUSION_METHODS),
+                                         default=settings.HYBRID_SEARCH_FUSION,
+                                         description="Reciprocal rank fusion or weighted normalized scores"),
+                "filters": openapi.Schema(type=openapi.TYPE_OBJECT,
+                                          description="Optional metadata restrictions (title, job_id, location)"),
+                "nprobe": openapi.Schema(type=openapi.TYPE_INTEGER,
+                                         description="Inverted lists probed on IVF indexes (higher = better recall)"),
+                "ef_search": openapi.Schema(type=openapi.TYPE_INTEGER,
+                                            description="Search breadth on HNSW indexes (higher = better recall)"),
+                "aggregation": openapi.Schema(type=openapi.TYPE_STRING, enum=list(AGGREGATION_STRATEGIES),
+                                              default=settings.SEARCH_AGGREGATION,
+                                              description="How chunk scores are combined into one score per document")
             },
             required=["query", "target"]
         )
@@ -75,11 +136,26 @@ class HybridSearchApiView(GenericAPIView):
         query = request.data.get("query")
         target = request.data.get("target")
         top_k = int(request.data.get("top_k", 5))
+        alpha = float(request.data.get("alpha", settings.HYBRID_SEARCH_ALPHA))
+        fusion = request.data.get("fusion", settings.HYBRID_SEARCH_FUSION)
+        filters = request.data.get("filters") or {}
+        nprobe = request.data.get("nprobe")
+        ef_search = request.data.get("ef_search")
+        aggregation = request.data.get("aggregation", settings.SEARCH_AGGREGATION)
+
+        nprobe = int(nprobe) if nprobe else None
+        ef_search = int(ef_search) if ef_search else None
 
-        if not query or target not in ["resume", "job"]:
+        if not isinstance(filters, dict):
+            return get_response_schema({}, "Filters must be an object", status.HTTP_400_BAD_REQUEST)
+
+        if not query or target not in ["resume", "job"] or not 0 <= alpha <= 1 or fusion not in FUSION_METHODS \
+                or aggregation not in AGGREGATION_STRATEGIES:
             return get_response_schema({}, "Invalid or missing parameters", status.HTTP_400_BAD_REQUEST)
 
-        results = search_matching_documents(query_text=query, top_k=top_k, filter_type=target)
+        results = hybrid_search(query_text=query, top_k=top_k, filter_type=target, alpha=alpha, fusion=fusion,
+                                filters=filters, nprobe=nprobe, ef_search=ef_search,
+                                aggregation=aggregation)
         return get_response_schema(results, f"Top {top_k} matches retrieved", status.HTTP_200_OK)
 
 
@@ -103,9 +179,22 @@ class CandidateSearchFromResumeTextApiView(GenericAPIView):
         if not resume_text:
             return get_response_schema({}, "Resume text is required", status.HTTP_400_BAD_REQUEST)
 
-        filtered_resume = extract_relevant_sections_with_llm(resume_text)
+        results, included_titles, timings = search_jobs_for_resume(resume_text, top_k=top_k)
+
+        response = get_response_schema(results, f"Top {top_k} matching job roles retrieved", status.HTTP_200_OK)
+        response["Server-Timing"] = timings.as_header()
+        return response
 
-        included_titles = extract_job_keywords_from_resume(filtered_resume)
 
-        results = search_matching_documents_new_2(query_text=filtered_resume, filter_type="job")
-        return get_response_schema(results, f"Top {top_k} matching job roles retrieved", status.HTTP_200_OK)
+class VectorStoreStatsApiView(GenericAPIView):
+
+    def get(self, request):
+        stats = {
+            "vectorstore": vectorstore_manager.stats(),
+            "resume_vectorstore": resume_vectorstore_manager.stats(),
+            "jobrole_matrix": jobrole_matrix.stats(),
+            "embedding_cache": embedding_model.stats(),
+            "llm_cache": llm_cache.stats(),
+            "llm": get_llm_client().stats(),
+        }
+        return get_response_schema(stats, SuccessMessage.RECORD_RETRIEVED.value, status.HTTP_200_OK)
@@ -0,0 +1,81 @@
+import numpy as np
+
+# max         best chunk only
+# mean        average over the retrieved chunks of a document
+# top_m_mean  best m chunks, divided by min(m, chunk_total) so documents matching on several chunks
+#             rank above single-chunk hits without penalizing documents that only have one chunk
+# softmax     softmax-weighted average that leans towards the best chunks
+AGGREGATION_STRATEGIES = ("max", "mean", "top_m_mean", "softmax")
+
+
+def document_key(metadata: dict, position):
+    """Chunks of one stored document share its job_id or resume_id, or its title when neither was given."""
+    metadata = metadata or {}
+    if metadata.get("resume_id") is not None:
+        return f"resume:{metadata['resume_id']}"
+    return str(metadata.get("job_id") or metadata.get("title") or f"chunk:{position}")
+
+
+def aggregate_scores(groups: np.ndarray, scores: np.ndarray, chunk_totals: np.ndarray = None,
+                     strategy: str = "max", top_m: int = 3, temperature: float = 0.1):
+    """
+    Aggregates chunk scores (higher is better) into one score per group.
+
+    groups holds a dense group number per chunk (as from np.unique(..., return_inverse=True)).
+    Returns (group numbers, group scores, best chunk of each group, matched chunks per group),
+    best group first.
+    """
+    if strategy not in AGGREGATION_STRATEGIES:
+        raise ValueError(f"Unknown aggregation '{strategy}', expected one of {', '.join(AGGREGATION_STRATEGIES)}")
+
+    groups = np.asarray(groups, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0, dtype=np.float64), empty, empty
+
+    num_groups = int(groups.max()) + 1
+    counts = np.bincount(groups, minlength=num_groups)
+
+    # Chunks sorted by group, best first within a group; the first chunk of each run is the group's best
+    order = np.lexsort((-scores, groups))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    best_chunk = order[starts]
+    best = scores[best_chunk]
+
+    if strategy == "max":
+        aggregated = best
+    elif strategy == "mean":
+        aggregated = np.bincount(groups, weights=scores, minlength=num_groups) / counts
+    elif strategy == "top_m_mean":
+        rank_in_group = np.arange(len(order)) - np.repeat(starts, counts)
+        kept = order[rank_in_group < top_m]
+        sums = np.bincount(groups[kept], weights=scores[kept], minlength=num_groups)
+        totals = np.ones(num_groups) if chunk_totals is None else np.maximum(
+            np.bincount(groups, weights=chunk_totals, minlength=num_groups) / counts, 1)
+        aggregated = sums / np.minimum(top_m, np.maximum(totals, counts))
+    else:
+        # Temperature is relative to the best score of the query, so fused and raw scores behave alike
+        scale = max(np.abs(scores).max(), 1e-12) * temperature
+        weights = np.exp((scores - best[groups]) / scale)
+        aggregated = (np.bincount(groups, weights=weights * scores, minlength=num_groups)
+                      / np.bincount(groups, weights=weights, minlength=num_groups))
+
+    ranking = np.argsort(-aggregated, kind="stable")
+    return ranking, aggregated[ranking], best_chunk[ranking], counts[ranking]
+
+
+def rank_documents(docs, scores, top_k: int, strategy: str = "max", top_m: int = 3, temperature: float = 0.1):
+    """
+    Groups retrieved chunks by document and ranks the documents.
+    Returns [(best chunk index into docs, document score, matched chunks)], at most top_k, best first.
+    """
+    if not docs:
+        return []
+
+    keys = [document_key(doc.metadata, position) for position, doc in enumerate(docs)]
+    _, groups = np.unique(keys, return_inverse=True)
+    chunk_totals = np.array([(doc.metadata or {}).get("chunk_total") or 1 for doc in docs], dtype=np.float64)
+
+    _, aggregated, best_chunk, counts = aggregate_scores(groups, scores, chunk_totals, strategy, top_m, temperature)
+    return list(zip(best_chunk[:top_k].tolist(), aggregated[:top_k].tolist(), counts[:top_k].tolist()))
@@ -0,0 +1,203 @@
+import bisect
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from app.langchain_utils.docstore import MappedStrings, load_array, write_strings
+
+# Keeps skill tokens such as "c++", "c#", "node.js" and "django5" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# Files of a saved index next to its generation's .faiss: sorted terms, postings per term and document lengths
+TERMS_SUFFIX = ".bm25.terms"
+TERM_OFFSETS_SUFFIX = ".bm25.terms.offsets.npy"
+POSTING_OFFSETS_SUFFIX = ".bm25.postings.npy"
+POSTING_DOCS_SUFFIX = ".bm25.docs.npy"
+POSTING_TFS_SUFFIX = ".bm25.tfs.npy"
+LENGTHS_SUFFIX = ".bm25.lengths.npy"
+BM25_SUFFIXES = (TERMS_SUFFIX, TERM_OFFSETS_SUFFIX, POSTING_OFFSETS_SUFFIX, POSTING_DOCS_SUFFIX, POSTING_TFS_SUFFIX,
+                 LENGTHS_SUFFIX)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.rstrip(".") for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class _SavedPostings:
+    """Postings written by BM25Index.save, read from (memory-mapped) arrays and searched with bisect."""
+
+    def __init__(self, prefix, mmap=True):
+        self.terms = MappedStrings(f"{prefix}{TERMS_SUFFIX}", mmap)
+        self.offsets = load_array(f"{prefix}{POSTING_OFFSETS_SUFFIX}", mmap)
+        self.docs = load_array(f"{prefix}{POSTING_DOCS_SUFFIX}", mmap)
+        self.tfs = load_array(f"{prefix}{POSTING_TFS_SUFFIX}", mmap)
+        self.lengths = load_array(f"{prefix}{LENGTHS_SUFFIX}", mmap)
+        self.total_length = float(self.lengths.sum(dtype=np.float64))
+
+    def postings(self, term):
+        key = term.encode()
+        term_id = bisect.bisect_left(self.terms, key)
+        if term_id == len(self.terms) or self.terms[term_id] != key:
+            return None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+
+class BM25Index:
+    """
+    Append-only inverted index with Okapi BM25 scoring.
+
+    Document positions are assigned in insertion order, so when documents are added in the
+    same order as the FAISS index they share its internal ids. Postings are kept in compact
+    typed arrays and scored with NumPy, one bincount per query. An index loaded from a saved
+    generation reads its postings from memory-mapped files shared by all workers, and only
+    documents added since are held in memory.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, saved: _SavedPostings = None):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self._saved = saved
+        self._saved_docs = len(saved.lengths) if saved is not None else 0
+        self._posting_docs = []
+        self._posting_tfs = []
+        self._doc_lengths = array("f")
+        self._total_length = saved.total_length if saved is not None else 0.0
+        # NumPy copies of postings and lengths added in memory, rebuilt lazily after appends
+        self._frozen = {}
+        self._frozen_lengths = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, prefix, mmap=True, **options):
+        """The index saved with a generation, or None when the generation was written without one."""
+        if not all(os.path.exists(f"{prefix}{suffix}") for suffix in BM25_SUFFIXES):
+            return None
+        return cls(saved=_SavedPostings(prefix, mmap), **options)
+
+    def save(self, prefix):
+        """Writes the postings of an index built in memory (not loaded from a saved one) next to a generation."""
+        if self._saved is not None:
+            raise ValueError("Only an index built in memory can be saved")
+        with self._lock:
+            terms = sorted(self.vocabulary, key=str.encode)
+            write_strings(f"{prefix}{TERMS_SUFFIX}", [term.encode() for term in terms])
+            term_ids = [self.vocabulary[term] for term in terms]
+            sizes = [len(self._posting_docs[term_id]) for term_id in term_ids]
+            np.save(f"{prefix}{POSTING_OFFSETS_SUFFIX}", np.concatenate(([0], np.cumsum(sizes, dtype=np.int64))))
+            np.save(f"{prefix}{POSTING_DOCS_SUFFIX}",
+                    np.concatenate([np.array(self._posting_docs[term_id], dtype=np.int32) for term_id in term_ids]
+                                   or [np.zeros(0, dtype=np.int32)]))
+            np.save(f"{prefix}{POSTING_TFS_SUFFIX}",
+                    np.concatenate([np.array(self._posting_tfs[term_id], dtype=np.float32) for term_id in term_ids]
+                                   or [np.zeros(0, dtype=np.float32)]))
+            np.save(f"{prefix}{LENGTHS_SUFFIX}", np.array(self._doc_lengths, dtype=np.float32))
+
+    @property
+    def num_docs(self):
+        return self._saved_docs + len(self._doc_lengths)
+
+    def add(self, texts):
+        with self._lock:
+            for text in texts:
+                position = self.num_docs
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    term_id = self.vocabulary.get(term)
+                    if term_id is None:
+                        term_id = self.vocabulary[term] = len(self._posting_docs)
+                        self._posting_docs.append(array("i"))
+                        self._posting_tfs.append(array("f"))
+                    self._posting_docs[term_id].append(position)
+                    self._posting_tfs[term_id].append(tf)
+                    self._frozen.pop(term_id, None)
+
+                length = sum(counts.values())
+                self._doc_lengths.append(length)
+                self._total_length += length
+            self._frozen_lengths = None
+
+    def _postings(self, term):
+        """(positions, term frequencies) of a term across saved and added documents, or None."""
+        parts = []
+        if self._saved is not None:
+            saved = self._saved.postings(term)
+            if saved is not None:
+                parts.append(saved)
+        term_id = self.vocabulary.get(term)
+        if term_id is not None:
+            frozen = self._frozen.get(term_id)
+            if frozen is None:
+                frozen = self._frozen[term_id] = (
+                    np.array(self._posting_docs[term_id], dtype=np.int64),
+                    np.array(self._posting_tfs[term_id], dtype=np.float32),
+                )
+            parts.append(frozen)
+        if len(parts) < 2:
+            return parts[0] if parts else None
+        return np.concatenate([docs for docs, _ in parts]), np.concatenate([tfs for _, tfs in parts])
+
+    def _lengths(self, docs):
+        if self._frozen_lengths is None:
+            self._frozen_lengths = np.array(self._doc_lengths, dtype=np.float32)
+        if self._saved is None:
+            return self._frozen_lengths[docs]
+        saved = docs < self._saved_docs
+        lengths = np.empty(len(docs), dtype=np.float32)
+        lengths[saved] = self._saved.lengths[docs[saved]]
+        lengths[~saved] = self._frozen_lengths[docs[~saved] - self._saved_docs]
+        return lengths
+
+    def scores(self, query: str, candidates: np.ndarray = None) -> np.ndarray:
+        """
+        BM25 scores of the query against every document position.
+        When candidates is given, postings outside that id subset are skipped.
+        """
+        num_docs = self.num_docs
+        if not num_docs:
+            return np.zeros(0, dtype=np.float32)
+
+        all_docs, all_weights = [], []
+        with self._lock:
+            avg_length = self._total_length / num_docs
+
+            mask = None
+            if candidates is not None:
+                mask = np.zeros(num_docs, dtype=bool)
+                mask[candidates] = True
+
+            for term in set(tokenize(query)):
+                postings = self._postings(term)
+                if postings is None:
+                    continue
+
+                docs, tfs = postings
+                df = len(docs)
+                if mask is not None:
+                    keep = mask[docs]
+                    docs, tfs = docs[keep], tfs[keep]
+
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths(docs) / avg_length)
+                all_docs.append(docs)
+                all_weights.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not all_docs:
+            return np.zeros(num_docs, dtype=np.float32)
+        return np.bincount(np.concatenate(all_docs), weights=np.concatenate(all_weights),
+                           minlength=num_docs).astype(np.float32)
+
+    def search(self, query: str, k: int, candidates: np.ndarray = None):
+        """Returns (positions, scores) of the k best documents with a positive score, best first."""
+        scores = self.scores(query, candidates)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = np.argsort(-scores[matched], kind="stable")
+        return matched[order], scores[matched][order]
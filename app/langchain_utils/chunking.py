@@ -0,0 +1,161 @@
+"""
+Token-aware, section-aware chunking.
+
+Texts are split at the section headings the extraction LLM produces (markdown headings, bold
+lines or "Heading:" lines), then bullets and sentences are packed into chunks up to the
+embedding model's token budget. Each chunk is prefixed with its section heading and never
+spans two sections. Everything is a generator, so chunks can flow into batched embedding
+while the rest of the text is still being split.
+"""
+import logging
+import re
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger('django')
+
+Chunk = namedtuple("Chunk", ["section", "text", "tokens"])
+
+HEADING_PATTERNS = (
+    re.compile(r"^#{1,6}\s+(?P<heading>.+?)\s*#*$"),
+    re.compile(r"^(?:\*\*|__)(?P<heading>[^*_]{1,80}?)(?:\*\*|__)\s*:?$"),
+    re.compile(r"^(?P<heading>[A-Z][\w ,&/()+-]{0,60}):$"),
+)
+BULLET_PATTERN = re.compile(r"^(?:[-*•]|\d{1,2}[.)])\s+")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+# Fallback approximation of subword tokens: words and punctuation marks
+APPROXIMATE_TOKEN = re.compile(r"\w+|[^\w\s]")
+# [CLS]/<s> and [SEP]/</s> added by the model around every input
+SPECIAL_TOKENS = 2
+
+
+def _heading(line):
+    for pattern in HEADING_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return match.group("heading").strip(" *_:")
+    return None
+
+
+def iter_sections(text: str):
+    """Yields (heading, units) per section; units are bullets and sentences. Text before the first heading has heading None."""
+    heading, units = None, []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        new_heading = _heading(line)
+        if new_heading is not None:
+            if units:
+                yield heading, units
+            heading, units = new_heading, []
+            continue
+        if BULLET_PATTERN.match(line):
+            units.append(line)
+        else:
+            units.extend(sentence for sentence in SENTENCE_BOUNDARY.split(line) if sentence)
+    if units:
+        yield heading, units
+
+
+class TokenCounter:
+    """
+    Counts tokens with the embedding model's tokenizer, loaded on first use.
+    When the tokenizer cannot be loaded, counts words and punctuation instead, which
+    undercounts subword splits; the chunker keeps a margin for that case.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.exact = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Loads the tokenizer if needed; returns whether counts are exact."""
+        if self.exact is not None:
+            return self.exact
+        with self._lock:
+            if self.exact is None:
+                try:
+                    from transformers import AutoTokenizer
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    self.exact = True
+                except (ImportError, OSError):
+                    logger.warning(f"Tokenizer of {self.model_name} unavailable, approximating token counts")
+                    self.exact = False
+        return self.exact
+
+    def __call__(self, text: str) -> int:
+        if self.load():
+            return len(self._tokenizer(text, add_special_tokens=False)["input_ids"])
+        return len(APPROXIMATE_TOKEN.findall(text))
+
+
+token_counter = TokenCounter(settings.EMBEDDING_MODEL_NAME)
+
+
+def _split_long_unit(unit, budget, count_tokens):
+    """Word windows of a single bullet or sentence that alone exceeds the budget."""
+    window, window_tokens = [], 0
+    for word in unit.split():
+        tokens = count_tokens(word)
+        if window and window_tokens + tokens > budget:
+            yield " ".join(window), window_tokens
+            window, window_tokens = [], 0
+        window.append(word)
+        window_tokens += tokens
+    if window:
+        yield " ".join(window), window_tokens
+
+
+def _overlap(packed, limit):
+    """Trailing units of a chunk that fit in limit tokens."""
+    carried, carried_tokens = [], 0
+    for unit in reversed(packed):
+        if carried_tokens + unit[1] > limit:
+            break
+        carried.insert(0, unit)
+        carried_tokens += unit[1]
+    return carried
+
+
+def _chunk(heading, prefix, packed, overhead):
+    return Chunk(heading, prefix + "\n".join(text for text, _ in packed), overhead + sum(tokens for _, tokens in packed))
+
+
+def iter_chunks(text: str, max_tokens: int = None, overlap_tokens: int = None, count_tokens=None):
+    """
+    Yields Chunks of text packed up to max_tokens model tokens, special tokens and heading included.
+    Consecutive chunks of one section repeat up to overlap_tokens of trailing units for context.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    count_tokens = count_tokens or token_counter
+    if isinstance(count_tokens, TokenCounter) and not count_tokens.load():
+        max_tokens = int(max_tokens * 0.8)
+
+    for heading, units in iter_sections(text):
+        prefix = f"{heading}\n" if heading else ""
+        overhead = SPECIAL_TOKENS + (count_tokens(heading) if heading else 0)
+        if overhead >= max_tokens:
+            prefix, overhead = "", SPECIAL_TOKENS
+        budget = max_tokens - overhead
+
+        # packed holds (text, tokens) units; the first `carried` of them repeat the end of the previous chunk
+        packed, packed_tokens, carried = [], 0, 0
+        for unit in units:
+            tokens = count_tokens(unit)
+            pieces = [(unit, tokens)] if tokens <= budget else _split_long_unit(unit, budget, count_tokens)
+            for piece, piece_tokens in pieces:
+                if len(packed) > carried and packed_tokens + piece_tokens > budget:
+                    yield _chunk(heading, prefix, packed, overhead)
+                    packed = _overlap(packed, min(overlap_tokens, budget - piece_tokens))
+                    packed_tokens = sum(unit_tokens for _, unit_tokens in packed)
+                    carried = len(packed)
+                packed.append((piece, piece_tokens))
+                packed_tokens += piece_tokens
+        if len(packed) > carried:
+            yield _chunk(heading, prefix, packed, overhead)
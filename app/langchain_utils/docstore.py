@@ -0,0 +1,136 @@
+import json
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+# Files of one saved generation next to its .faiss index
+DOCS_SUFFIX = ".docs"
+OFFSETS_SUFFIX = ".docs.offsets.npy"
+IDS_SUFFIX = ".docs.ids.npy"
+
+
+def load_array(path, mmap=True):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def write_strings(path, values):
+    """Writes byte strings concatenated at path plus an offsets array, the layout MappedStrings reads."""
+    offsets = [0]
+    with open(path, "wb") as strings_file:
+        for value in values:
+            strings_file.write(value)
+            offsets.append(offsets[-1] + len(value))
+    np.save(f"{path}.offsets.npy", np.array(offsets, dtype=np.int64))
+
+
+class MappedStrings(Sequence):
+    """Byte strings written by write_strings, read by position; sorted ones can be searched with bisect."""
+
+    def __init__(self, path, mmap=True):
+        self._offsets = load_array(f"{path}.offsets.npy", mmap)
+        size = int(self._offsets[-1])
+        if not size:
+            self._data = np.zeros(0, np.uint8)
+        elif mmap:
+            self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            self._data = np.fromfile(path, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        return self._data[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+
+def write_docstore(prefix, documents, ids):
+    """
+    Writes documents in FAISS id order as concatenated JSON records plus an offsets array,
+    a layout that can be memory-mapped and decoded one record at a time (unlike a pickle).
+    """
+    offsets = [0]
+    with open(f"{prefix}{DOCS_SUFFIX}", "wb") as docs_file:
+        for doc in documents:
+            record = json.dumps({"text": doc.page_content, "metadata": doc.metadata}).encode()
+            docs_file.write(record)
+            offsets.append(offsets[-1] + len(record))
+    np.save(f"{prefix}{OFFSETS_SUFFIX}", np.array(offsets, dtype=np.int64))
+    np.save(f"{prefix}{IDS_SUFFIX}", np.array([doc_id.encode() for doc_id in ids], dtype=np.bytes_))
+
+
+class MappedDocstore(Docstore, AddableMixin):
+    """
+    Documents of a saved generation read straight from memory-mapped files, plus documents
+    added since in memory. Workers mapping the same generation share its pages through the OS cache.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._offsets = np.load(f"{prefix}{OFFSETS_SUFFIX}", mmap_mode="r")
+        self._ids = np.load(f"{prefix}{IDS_SUFFIX}", mmap_mode="r")
+        size = int(self._offsets[-1])
+        self._data = np.memmap(f"{prefix}{DOCS_SUFFIX}", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+        self._saved = len(self._offsets) - 1
+        self._added = {}
+        self._added_order = []
+        self._position_by_id = None
+
+    def __len__(self):
+        return self._saved + len(self._added_order)
+
+    def saved_id(self, position):
+        return self._ids[position].decode()
+
+    def document_at(self, position):
+        if position >= self._saved:
+            return self._added[self._added_order[position - self._saved]]
+        start, end = self._offsets[position], self._offsets[position + 1]
+        record = json.loads(self._data[start:end].tobytes())
+        return Document(id=self.saved_id(position), page_content=record["text"], metadata=record["metadata"])
+
+    def search(self, search: str):
+        if search in self._added:
+            return self._added[search]
+        if self._position_by_id is None:
+            # Only built for lookups by id; searches in this app resolve documents by position
+            self._position_by_id = {doc_id.decode(): position for position, doc_id in enumerate(self._ids)}
+        position = self._position_by_id.get(search)
+        return self.document_at(position) if position is not None else f"ID {search} not found."
+
+    def add(self, texts: dict):
+        for doc_id, doc in texts.items():
+            if doc_id not in self._added:
+                self._added_order.append(doc_id)
+            self._added[doc_id] = doc
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id for a MappedDocstore: saved ids are read from the mapped id array."""
+
+    def __init__(self, docstore: MappedDocstore):
+        self._docstore = docstore
+        self._added = {}
+
+    def __getitem__(self, position):
+        if 0 <= position < self._docstore._saved:
+            return self._docstore.saved_id(position)
+        return self._added[position]
+
+    def __len__(self):
+        return self._docstore._saved + len(self._added)
+
+    def __iter__(self):
+        yield from range(len(self))
+
+    def update(self, index_to_id):
+        self._added.update(index_to_id)
+
+
+def documents_at(vectorstore, positions):
+    """Documents for FAISS ids, decoded by position when the docstore is memory-mapped."""
+    docstore = vectorstore.docstore
+    if isinstance(docstore, MappedDocstore):
+        return [docstore.document_at(position) for position in positions]
+    return [docstore.search(vectorstore.index_to_docstore_id[position]) for position in positions]
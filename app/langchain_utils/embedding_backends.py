@@ -0,0 +1,216 @@
+"""
+Selectable embedding model backends.
+
+"torch" runs the sentence-transformers model through HuggingFaceEmbeddings, as before.
+"onnx" runs the same model exported by export_embedding_model through ONNX Runtime, and
+"onnx_int8" its dynamically int8-quantized copy, which is several times cheaper per text on
+CPU. EMBEDDING_MODEL_NAME may also name a smaller distilled model for any backend.
+
+Every backend/model pair produces different vectors, so each is identified by an embedding
+model id that the index manifest records; reembed_vectorstore moves the stored chunks to another one.
+"""
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx_int8")
+# Model of every index generation and segment written before the model id was recorded
+LEGACY_EMBEDDING_MODEL_ID = "sentence-transformers/all-mpnet-base-v2"
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model-int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+def embedding_model_id(backend: str, model_name: str) -> str:
+    """Identifies the vectors a backend produces; torch keeps the bare model name used by existing caches and indexes."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def onnx_model_dir(base_dir: str, model_name: str) -> str:
+    return os.path.join(base_dir, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 17):
+    """
+    Exports the transformer of a sentence-transformers model to ONNX with dynamic batch and sequence
+    axes, next to its tokenizer and pooling config. With quantize, also writes a copy whose weights
+    are dynamically quantized to int8 (activations stay float and are quantized per batch at runtime).
+    Returns the paths of the written models.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    pooling = next(module for module in model if isinstance(module, Pooling))
+
+    encoded = tokenizer(["Export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in encoded]
+
+    class Encoder(torch.nn.Module):
+        # Feeds inputs by name; positional order differs between BERT and MPNet forward()
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(Encoder(), tuple(encoded[name] for name in input_names), model_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    tokenizer.save_pretrained(output_dir)
+
+    config = {
+        "model_name": model_name,
+        "pooling": pooling.get_pooling_mode_str(),
+        "normalize": any(isinstance(module, Normalize) for module in model),
+        "max_seq_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w") as config_file:
+        json.dump(config, config_file, indent=2)
+
+    paths = [model_path]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        paths.append(quantized_path)
+    return paths
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from a model exported by export_onnx, run with ONNX Runtime on CPU.
+
+    Pooling and normalization follow the exported sentence-transformers config, so vectors match
+    the torch backend up to quantization error. Texts are sorted by length before batching to
+    keep padding, which is pure wasted compute, to a minimum.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, batch_size: int = 32, threads: int = 0):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No exported model at {model_path}; run export_embedding_model first")
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE)) as config_file:
+            self.config = json.load(config_file)
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+
+    def _pool(self, hidden, attention_mask):
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def _embed(self, texts):
+        vectors = np.zeros((len(texts), self.config["dimension"]), dtype=np.float32)
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self._tokenizer([texts[i] for i in batch], padding=True, truncation=True,
+                                      max_length=self.config["max_seq_length"], return_tensors="np")
+            hidden = self._session.run(None, {name: encoded[name].astype(np.int64) for name in self._input_names})[0]
+            vectors[batch] = self._pool(hidden, encoded["attention_mask"])
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0].tolist()
+
+
+def build_embeddings(backend: str, model_name: str, onnx_dir: str = None, threads: int = 0) -> Embeddings:
+    if backend == "torch":
+        # Imported here: sentence-transformers pulls in torch, which most management commands never need
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend in ("onnx", "onnx_int8"):
+        return OnnxEmbeddings(onnx_model_dir(onnx_dir, model_name), quantized=backend == "onnx_int8", threads=threads)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def _top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def _normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def _profile(embeddings: Embeddings, corpus_texts, query_texts):
+    embeddings.embed_documents(corpus_texts[:8])  # warm-up, so lazy initialization is not timed
+
+    start = time.perf_counter()
+    corpus = _normalized(embeddings.embed_documents(corpus_texts))
+    corpus_seconds = time.perf_counter() - start
+
+    latencies, queries = [], []
+    for text in query_texts:
+        start = time.perf_counter()
+        queries.append(embeddings.embed_query(text))
+        latencies.append(time.perf_counter() - start)
+    return corpus, _normalized(queries), {
+        "dimension": corpus.shape[1],
+        "corpus_ms_per_text": round(1000 * corpus_seconds / len(corpus_texts), 3),
+        "query_ms_p50": round(1000 * float(np.percentile(latencies, 50)), 3),
+        "query_ms_p95": round(1000 * float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def evaluate_embeddings(baseline: Embeddings, candidate: Embeddings, corpus_texts: list[str],
+                        query_texts: list[str], query_sources: list[int], k: int = 10) -> dict:
+    """
+    Compares a candidate embedding model against the baseline on the same corpus and queries.
+
+    recall_at_k is the overlap of the candidate's k nearest corpus texts with the baseline's for
+    each query; hit_at_k is how often a query finds the corpus text it was taken from
+    (query_sources), reported for both models. Latencies are per text, batched for the corpus
+    and one call per query.
+    """
+    k = min(k, len(corpus_texts))
+    sources = np.asarray(query_sources)[:, None]
+    report = {"corpus": len(corpus_texts), "queries": len(query_texts), "k": k}
+
+    neighbours = {}
+    for name, embeddings in (("baseline", baseline), ("candidate", candidate)):
+        corpus, queries, profile = _profile(embeddings, corpus_texts, query_texts)
+        neighbours[name] = _top_k(corpus, queries, k)
+        report[name] = {**profile, "hit_at_k": round(float((neighbours[name] == sources).any(axis=1).mean()), 4)}
+
+    overlap = [len(set(expected) & set(found)) / k for expected, found
+               in zip(neighbours["baseline"].tolist(), neighbours["candidate"].tolist())]
+    report["recall_at_k"] = round(float(np.mean(overlap)), 4)
+    report["speedup"] = round(report["baseline"]["corpus_ms_per_text"] /
+                              max(report["candidate"]["corpus_ms_per_text"], 1e-9), 2)
+    return report
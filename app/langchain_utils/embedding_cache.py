@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger('django')
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+
+    Vectors are keyed by a hash of (model name, normalized text). Lookups go through an
+    in-memory LRU first and then a size-bounded SQLite table, so identical chunks and
+    repeated queries are embedded once across requests and restarts.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_path: str = None,
+                 memory_entries: int = 10000, disk_entries: int = 200000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._local = threading.local()
+        self._inserts_since_trim = 0
+        self._schema_ready = False
+
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def _connection(self):
+        # SQLite connections cannot be shared across threads or forked processes. Opened on first use,
+        # so building the module-level cache at import creates no files and forked workers open their own
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            if not self._schema_ready:
+                os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.cache_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                with connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS embeddings ("
+                        "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+                self._schema_ready = True
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    # Memory tier
+
+    def _memory_get(self, key):
+        with self._memory_lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key, vector):
+        with self._memory_lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    # Disk tier
+
+    def _disk_get_many(self, keys):
+        if not self.cache_path or not keys:
+            return {}
+
+        found = {}
+        connection = self._connection()
+        keys = list(keys)
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            with connection:
+                connection.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(time.time(), key) for key in found],
+                )
+        return found
+
+    def _disk_put_many(self, items):
+        if not self.cache_path or not items:
+            return
+
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items],
+            )
+
+        self._inserts_since_trim += len(items)
+        if self._inserts_since_trim >= max(self.disk_entries // 100, 1):
+            self._inserts_since_trim = 0
+            self._trim_disk(connection)
+
+    def _trim_disk(self, connection):
+        (count,) = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.disk_entries
+        if excess <= 0:
+            return
+
+        with connection:
+            connection.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+        self._metrics["evictions"] += excess
+        logger.info(f"Embedding cache evicted {excess} least recently used vectors")
+
+    # Embeddings interface
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = [normalize_text(text) for text in texts]
+        keys = [self._key(text) for text in texts]
+        vectors = {}
+
+        for key in set(keys):
+            vector = self._memory_get(key)
+            if vector is not None:
+                vectors[key] = vector
+        self._metrics["memory_hits"] += len(vectors)
+
+        disk_hits = self._disk_get_many(set(keys) - vectors.keys())
+        for key, vector in disk_hits.items():
+            self._memory_put(key, vector)
+        vectors.update(disk_hits)
+        self._metrics["disk_hits"] += len(disk_hits)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self._metrics["misses"] += len(missing)
+
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            items = list(zip(missing.keys(), computed))
+            for key, vector in items:
+                vector = list(vector)
+                vectors[key] = vector
+                self._memory_put(key, vector)
+            self._disk_put_many(items)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        lookups = self._metrics["memory_hits"] + self._metrics["disk_hits"] + self._metrics["misses"]
+        disk_entries = None
+        if self.cache_path:
+            (disk_entries,) = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {
+            **self._metrics,
+            "hit_rate": round((lookups - self._metrics["misses"]) / lookups, 4) if lookups else None,
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.memory_entries,
+            "disk_entries": disk_entries,
+            "disk_capacity": self.disk_entries,
+            "model_name": self.model_name,
+        }
@@ -0,0 +1,262 @@
+"""
+Local embedding service over a unix socket.
+
+One process owns the model and serves every web worker on the host. Concurrent embed
+requests are collected into micro-batches, so sentence-transformers runs a few large
+forward passes instead of many single-text ones, and only this process spends CPU threads
+on inference.
+
+Wire format, both directions: a 4-byte big-endian length followed by the payload.
+Requests are JSON {"texts": [...]}; responses are a (count, dimension) header followed by
+float32 vectors, or count 0xFFFFFFFF followed by a UTF-8 error message. A malformed request
+gets an error response and the connection stays usable; a frame over MAX_MESSAGE_BYTES closes it.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger('django')
+
+LENGTH = struct.Struct("!I")
+HEADER = struct.Struct("!II")
+ERROR_COUNT = 0xFFFFFFFF
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+# Connecting fails with these when no server is running; anything else (timeouts, resets) is a real failure
+SERVER_UNREACHABLE = (ConnectionRefusedError, FileNotFoundError)
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        read = sock.recv_into(view[received:])
+        if not read:
+            raise ConnectionError("Embedding server connection closed")
+        received += read
+    return bytes(buffer)
+
+
+def _send_message(sock, payload: bytes):
+    sock.sendall(LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_message(sock):
+    (size,) = LENGTH.unpack(_recv_exactly(sock, LENGTH.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message of {size} bytes exceeds {MAX_MESSAGE_BYTES}")
+    return _recv_exactly(sock, size)
+
+
+def _parse_request(payload: bytes) -> list[str]:
+    request = json.loads(payload)
+    texts = request.get("texts") if isinstance(request, dict) else None
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ValueError('Request must be {"texts": [str, ...]}')
+    return texts
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent callers and embeds them together.
+
+    A batch is flushed when it reaches max_batch texts or max_wait seconds after its first
+    request arrived, whichever comes first. A single request larger than max_batch is embedded alone.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 64, max_wait: float = 0.005):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._metrics = {"batches": 0, "texts": 0, "requests": 0, "largest_batch": 0}
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+            self._metrics["batches"] += 1
+            self._metrics["texts"] += size
+            self._metrics["requests"] += len(batch)
+            self._metrics["largest_batch"] = max(self._metrics["largest_batch"], size)
+
+    def stats(self):
+        batches = self._metrics["batches"]
+        return {**self._metrics, "mean_batch": round(self._metrics["texts"] / batches, 2) if batches else None}
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def _send_error(self, message):
+        _send_message(self.request, HEADER.pack(ERROR_COUNT, 0) + message.encode())
+
+    def handle(self):
+        try:
+            self._serve()
+        except OSError:
+            # Includes ConnectionError: the client went away
+            return
+
+    def _serve(self):
+        # Clients keep their connection open, so one handler serves many requests
+        while True:
+            try:
+                payload = _recv_message(self.request)
+            except ValueError as exc:
+                # The rest of an oversized frame cannot be skipped reliably, so the connection is dropped
+                logger.warning(f"Embedding request rejected: {exc}")
+                self._send_error(str(exc))
+                return
+
+            try:
+                texts = _parse_request(payload)
+            except ValueError as exc:
+                # Also covers invalid JSON and UTF-8; the frame was read whole, so the connection stays usable
+                logger.warning(f"Malformed embedding request: {exc}")
+                self._send_error(f"Malformed request: {exc}")
+                continue
+            try:
+                vectors = self.server.batcher.submit(texts).result()
+            except Exception as exc:
+                logger.error("Embedding request failed", exc_info=True)
+                self._send_error(str(exc))
+                continue
+            count, dimension = vectors.shape if vectors.ndim == 2 else (0, 0)
+            _send_message(self.request, HEADER.pack(count, dimension) + vectors.tobytes())
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, embeddings: Embeddings, max_batch: int = 64, max_wait: float = 0.005):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        self.batcher = MicroBatcher(embeddings, max_batch=max_batch, max_wait=max_wait)
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embeddings client of EmbeddingServer.
+
+    Each thread keeps one connection open. When no server is listening, calls go to the
+    fallback embeddings (normally the in-process model) so a stopped server degrades to the
+    old behaviour instead of failing requests. Timeouts and broken connections of a running
+    server are raised rather than loading a second model copy into the worker.
+    """
+
+    def __init__(self, socket_path, fallback: Embeddings = None, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.fallback = fallback
+        self.timeout = timeout
+        self._local = threading.local()
+        self._metrics = {"remote_calls": 0, "fallback_calls": 0}
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, texts):
+        sock = self._connection()
+        try:
+            _send_message(sock, json.dumps({"texts": texts}).encode())
+            response = _recv_message(sock)
+        except (ConnectionError, OSError):
+            self._close()
+            raise
+        count, dimension = HEADER.unpack_from(response)
+        if count == ERROR_COUNT:
+            raise RuntimeError(f"Embedding server error: {response[HEADER.size:].decode()}")
+        return np.frombuffer(response, dtype=np.float32, offset=HEADER.size).reshape(count, dimension)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        try:
+            vectors = self._request(list(texts))
+        except SERVER_UNREACHABLE:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Embedding server at {self.socket_path} unavailable, embedding in-process")
+            self._metrics["fallback_calls"] += 1
+            return self.fallback.embed_documents(texts)
+        self._metrics["remote_calls"] += 1
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        # Queries share the document batches; the served model embeds both the same way
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        return dict(self._metrics)
+
+
+def pin_torch_threads(threads: int):
+    """Caps intra-op CPU threads so model inference does not oversubscribe cores shared with other processes."""
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, str(threads))
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
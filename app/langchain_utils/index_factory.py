@@ -0,0 +1,181 @@
+import math
+import time
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+# cosine is inner product over L2-normalized vectors; l2 is kept for indexes built before normalization
+METRICS = ("cosine", "l2")
+
+
+def faiss_metric(metric: str):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+    return faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+
+
+def default_nlist(num_vectors: int) -> int:
+    # ~4*sqrt(n) lists, while keeping FAISS's minimum of 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def build_index(index_type: str, dimension: int, num_vectors: int, nlist: int = None,
+                hnsw_m: int = 32, pq_m: int = 48, metric=faiss.METRIC_L2):
+    """
+    Creates an empty FAISS index of the requested tier.
+
+    flat      exact search, linear in the corpus
+    ivf_flat  inverted lists over full vectors, nprobe trades recall for speed
+    hnsw      graph search, efSearch trades recall for speed, no training
+    ivf_pq    inverted lists over product-quantized codes (pq_m bytes per vector)
+    """
+    if index_type == "flat":
+        return faiss.IndexFlat(dimension, metric)
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dimension, hnsw_m, metric)
+
+    nlist = nlist or default_nlist(num_vectors)
+    if index_type == "ivf_flat":
+        return faiss.index_factory(dimension, f"IVF{nlist},Flat", metric)
+    if index_type == "ivf_pq":
+        if dimension % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the vector dimension {dimension}")
+        return faiss.index_factory(dimension, f"IVF{nlist},PQ{pq_m}", metric)
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+
+def train_index(index, vectors: np.ndarray, sample_size: int = 100000, seed: int = 0):
+    """Trains on a random sample of the vectors when the index type needs it."""
+    if index.is_trained:
+        return 0
+    if len(vectors) > sample_size:
+        vectors = vectors[np.random.default_rng(seed).choice(len(vectors), sample_size, replace=False)]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    return len(vectors)
+
+
+def _ivf(index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def describe_index(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = _ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def search_parameters(index, candidates: np.ndarray = None, nprobe: int = None, ef_search: int = None):
+    """
+    Per-request FAISS search parameters: the id selector plus the recall/speed knob of the index tier.
+    Returns None when nothing differs from the index defaults.
+    """
+    selector = faiss.IDSelectorBatch(candidates) if candidates is not None else None
+    index = faiss.downcast_index(index)
+
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        if ef_search:
+            params.efSearch = ef_search
+    elif _ivf(index) is not None:
+        params = faiss.SearchParametersIVF()
+        if nprobe:
+            params.nprobe = nprobe
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def to_similarity(index, raw: np.ndarray) -> np.ndarray:
+    """
+    Maps raw FAISS results to a similarity in [0, 1], higher is better.
+    Inner products of normalized vectors are cosines; squared L2 distances are converted
+    through |a - b|^2 = 2 - 2cos, which holds for unit-length embeddings.
+    """
+    raw = np.asarray(raw, dtype=np.float32)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return np.clip((1 + raw) / 2, 0, 1)
+    return np.clip(1 - raw / 4, 0, 1)
+
+
+def similarity_radius(index, min_similarity: float) -> float:
+    """The FAISS range search radius matching a minimum similarity (inverse of to_similarity)."""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return 2 * min_similarity - 1
+    return 4 * (1 - min_similarity)
+
+
+def range_search(index, x: np.ndarray, min_similarity: float, k: int, params=None):
+    """
+    Ids and similarities of the stored vectors at least min_similarity from the single query x,
+    best first and capped at k, so weak matches are pruned inside FAISS.
+    """
+    lims, raw, positions = index.range_search(x, similarity_radius(index, min_similarity), params=params)
+    raw, positions = raw[lims[0]:lims[1]], positions[lims[0]:lims[1]]
+    similarities = to_similarity(index, raw)
+    if len(similarities) > k:
+        top = np.argpartition(-similarities, k - 1)[:k]
+        positions, similarities = positions[top], similarities[top]
+    order = np.argsort(-similarities, kind="stable")
+    return positions[order], similarities[order]
+
+
+def reconstruct_vectors(index, ids: np.ndarray = None) -> np.ndarray:
+    """Stored vectors in id order, or only the given ids (approximate for PQ indexes)."""
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    if ids is not None:
+        return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def evaluate_recall(vectors: np.ndarray, index, k: int = 10, num_queries: int = 200,
+                    nprobe: int = None, ef_search: int = None, seed: int = 0):
+    """
+    Recall@k and per-query latency of an index against an exact flat baseline,
+    using stored vectors with a little noise as queries.
+    """
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+    queries = (queries + rng.normal(0, 0.01, queries.shape)).astype(np.float32)
+    k = min(k, len(vectors))
+
+    baseline = faiss.IndexFlat(vectors.shape[1], index.metric_type)
+    baseline.add(vectors)
+
+    start = time.perf_counter()
+    _, exact = baseline.search(queries, k)
+    flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, approximate = index.search(queries, k, params=search_parameters(index, nprobe=nprobe, ef_search=ef_search))
+    index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(exact_row) & set(approx_row)) for exact_row, approx_row in zip(exact, approximate))
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": round(hits / (k * len(queries)), 4),
+        "flat_ms_per_query": round(flat_ms, 4),
+        "index_ms_per_query": round(index_ms, 4),
+        "index_bytes_per_vector": _bytes_per_vector(index),
+    }
+
+
+def _bytes_per_vector(index):
+    if not index.ntotal:
+        return None
+    return round(len(faiss.serialize_index(index)) / index.ntotal, 1)
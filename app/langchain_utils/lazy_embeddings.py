@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger('django')
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Defers building an embedding model until the first embed call.
+
+    Importing the vectorstore (e.g. through the URLconf during `migrate` or `shell`) no longer
+    pulls in torch and the model weights. Serving processes can call preload() at startup to
+    pay the cost before the first request instead.
+    """
+
+    def __init__(self, factory, name: str = None):
+        self.factory = factory
+        self.name = name
+        self.load_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = self.factory()
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+                    logger.info(f"Embedding model {self.name or ''} loaded in {self.load_seconds}s")
+                    self._model = model
+        return self._model
+
+    def preload(self):
+        return self.model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.model.embed_query(text)
@@ -0,0 +1,146 @@
+import bisect
+import os
+import threading
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from app.langchain_utils.docstore import MappedStrings, load_array, write_strings
+
+# Chunk metadata fields that searches can be restricted on
+INDEXED_FIELDS = ("type", "title", "job_id", "location", "resume_id")
+
+# Files of a saved index next to its generation's .faiss: sorted "field<US>value" keys and the ids of each key
+KEYS_SUFFIX = ".meta.keys"
+KEY_OFFSETS_SUFFIX = ".meta.keys.offsets.npy"
+ID_OFFSETS_SUFFIX = ".meta.postings.npy"
+POSTING_IDS_SUFFIX = ".meta.ids.npy"
+METADATA_SUFFIXES = (KEYS_SUFFIX, KEY_OFFSETS_SUFFIX, ID_OFFSETS_SUFFIX, POSTING_IDS_SUFFIX)
+KEY_SEPARATOR = "\x1f"
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+class _SavedPostings:
+    """Id postings written by MetadataIndex.save, read from (memory-mapped) arrays and searched with bisect."""
+
+    def __init__(self, prefix, mmap=True):
+        self.keys = MappedStrings(f"{prefix}{KEYS_SUFFIX}", mmap)
+        self.offsets = load_array(f"{prefix}{ID_OFFSETS_SUFFIX}", mmap)
+        self.ids = load_array(f"{prefix}{POSTING_IDS_SUFFIX}", mmap)
+
+    def postings(self, field, value):
+        key = f"{field}{KEY_SEPARATOR}{value}".encode()
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            return None
+        return self.ids[self.offsets[position]:self.offsets[position + 1]]
+
+    def values(self, field):
+        prefix = f"{field}{KEY_SEPARATOR}".encode()
+        position = bisect.bisect_left(self.keys, prefix)
+        while position < len(self.keys) and (key := self.keys[position]).startswith(prefix):
+            yield key[len(prefix):].decode()
+            position += 1
+
+
+class MetadataIndex:
+    """
+    Maps metadata values to FAISS internal ids.
+
+    Positions are assigned in insertion order like BM25Index, so the id sets can be handed
+    to FAISS as an ID selector and the search only visits matching vectors. Like BM25Index,
+    an index loaded from a saved generation keeps only the ids added since in memory.
+    """
+
+    def __init__(self, fields=INDEXED_FIELDS, saved: _SavedPostings = None, size: int = 0):
+        self.fields = fields
+        self._saved = saved
+        self._postings = {field: defaultdict(lambda: array("q")) for field in fields}
+        self._frozen = {}
+        self._size = size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, prefix, size, mmap=True, **options):
+        """The index saved with a generation of size documents, or None when it was written without one."""
+        if not all(os.path.exists(f"{prefix}{suffix}") for suffix in METADATA_SUFFIXES):
+            return None
+        return cls(saved=_SavedPostings(prefix, mmap), size=size, **options)
+
+    def save(self, prefix):
+        """Writes the postings of an index built in memory (not loaded from a saved one) next to a generation."""
+        if self._saved is not None:
+            raise ValueError("Only an index built in memory can be saved")
+        with self._lock:
+            postings = sorted((f"{field}{KEY_SEPARATOR}{value}".encode(), ids)
+                              for field, values in self._postings.items() for value, ids in values.items())
+            write_strings(f"{prefix}{KEYS_SUFFIX}", [key for key, _ in postings])
+            np.save(f"{prefix}{ID_OFFSETS_SUFFIX}",
+                    np.concatenate(([0], np.cumsum([len(ids) for _, ids in postings], dtype=np.int64))))
+            np.save(f"{prefix}{POSTING_IDS_SUFFIX}",
+                    np.concatenate([np.array(ids, dtype=np.int64) for _, ids in postings]
+                                   or [np.zeros(0, dtype=np.int64)]))
+
+    def add(self, metadatas):
+        with self._lock:
+            for metadata in metadatas:
+                for field in self.fields:
+                    value = (metadata or {}).get(field)
+                    if value is None:
+                        continue
+                    value = _normalize(value)
+                    self._postings[field][value].append(self._size)
+                    self._frozen.pop((field, value), None)
+                self._size += 1
+
+    def ids(self, field, value) -> np.ndarray:
+        key = (field, _normalize(value))
+        with self._lock:
+            frozen = self._frozen.get(key)
+            if frozen is None:
+                postings = self._postings[field].get(key[1])
+                frozen = np.array(postings if postings is not None else [], dtype=np.int64)
+                saved = self._saved.postings(*key) if self._saved is not None else None
+                if saved is not None:
+                    # Saved ids all precede added ones, so the concatenation stays sorted
+                    frozen = np.concatenate((saved, frozen)) if len(frozen) else saved
+                self._frozen[key] = frozen
+        return frozen
+
+    def ids_containing(self, field, substrings) -> np.ndarray:
+        """Ids whose value contains any of the substrings, e.g. inferred titles against stored job titles."""
+        substrings = [_normalize(substring) for substring in substrings]
+        with self._lock:
+            values = set(self._postings[field])
+            if self._saved is not None:
+                values.update(self._saved.values(field))
+            values = [value for value in values if any(sub in value for sub in substrings)]
+        if not values:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.ids(field, value) for value in values]))
+
+    def select(self, filter_type: str = None, include_titles: list[str] = None, **filters):
+        """
+        Intersects the requested restrictions into one sorted id array.
+        Returns None when nothing is restricted, meaning every id is a candidate.
+        """
+        selections = []
+        if filter_type is not None:
+            selections.append(self.ids("type", filter_type))
+        if include_titles:
+            selections.append(self.ids_containing("title", include_titles))
+        for field, value in filters.items():
+            if value is not None and field in self.fields:
+                selections.append(self.ids(field, value))
+
+        if not selections:
+            return None
+
+        selected = selections[0]
+        for other in selections[1:]:
+            selected = np.intersect1d(selected, other, assume_unique=True)
+        return selected
@@ -1,76 +1,122 @@
-from collections import defaultdict
+import faiss
+import numpy as np
+from django.conf import settings
 
-from app.langchain_utils.vectorstore import get_vectorstore
+from app.langchain_utils.aggregation import rank_documents, document_key
+from app.langchain_utils.docstore import documents_at
+from app.langchain_utils.index_factory import search_parameters, to_similarity, range_search, reconstruct_vectors
+from app.langchain_utils.vectorstore import partition_manager, embedding_model, describe_metric
 
+FUSION_METHODS = ("rrf", "weighted")
+# Standard reciprocal rank fusion constant; damps the influence of the very top ranks
+RRF_K = 60
 
-def search_matching_documents(query_text: str, top_k: int = 5, filter_type: str = "resume"):
-    vectorstore = get_vectorstore()
 
-    results = vectorstore.similarity_search_with_score(query_text, k=top_k * 5)
-    filtered = []
+def _search_positions(vectorstore, query_vector, k: int, candidates=None, nprobe: int = None, ef_search: int = None,
+                      min_score: float = None):
+    """
+    Nearest FAISS ids for one query vector with their similarity in [0, 1], best first.
+    With candidates, FAISS is restricted to that id subset through an ID selector,
+    so exactly k matching neighbours come back without over-fetching.
+    With min_score, a range search prunes weaker neighbours inside FAISS.
+    nprobe / ef_search tune recall against speed on IVF / HNSW indexes.
+    """
+    x = np.array([query_vector], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(x)
 
-    for doc, score in results:
-        if doc.metadata.get("type") != filter_type:
-            continue
+    if candidates is not None:
+        if not len(candidates):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        k = min(k, len(candidates))
+    params = search_parameters(vectorstore.index, candidates,
+                               nprobe=nprobe or settings.VECTORSTORE_NPROBE,
+                               ef_search=ef_search or settings.VECTORSTORE_EF_SEARCH)
 
-        filtered.append({
-            "score": round(score, 3),
-            "metadata": doc.metadata,
-            "content": doc.page_content
-        })
+    k = min(k, vectorstore.index.ntotal)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
 
-        if len(filtered) >= top_k:
-            break
+    if min_score is not None:
+        return range_search(vectorstore.index, x, min_score, k, params)
 
-    return filtered
+    raw, positions = vectorstore.index.search(x, k, params=params)
+    found = positions[0] >= 0
+    return positions[0][found], to_similarity(vectorstore.index, raw[0][found])
 
 
-def search_matching_documents_new(query_text: str, top_k: int = 5, filter_type: str = "resume"):
-    vectorstore = get_vectorstore()
-    results = vectorstore.similarity_search_with_score(query_text, k=top_k * 10)
+def chunks_to_fetch(top_k: int):
+    # Documents are ranked from their chunks, so several chunks per requested document are retrieved
+    return top_k * settings.SEARCH_CHUNKS_PER_RESULT
 
-    job_scores = defaultdict(list)
-    job_docs = {}
 
-    for doc, score in results:
-        if doc.metadata.get("type") != filter_type:
-            continue
+def aggregate_documents(docs, scores, top_k: int, aggregation: str = None):
+    """
+    The document ranking stage shared by every search: chunk scores (higher is better)
+    are aggregated per document with the configured strategy.
+    Returns [(best chunk index, document score, matched chunks)], best first.
+    """
+    return rank_documents(docs, scores, top_k, strategy=aggregation or settings.SEARCH_AGGREGATION,
+                          top_m=settings.SEARCH_AGGREGATION_TOP_M,
+                          temperature=settings.SEARCH_SOFTMAX_TEMPERATURE)
 
-        job_id = doc.metadata.get("job_id") or doc.metadata.get("title")
-        job_scores[job_id].append(score)
-        if job_id not in job_docs:
-            job_docs[job_id] = doc
-
-    # Aggregate scores (mean or max)
-    scored_jobs = sorted(
-        ((job_id, sum(scores)/len(scores), job_docs[job_id]) for job_id, scores in job_scores.items()),
-        key=lambda x: x[1],
-        reverse=True
-    )
-
-    # Format top results
-    top_results = []
-    for job_id, score, doc in scored_jobs[:top_k]:
-        top_results.append({
-            "score": round(score, 3),
-            "metadata": doc.metadata,
-            "content": doc.page_content
-        })
 
-    return top_results
+def similarity_search_by_vector(query_vector: list[float], k: int, filter_type: str = None,
+                                include_titles: list[str] = None, nprobe: int = None, ef_search: int = None,
+                                min_score: float = None, **filters):
+    """
+    (Document, similarity) pairs for the k nearest chunks matching the metadata restrictions.
+    Similarities are in [0, 1]; with min_score, weaker chunks are never retrieved.
+    filters may restrict any indexed field, e.g. job_id or location.
+    """
+    with partition_manager(filter_type).read_indexes() as indexes:
+        candidates = indexes.metadata.select(filter_type, include_titles, **filters)
+        positions, similarities = _search_positions(indexes.vectorstore, query_vector, k, candidates, nprobe,
+                                                    ef_search, min_score)
+        docs = documents_at(indexes.vectorstore, positions.tolist())
+    return list(zip(docs, similarities.tolist()))
 
 
-def search_matching_documents_new_2(
-    query_text: str,
+def search_matching_documents(query_text: str, top_k: int = 5, filter_type: str = "resume"):
+    # The type is applied as a FAISS pre-filter, so every result is already of filter_type
+    results = similarity_search_by_vector(embedding_model.embed_query(query_text), k=top_k, filter_type=filter_type)
+
+    return [{
+        "score": round(score, 3),
+        "metadata": doc.metadata,
+        "content": doc.page_content
+    } for doc, score in results[:top_k]]
+
+
+def search_matching_documents_new(query_text: str, top_k: int = 5, filter_type: str = "resume",
+                                  aggregation: str = "mean"):
+    results = similarity_search_by_vector(embedding_model.embed_query(query_text), k=chunks_to_fetch(top_k),
+                                          filter_type=filter_type)
+    if not results:
+        return []
+
+    docs, similarities = zip(*results)
+    ranked = aggregate_documents(docs, similarities, top_k, aggregation)
+
+    return [{
+        "score": round(score, 3),
+        "matched_chunks": matched,
+        "metadata": docs[best].metadata,
+        "content": docs[best].page_content
+    } for best, score, matched in ranked]
+
+
+def filter_matching_documents(
+    raw_results,
     top_k: int = 5,
     filter_type: str = "resume",
-    score_threshold: float = 1.2,  # <<< NEW: filter weak matches
-    include_titles: list[str] = None  # <<< NEW: optional title filter
+    score_threshold: float = None,  # <<< NEW: filter weak matches (minimum similarity)
+    include_titles: list[str] = None,  # <<< NEW: optional title filter
+    aggregation: str = None
 ):
-    vectorstore = get_vectorstore()
-    raw_results = vectorstore.similarity_search_with_score(query_text, k=top_k * 10)
-
-    filtered = []
+    if score_threshold is None:
+        score_threshold = settings.SEARCH_SCORE_THRESHOLD
+    kept_docs, kept_scores = [], []
 
     for doc, score in raw_results:
         metadata = doc.metadata or {}
@@ -87,16 +133,149 @@ def search_matching_documents_new_2(
                 continue
 
         # Filter out poor similarity scores
-        if score > score_threshold:
+        if score < score_threshold:
             continue
 
-        filtered.append({
-            "score": round(score, 3),
-            "metadata": metadata,
+        kept_docs.append(doc)
+        kept_scores.append(score)
+
+    # Surviving chunks are ranked as documents
+    ranked = aggregate_documents(kept_docs, kept_scores, top_k, aggregation)
+    return [{
+        "score": round(score, 3),
+        "matched_chunks": matched,
+        "metadata": kept_docs[best].metadata,
+        "content": kept_docs[best].page_content
+    } for best, score, matched in ranked]
+
+
+def search_matching_documents_new_2(
+    query_text: str,
+    top_k: int = 5,
+    filter_type: str = "resume",
+    score_threshold: float = None,  # <<< NEW: filter weak matches (minimum similarity)
+    include_titles: list[str] = None,  # <<< NEW: optional title filter
+    aggregation: str = None
+):
+    if score_threshold is None:
+        score_threshold = settings.SEARCH_SCORE_THRESHOLD
+    # Type, titles and the threshold are applied inside FAISS, so every retrieved chunk is a candidate
+    raw_results = similarity_search_by_vector(embedding_model.embed_query(query_text), k=chunks_to_fetch(top_k),
+                                              filter_type=filter_type, include_titles=include_titles,
+                                              min_score=score_threshold)
+    return filter_matching_documents(raw_results, top_k, filter_type, score_threshold, include_titles, aggregation)
+
+
+def _min_max(values):
+    if not len(values):
+        return values
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread else np.ones_like(values)
+
+
+def fuse_rankings(dense_positions, dense_similarities, lexical_positions, lexical_scores,
+                  alpha: float = 0.5, method: str = "rrf"):
+    """
+    Fuses two ranked candidate lists into one, best first.
+    alpha weights the dense side: 1.0 is vector-only, 0.0 is BM25-only.
+    """
+    if method == "rrf":
+        dense_part = alpha / (RRF_K + np.arange(1, len(dense_positions) + 1))
+        lexical_part = (1 - alpha) / (RRF_K + np.arange(1, len(lexical_positions) + 1))
+    else:
+        dense_part = alpha * _min_max(np.asarray(dense_similarities, dtype=np.float64))
+        lexical_part = (1 - alpha) * _min_max(np.asarray(lexical_scores, dtype=np.float64))
+
+    positions, inverse = np.unique(np.concatenate([dense_positions, lexical_positions]).astype(np.int64),
+                                   return_inverse=True)
+    fused = np.bincount(inverse, weights=np.concatenate([dense_part, lexical_part]), minlength=len(positions))
+    order = np.argsort(-fused, kind="stable")
+    return positions[order], fused[order]
+
+
+def hybrid_search(query_text: str, top_k: int = 5, filter_type: str = "resume",
+                  alpha: float = 0.5, fusion: str = "rrf", filters: dict = None,
+                  nprobe: int = None, ef_search: int = None, aggregation: str = None):
+    """
+    Dense FAISS neighbours fused with BM25 matches over the same chunks, ranked as documents.
+    Exact skill tokens that the embedding model blurs still surface through the lexical side.
+    Both sides are restricted to chunks matching filter_type and filters before scoring.
+    """
+    fetch_k = chunks_to_fetch(top_k)
+    query_vector = embedding_model.embed_query(query_text)
+
+    with partition_manager(filter_type).read_indexes() as indexes:
+        candidates = indexes.metadata.select(filter_type, **(filters or {}))
+        dense_positions, dense_similarities = _search_positions(indexes.vectorstore, query_vector, fetch_k,
+                                                                candidates, nprobe, ef_search)
+        lexical_positions, lexical_scores = indexes.lexical.search(query_text, fetch_k, candidates)
+
+        fused_positions, fused_scores = fuse_rankings(
+            dense_positions, dense_similarities, lexical_positions, lexical_scores, alpha, fusion)
+        fused_positions = fused_positions.tolist()
+        docs = documents_at(indexes.vectorstore, fused_positions)
+
+    ranked = aggregate_documents(docs, fused_scores, top_k, aggregation)
+
+    similarity_by_position = dict(zip(dense_positions.tolist(), dense_similarities.tolist()))
+    lexical_by_position = dict(zip(lexical_positions.tolist(), lexical_scores.tolist()))
+
+    results = []
+    for best, score, matched in ranked:
+        position, doc = fused_positions[best], docs[best]
+        vector_similarity = similarity_by_position.get(position)
+        lexical_score = lexical_by_position.get(position)
+        results.append({
+            "score": round(score, 5),
+            "matched_chunks": matched,
+            "vector_similarity": round(vector_similarity, 3) if vector_similarity is not None else None,
+            "lexical_score": round(lexical_score, 3) if lexical_score is not None else None,
+            "metadata": doc.metadata,
             "content": doc.page_content
         })
 
-        if len(filtered) >= top_k:
-            break
+    return results
+
+
+def calibrate_thresholds(sample_size: int = 1000, k: int = 10, filter_type: str = None,
+                         percentiles=(50, 75, 90, 95, 99), seed: int = 0):
+    """
+    Similarity percentiles between stored chunks and their nearest chunks of other documents.
+
+    "nearest" is the best match of a different document and "kth" the k-th best, so a
+    threshold above the typical kth similarity keeps only matches that stand out from the corpus.
+    """
+    with partition_manager(filter_type).read_indexes() as indexes:
+        vectorstore = indexes.vectorstore
+        candidates = indexes.metadata.select(filter_type)
+        ids = candidates if candidates is not None else np.arange(vectorstore.index.ntotal)
+        if not len(ids):
+            return None
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(ids, min(sample_size, len(ids)), replace=False))
+        vectors = reconstruct_vectors(vectorstore.index, sample)
+        sample_docs = documents_at(vectorstore, sample.tolist())
+
+        # Chunks of the same document are near-duplicates of each other, so extra neighbours are fetched to skip them
+        nearest, kth = [], []
+        for vector, doc, position in zip(vectors, sample_docs, sample.tolist()):
+            positions, similarities = _search_positions(vectorstore, vector, k * 4 + 1, candidates)
+            key = document_key(doc.metadata, position)
+            neighbours = documents_at(vectorstore, positions.tolist())
+            others = [similarity for neighbour, neighbour_position, similarity
+                      in zip(neighbours, positions.tolist(), similarities.tolist())
+                      if document_key(neighbour.metadata, neighbour_position) != key]
+            if others:
+                nearest.append(others[0])
+                kth.append(others[min(k, len(others)) - 1])
 
-    return filtered
+    if not nearest:
+        return None
+    return {
+        "sampled": len(sample),
+        "k": k,
+        "metric": describe_metric(vectorstore),
+        "nearest": {f"p{p}": round(float(v), 4) for p, v in zip(percentiles, np.percentile(nearest, percentiles))},
+        "kth": {f"p{p}": round(float(v), 4) for p, v in zip(percentiles, np.percentile(kth, percentiles))},
+    }
@@ -1,33 +1,80 @@
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.jobrole.utils import extract_relevant_sections_with_llm
-from app.langchain_utils.vectorstore import get_vectorstore, FAISS_INDEX_PATH
+from app.langchain_utils.chunking import iter_chunks
+from app.langchain_utils.vectorstore import embedding_model, partition_manager
+
+
+def iter_document_chunks(relevant_text: str, metadata: dict):
+    """
+    Yields chunk Documents of one job description or resume as the chunker produces them.
+    chunk_total is only known after the last chunk, so it is filled into the metadata of every
+    yielded chunk once the generator moves past the document; consumers that exhaust the
+    generator before persisting (like store_documents) always see it.
+    """
+    chunk_metadatas = []
+    for i, chunk in enumerate(iter_chunks(relevant_text)):
+        chunk_metadata = {**metadata, "chunk_index": i, "chunk_tokens": chunk.tokens}
+        if chunk.section:
+            chunk_metadata["section"] = chunk.section
+        doc = Document(page_content=chunk.text, metadata=chunk_metadata)
+        # Document copies the metadata dict, so the yielded document's own dict is kept for the update below
+        chunk_metadatas.append(doc.metadata)
+        yield doc
+
+    for chunk_metadata in chunk_metadatas:
+        chunk_metadata["chunk_total"] = len(chunk_metadatas)
+
+
+def split_job_description(relevant_text: str, metadata: dict) -> list[Document]:
+    return list(iter_document_chunks(relevant_text, metadata))
+
 
+def embed_in_batches(docs, batch_size: int = None):
+    """Yields (Document, vector) pairs, embedding batch_size chunks per model call as they arrive."""
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    docs = iter(docs)
+    while batch := list(islice(docs, batch_size)):
+        yield from zip(batch, embedding_model.embed_documents([doc.page_content for doc in batch]))
 
-def store_job_description(text: str, metadata: dict):
-    vectorstore = get_vectorstore()
 
-    #Chunking(optional)
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    relevant_text = extract_relevant_sections_with_llm(text)
-    chunks = splitter.split_text(relevant_text)
-    # docs = [Document(page_content=chunk, metadata=metadata) for chunk in chunks]
+def store_documents(docs):
+    """
+    Embeds chunk Documents batch by batch as they stream in and appends them to the index
+    partition of their type, as one segment per partition for the whole call.
+    """
+    # Segments store the vectors, so readers never re-embed these chunks; buffered as float32 rows, not float lists
+    by_type = {}
+    docs = iter(docs)
+    while batch := list(islice(docs, settings.EMBEDDING_BATCH_SIZE)):
+        vectors = np.asarray(embedding_model.embed_documents([doc.page_content for doc in batch]), dtype=np.float32)
+        for doc, vector in zip(batch, vectors):
+            texts, embeddings, metadatas = by_type.setdefault(doc.metadata.get("type"), ([], [], []))
+            texts.append(doc.page_content)
+            embeddings.append(vector)
+            metadatas.append(doc.metadata)
 
-    docs = []
-    for i, chunk in enumerate(chunks):
-        chunk_metadata = {
-            **metadata,
-            "chunk_index": i,
-            "chunk_total": len(chunks)
-        }
-        docs.append(Document(page_content=chunk, metadata=chunk_metadata))
+    # One segment per call, so a bulk ingest triggers compaction per VECTORSTORE_COMPACT_SEGMENTS calls, not batches
+    for doc_type, (texts, embeddings, metadatas) in by_type.items():
+        partition_manager(doc_type).append_documents(texts, np.stack(embeddings), metadatas)
+    return sum(len(texts) for texts, _, _ in by_type.values())
 
-    vectorstore.add_documents(docs)
 
+def store_job_description(text: str, metadata: dict, relevant_text: str = None):
+    # Callers that already ran the extraction (e.g. async views) pass its result in
+    if relevant_text is None:
+        relevant_text = extract_relevant_sections_with_llm(text)
+    store_documents(iter_document_chunks(relevant_text, metadata))
+    return {"status": "stored", "metadata": metadata}
 
-    # doc = Document(page_content=text, metadata=metadata)
-    # vectorstore.add_documents([doc])
 
-    vectorstore.save_local(FAISS_INDEX_PATH)
-    return {"status": "stored", "metadata": metadata}
\ No newline at end of file
+def store_resume(text: str, metadata: dict, relevant_text: str = None):
+    """Indexes a resume in the resume partition; the same extraction prompt covers resumes."""
+    if relevant_text is None:
+        relevant_text = extract_relevant_sections_with_llm(text)
+    store_documents(iter_document_chunks(relevant_text, {**metadata, "type": "resume"}))
+    return {"status": "stored", "metadata": metadata}
@@ -1,22 +1,642 @@
+import json
+import logging
 import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import faiss
+import numpy as np
+from django.conf import settings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores.faiss import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+
+from app.langchain_utils.bm25 import BM25_SUFFIXES, BM25Index
+from app.langchain_utils.docstore import DOCS_SUFFIX, IDS_SUFFIX, OFFSETS_SUFFIX, MappedDocstore, PositionIds, \
+    documents_at, write_docstore
+from app.langchain_utils.embedding_backends import LEGACY_EMBEDDING_MODEL_ID, build_embeddings, embedding_model_id
+from app.langchain_utils.embedding_cache import CachedEmbeddings
+from app.langchain_utils.embedding_server import RemoteEmbeddings, pin_torch_threads
+from app.langchain_utils.index_factory import build_index, describe_index, faiss_metric, reconstruct_vectors, \
+    train_index
+from app.langchain_utils.lazy_embeddings import LazyEmbeddings
+from app.langchain_utils.locks import ReadWriteLock, atomic_write, file_lock
+from app.langchain_utils.metadata_index import METADATA_SUFFIXES, MetadataIndex
+
+logger = logging.getLogger('django')
 
 FAISS_INDEX_PATH = "vectorstore/faiss_index"
+RESUME_INDEX_PATH = "vectorstore/resume_index"
+FAISS_MANIFEST_FILE = "MANIFEST"
+FAISS_SEGMENTS_DIR = "segments"
+DEFAULT_INDEX_NAME = "index"
+# Every file a generation may consist of; pickled docstores (.pkl) predate the mapped layout
+GENERATION_SUFFIXES = (".faiss", ".pkl", DOCS_SUFFIX, OFFSETS_SUFFIX, IDS_SUFFIX, *BM25_SUFFIXES, *METADATA_SUFFIXES)
+EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL_NAME
+# What the index manifest and the embedding cache record as the source of a vector
+EMBEDDING_MODEL_ID = embedding_model_id(settings.EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME)
+
+# Everything a search needs, consistent for the duration of one read lock
+SearchIndexes = namedtuple("SearchIndexes", ["vectorstore", "lexical", "metadata"])
+
+
+
+def _load_embedding_model():
+    if settings.EMBEDDING_TORCH_THREADS and settings.EMBEDDING_BACKEND == "torch":
+        pin_torch_threads(settings.EMBEDDING_TORCH_THREADS)
+    return build_embeddings(settings.EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                            threads=settings.EMBEDDING_TORCH_THREADS)
+
+
+# In-process model, loaded on first use
+local_embeddings = LazyEmbeddings(_load_embedding_model, name=EMBEDDING_MODEL_ID)
+
+
+def _embedding_backend():
+    if settings.EMBEDDING_SERVER_SOCKET:
+        # Served by run_embedding_server; the in-process model is only loaded if the server is down
+        return RemoteEmbeddings(settings.EMBEDDING_SERVER_SOCKET, fallback=local_embeddings,
+                                timeout=settings.EMBEDDING_SERVER_TIMEOUT_SECONDS)
+    return local_embeddings
+
+
+#Embedding model, shared by the store and search paths through the embedding cache
+embedding_model = CachedEmbeddings(
+    _embedding_backend(),
+    model_name=EMBEDDING_MODEL_ID,
+    cache_path=settings.EMBEDDING_CACHE_PATH,
+    memory_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+    disk_entries=settings.EMBEDDING_CACHE_DISK_ENTRIES,
+)
+
+
+def _metric_options(metric):
+    """FAISS wrapper options for a metric: cosine normalizes every vector and searches by inner product."""
+    if metric == "cosine":
+        return {"normalize_L2": True, "distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT}
+    return {"normalize_L2": False, "distance_strategy": DistanceStrategy.EUCLIDEAN_DISTANCE}
+
+
+def describe_metric(vectorstore):
+    return "cosine" if vectorstore._normalize_L2 and vectorstore.index.metric_type == faiss_metric("cosine") else "l2"
+
+
+def generation_model(manifest):
+    """Embedding model id of the vectors in an index generation."""
+    return manifest.get("embedding_model", LEGACY_EMBEDDING_MODEL_ID)
+
+
+class VectorStoreManager:
+    """
+    Keeps a single FAISS vectorstore resident in the process.
+
+    On disk the index is a main generation named by MANIFEST plus append-only segments.
+    Ingestion writes a new segment instead of rewriting the index, readers apply new
+    segments in place, and compaction periodically folds segments into a new generation.
+
+    Generations and segments record the embedding model of their vectors. A process never
+    switches to a generation embedded with another model than its own (embedding_id), so an
+    index re-embedded for a new model only goes live as workers restart on that model.
+    """
+
+    def __init__(self, index_path, check_interval=1.0, compact_after=20, mmap=True, embeddings=None,
+                 embedding_id=LEGACY_EMBEDDING_MODEL_ID):
+        self.index_path = index_path
+        self.manifest_path = os.path.join(index_path, FAISS_MANIFEST_FILE)
+        self.segments_path = os.path.join(index_path, FAISS_SEGMENTS_DIR)
+        self.lock_path = f"{index_path}.lock"
+        self.check_interval = check_interval
+        self.compact_after = compact_after
+        self.mmap = mmap
+        self.embeddings = embeddings
+        self.embedding_id = embedding_id
+
+        self._vectorstore = None
+        self._lexical_index = None
+        self._metadata_index = None
+        self._manifest = None
+        self._applied_segments = set()
+        self._last_check = 0.0
+        self._rw_lock = ReadWriteLock()
+        self._load_lock = threading.Lock()
+        self._compaction_thread = None
+        self._held_back_version = None
+
+        self._metrics = {
+            "loads": 0,
+            "reloads": 0,
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+            "loaded_at": None,
+            "segments_written": 0,
+            "segments_applied": 0,
+            "compactions": 0,
+            "last_compaction_seconds": None,
+            "segments_reembedded": 0,
+        }
+
+    # Disk layout
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            # Indexes saved before the manifest existed are versioned by their mtime
+            index_file = os.path.join(self.index_path, f"{DEFAULT_INDEX_NAME}.faiss")
+            version = f"mtime-{os.stat(index_file).st_mtime_ns}" if os.path.exists(index_file) else None
+            manifest = {"version": version, "index_name": DEFAULT_INDEX_NAME, "compacted_segments": []}
+            if version is None:
+                # Nothing stored yet; the placeholder index is embedded by this process
+                manifest["embedding_model"] = self.embedding_id
+            return manifest
+
+    def _pending_segments(self, manifest, applied):
+        try:
+            names = sorted(name for name in os.listdir(self.segments_path) if name.endswith(".npz"))
+        except FileNotFoundError:
+            return []
+
+        compacted = set(manifest["compacted_segments"])
+        return [name for name in names if name not in compacted and name not in applied]
+
+    def _read_segment(self, name):
+        with np.load(os.path.join(self.segments_path, name)) as segment:
+            embeddings = segment["embeddings"]
+            docs = json.loads(str(segment["docs"]))
+            model = str(segment["embedding_model"]) if "embedding_model" in segment else LEGACY_EMBEDDING_MODEL_ID
+        return embeddings, docs, model
+
+    def _segment_embeddings(self, manifest, segment):
+        """
+        Vectors of a segment in the embedding space of a generation, or None when this process
+        cannot produce them (it runs another model than the generation).
+        """
+        embeddings, docs, model = segment
+        target = generation_model(manifest)
+        if model == target:
+            return embeddings
+        if target != self.embedding_id or self.embeddings is None:
+            return None
+        # Written by a worker still on the previous model while the index was being re-embedded
+        self._metrics["segments_reembedded"] += 1
+        return np.asarray(self.embeddings.embed_documents([doc["text"] for doc in docs]), dtype=np.float32)
+
+    @staticmethod
+    def _apply_segment(vectorstore, lexical_index, metadata_index, embeddings, docs):
+        if getattr(vectorstore, "index_is_mapped", False):
+            # A mapped index is read-only; this worker keeps a private copy until the next compaction
+            vectorstore.index = faiss.deserialize_index(faiss.serialize_index(vectorstore.index))
+            vectorstore.index_is_mapped = False
+        texts = [doc["text"] for doc in docs]
+        metadatas = [doc["metadata"] for doc in docs]
+        vectorstore.add_embeddings(
+            zip(texts, embeddings.tolist()),
+            metadatas=metadatas,
+            ids=[doc["id"] for doc in docs],
+        )
+        # Appended in the same order, so lexical and metadata positions stay equal to FAISS ids
+        if lexical_index is not None:
+            lexical_index.add(texts)
+        if metadata_index is not None:
+            metadata_index.add(metadatas)
+
+    @staticmethod
+    def _build_side_indexes(docs):
+        lexical_index = BM25Index()
+        lexical_index.add(doc.page_content for doc in docs)
+        metadata_index = MetadataIndex()
+        metadata_index.add(doc.metadata for doc in docs)
+        return lexical_index, metadata_index
+
+    def _load_side_indexes(self, manifest, vectorstore, mmap=False):
+        """
+        The side indexes saved with a mapped generation, mapped like its docstore; generations
+        written without them (and the placeholder) are rebuilt from their documents.
+        """
+        if manifest.get("format") == "mapped":
+            prefix = os.path.join(self.index_path, manifest["index_name"])
+            lexical_index = BM25Index.load(prefix, mmap)
+            metadata_index = MetadataIndex.load(prefix, vectorstore.index.ntotal, mmap)
+            if lexical_index is not None and metadata_index is not None:
+                return lexical_index, metadata_index
+        return self._build_side_indexes(documents_at(vectorstore, range(len(vectorstore.index_to_docstore_id))))
+
+    def _load_main(self, manifest, mmap=False):
+        index_name = manifest["index_name"]
+        prefix = os.path.join(self.index_path, index_name)
+        if manifest.get("format") == "mapped":
+            # Index and docstore pages are mapped read-only and shared between worker processes
+            index = faiss.read_index(f"{prefix}.faiss", faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0)
+            docstore = MappedDocstore(prefix)
+            vectorstore = FAISS(embedding_model, index, docstore, PositionIds(docstore),
+                                **_metric_options(manifest.get("metric", "l2")))
+            vectorstore.index_is_mapped = mmap
+            return vectorstore
+        if os.path.exists(f"{prefix}.faiss"):
+            # Load the vectorstore; generations written before the metric was recorded are L2
+            return FAISS.load_local(self.index_path, embedding_model, index_name=index_name,
+                                    allow_dangerous_deserialization=True,
+                                    **_metric_options(manifest.get("metric", "l2")))
+        return FAISS.from_texts(["placeholder"], embedding_model, **_metric_options(settings.VECTORSTORE_METRIC))
+
+    # Loading
+
+    def _load_generation(self, manifest):
+        vectorstore = self._load_main(manifest, mmap=self.mmap)
+        lexical_index, metadata_index = self._load_side_indexes(manifest, vectorstore, mmap=self.mmap)
+        applied = set()
+        for name in self._pending_segments(manifest, applied):
+            segment = self._read_segment(name)
+            embeddings = self._segment_embeddings(manifest, segment)
+            if embeddings is not None:
+                self._apply_segment(vectorstore, lexical_index, metadata_index, embeddings, segment[1])
+            else:
+                logger.warning(f"Skipping segment {name}: embedded with {segment[2]}, this process runs "
+                               f"{self.embedding_id} and the index {generation_model(manifest)}")
+            applied.add(name)
+        return SearchIndexes(vectorstore, lexical_index, metadata_index), applied
+
+    def _load(self, manifest):
+        """Loads manifest's generation and segments. Returns (indexes, applied segments, the manifest loaded)."""
+        start = time.perf_counter()
+
+        while True:
+            try:
+                indexes, applied = self._load_generation(manifest)
+                break
+            except FileNotFoundError:
+                # Compacted away while we were reading; retry from the manifest that replaced it
+                latest = self._read_manifest()
+                if latest["version"] == manifest["version"]:
+                    raise
+                logger.info(f"Vectorstore generation {manifest['version']} was compacted while loading; "
+                            f"loading {latest['version']}")
+                manifest = latest
+
+        elapsed = time.perf_counter() - start
+        if self._metrics["loads"]:
+            self._metrics["reloads"] += 1
+        self._metrics["loads"] += 1
+        self._metrics["last_load_seconds"] = round(elapsed, 4)
+        self._metrics["total_load_seconds"] += elapsed
+        self._metrics["loaded_at"] = time.time()
+
+        logger.info(f"Vectorstore loaded from {self.index_path} with {len(applied)} segments "
+                    f"in {elapsed:.3f}s (pid {os.getpid()})")
+        return indexes, applied, manifest
+
+    def _apply_pending(self, manifest):
+        """Applies segments written since the last check. Returns False if a full reload is needed."""
+        with self._load_lock:
+            if manifest["version"] != self._manifest["version"]:
+                return False
 
-#Embedding model
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+            pending = self._pending_segments(manifest, self._applied_segments)
+            try:
+                segments = [(name, self._read_segment(name)) for name in pending]
+            except FileNotFoundError:
+                # Compacted away while we were reading; the new generation has them
+                return False
 
+            segments = [(name, self._segment_embeddings(manifest, segment), segment[1]) for name, segment in segments]
+            with self._rw_lock.write():
+                for name, embeddings, docs in segments:
+                    if embeddings is not None:
+                        self._apply_segment(self._vectorstore, self._lexical_index, self._metadata_index,
+                                            embeddings, docs)
+                    self._applied_segments.add(name)
+            self._metrics["segments_applied"] += len(segments)
+        return True
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if self._vectorstore is not None and not force and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        manifest = self._read_manifest()
+        if self._vectorstore is not None and self._apply_pending(manifest):
+            return
+
+        # Only one thread loads; readers keep using the previous instance meanwhile
+        with self._load_lock:
+            manifest = self._read_manifest()
+            if self._vectorstore is not None and manifest["version"] == self._manifest["version"]:
+                return
+            if self._vectorstore is not None and generation_model(manifest) != self.embedding_id:
+                # Re-embedded for another model: queries of this process would not match it, so the
+                # loaded generation keeps serving until the worker restarts on the new model
+                if manifest["version"] != self._held_back_version:
+                    self._held_back_version = manifest["version"]
+                    logger.warning(f"Index generation {manifest['version']} is embedded with "
+                                   f"{generation_model(manifest)}; keeping {self._manifest['version']} "
+                                   f"for {self.embedding_id}")
+                return
+            if generation_model(manifest) != self.embedding_id:
+                logger.error(f"Vectorstore at {self.index_path} is embedded with {generation_model(manifest)} but "
+                             f"this process embeds with {self.embedding_id}; run reembed_vectorstore or align "
+                             f"EMBEDDING_BACKEND/EMBEDDING_MODEL_NAME")
+            indexes, applied, manifest = self._load(manifest)
+            with self._rw_lock.write():
+                self._vectorstore, self._lexical_index, self._metadata_index = indexes
+                self._manifest = manifest
+                self._applied_segments = applied
+
+    # Public API
+
+    def get(self):
+        self._refresh()
+        return self._vectorstore
+
+    @contextmanager
+    def read(self):
+        """Shared access for searches."""
+        self._refresh()
+        with self._rw_lock.read():
+            yield self._vectorstore
+
+    @contextmanager
+    def read_indexes(self):
+        """Shared access to the vectorstore with the BM25 and metadata indexes built over the same chunks."""
+        self._refresh()
+        with self._rw_lock.read():
+            yield SearchIndexes(self._vectorstore, self._lexical_index, self._metadata_index)
+
+    def has_index(self):
+        """Whether anything has been stored on disk; a fresh deployment only has the placeholder index."""
+        manifest = self._read_manifest()
+        index_file = os.path.join(self.index_path, f"{manifest['index_name']}.faiss")
+        return os.path.exists(index_file) or bool(self._pending_segments(manifest, set()))
+
+    def append_documents(self, texts, embeddings, metadatas):
+        """
+        Persists new documents as one immutable segment without rewriting the index.
+        Segment names are unique, so concurrent writers in any process never overwrite each other.
+        """
+        docs = [
+            {"id": str(uuid.uuid4()), "text": text, "metadata": metadata}
+            for text, metadata in zip(texts, metadatas)
+        ]
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.npz"
+
+        os.makedirs(self.segments_path, exist_ok=True)
+        atomic_write(
+            os.path.join(self.segments_path, name),
+            lambda segment_file: np.savez(segment_file,
+                                          embeddings=np.asarray(embeddings, dtype=np.float32),
+                                          docs=np.array(json.dumps(docs)),
+                                          embedding_model=np.array(self.embedding_id)),
+        )
+        self._metrics["segments_written"] += 1
+
+        self._refresh(force=True)
+        self._maybe_compact()
+        return [doc["id"] for doc in docs]
+
+    # Compaction
+
+    def _write_generation(self, blocking=True, transform=None):
+        """
+        Writes a new main generation holding the current generation plus all pending segments.
+        transform may replace the FAISS index (e.g. a different tier) before it is saved.
+        Returns (acquired, segment_count, result of transform).
+        """
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with file_lock(self.lock_path, blocking=blocking) as acquired:
+            if not acquired:
+                return False, 0, None
+
+            manifest = self._read_manifest()
+            segments = self._pending_segments(manifest, set())
+            if not segments and transform is None:
+                return True, 0, None
+
+            vectorstore = self._load_main(manifest)
+            for name in segments:
+                segment = self._read_segment(name)
+                embeddings = self._segment_embeddings(manifest, segment)
+                if embeddings is None:
+                    # Only a process running the generation's model can convert the segment; leave it to one
+                    logger.warning(f"Not compacting: segment {name} is embedded with {segment[2]} and "
+                                   f"this process cannot re-embed it for {generation_model(manifest)}")
+                    return True, 0, None
+                self._apply_segment(vectorstore, None, None, embeddings, segment[1])
+            transformed = transform(vectorstore) if transform is not None else None
+
+            self._commit_generation(manifest, segments, vectorstore, generation_model(manifest))
+        return True, len(segments), transformed
+
+    def _commit_generation(self, manifest, segments, vectorstore, embedding_id):
+        """Writes vectorstore as the new main generation replacing manifest and segments. Call with the file lock held."""
+        version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        index_name = f"{DEFAULT_INDEX_NAME}-{version}"
+        # A partition that was never written has no directory yet
+        os.makedirs(self.index_path, exist_ok=True)
+        prefix = os.path.join(self.index_path, index_name)
+        faiss.write_index(vectorstore.index, f"{prefix}.faiss")
+        positions = range(vectorstore.index.ntotal)
+        docs = documents_at(vectorstore, positions)
+        write_docstore(prefix, docs, [vectorstore.index_to_docstore_id[position] for position in positions])
+        # Saved with the generation so loading workers map them instead of re-tokenizing every document
+        for side_index in self._build_side_indexes(docs):
+            side_index.save(prefix)
+
+        # Switching the manifest is the commit point
+        new_manifest = {
+            "version": version,
+            "index_name": index_name,
+            "index_type": describe_index(vectorstore.index),
+            "metric": describe_metric(vectorstore),
+            "embedding_model": embedding_id,
+            "format": "mapped",
+            "compacted_segments": segments,
+        }
+        atomic_write(self.manifest_path, lambda manifest_file: manifest_file.write(json.dumps(new_manifest).encode()))
+
+        for name in segments:
+            os.remove(os.path.join(self.segments_path, name))
+        # The previous generation is kept for readers that read the old manifest just before the switch
+        self._remove_generations(keep={index_name, manifest["index_name"]})
+
+    def compact(self, blocking=True):
+        """
+        Folds all pending segments into a new main generation.
+        Returns False if another process is already compacting and blocking is off.
+        """
+        start = time.perf_counter()
+        acquired, segment_count, _ = self._write_generation(blocking=blocking)
+        if acquired and segment_count:
+            elapsed = time.perf_counter() - start
+            self._metrics["compactions"] += 1
+            self._metrics["last_compaction_seconds"] = round(elapsed, 4)
+            logger.info(f"Vectorstore compacted {segment_count} segments in {elapsed:.3f}s")
+        return acquired
+
+    def rebuild(self, index_type, metric=None, train_sample=100000, **index_options):
+        """
+        Re-creates the FAISS index as another tier (see index_factory.INDEX_TYPES) and writes it as a new generation.
+        metric switches between L2 and cosine (index_factory.METRICS); the current metric is kept by default.
+        Vectors keep their ids, so the docstore, BM25 and metadata indexes stay valid.
+        Returns (vectors, old index, new index) for evaluation.
+        """
+        def transform(vectorstore):
+            old_index = vectorstore.index
+            target_metric = metric or describe_metric(vectorstore)
+            vectors = reconstruct_vectors(old_index)
+            if target_metric == "cosine":
+                faiss.normalize_L2(vectors)
+
+            new_index = build_index(index_type, old_index.d, len(vectors), metric=faiss_metric(target_metric),
+                                    **index_options)
+            train_index(new_index, vectors, sample_size=train_sample)
+            new_index.add(vectors)
+            vectorstore.index = new_index
+            options = _metric_options(target_metric)
+            vectorstore._normalize_L2 = options["normalize_L2"]
+            vectorstore.distance_strategy = options["distance_strategy"]
+            return vectors, old_index, new_index
+
+        start = time.perf_counter()
+        _, _, result = self._write_generation(transform=transform)
+        self._refresh(force=True)
+        logger.info(f"Vectorstore rebuilt as {index_type} in {time.perf_counter() - start:.3f}s")
+        return result
+
+    def reembed(self, embedding_id, embeddings, batch_size=256, train_sample=100000, progress=None, **index_options):
+        """
+        Re-embeds every stored chunk (main generation and pending segments) with another embedding
+        model and writes the result as a new generation of the same tier and metric, recorded as
+        embedding_id. index_options go to build_index (e.g. pq_m for a model of another dimension).
+        Chunks keep their ids, so the docstore and side indexes stay valid.
+
+        Processes on the previous model keep serving the generation they have loaded; segments they
+        write meanwhile are re-embedded by the first process on the new model that loads or compacts them.
+        Returns the number of re-embedded chunks.
+        """
+        start = time.perf_counter()
+        with file_lock(self.lock_path):
+            manifest = self._read_manifest()
+            segments = self._pending_segments(manifest, set())
+            current = self._load_main(manifest)
+            positions = range(current.index.ntotal)
+            docs = documents_at(current, positions)
+            ids = [current.index_to_docstore_id[position] for position in positions]
+            for name in segments:
+                for doc in self._read_segment(name)[1]:
+                    docs.append(Document(id=doc["id"], page_content=doc["text"], metadata=doc["metadata"]))
+                    ids.append(doc["id"])
+
+            vectors = []
+            for offset in range(0, len(docs), batch_size):
+                batch = [doc.page_content for doc in docs[offset:offset + batch_size]]
+                vectors.append(np.asarray(embeddings.embed_documents(batch), dtype=np.float32))
+                if progress is not None:
+                    progress(min(offset + batch_size, len(docs)), len(docs))
+            vectors = np.concatenate(vectors)
+
+            metric = describe_metric(current)
+            if metric == "cosine":
+                faiss.normalize_L2(vectors)
+            index = build_index(describe_index(current.index), vectors.shape[1], len(vectors),
+                                metric=faiss_metric(metric), **index_options)
+            train_index(index, vectors, sample_size=train_sample)
+            index.add(vectors)
+
+            vectorstore = FAISS(embeddings, index, InMemoryDocstore(dict(zip(ids, docs))), dict(enumerate(ids)),
+                                **_metric_options(metric))
+            self._commit_generation(manifest, segments, vectorstore, embedding_id)
+
+        self._refresh(force=True)
+        logger.info(f"Vectorstore re-embedded {len(docs)} chunks with {embedding_id} in "
+                    f"{time.perf_counter() - start:.3f}s")
+        return len(docs)
+
+    def _remove_generations(self, keep):
+        for name in os.listdir(self.index_path):
+            index_name, _, extension = name.partition(".")
+            if f".{extension}" not in GENERATION_SUFFIXES or index_name in keep:
+                continue
+            if index_name == DEFAULT_INDEX_NAME or index_name.startswith(f"{DEFAULT_INDEX_NAME}-"):
+                os.remove(os.path.join(self.index_path, name))
+
+    def _run_compaction(self):
+        try:
+            self.compact(blocking=False)
+        except Exception:
+            logger.error("Background vectorstore compaction failed", exc_info=True)
+
+    def _maybe_compact(self):
+        if len(self._pending_segments(self._manifest, set())) < self.compact_after:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self._run_compaction, daemon=True)
+        self._compaction_thread.start()
+
+    def stats(self):
+        disk_manifest = self._read_manifest()
+        loaded_version = self._manifest["version"] if self._manifest else None
+        loaded_at = self._metrics["loaded_at"]
+        return {
+            **self._metrics,
+            "total_load_seconds": round(self._metrics["total_load_seconds"], 4),
+            "pid": os.getpid(),
+            "index_path": self.index_path,
+            "loaded_version": loaded_version,
+            "disk_version": disk_manifest["version"],
+            "loaded_segments": len(self._applied_segments),
+            "pending_segments": len(self._pending_segments(disk_manifest, self._applied_segments)),
+            "index_type": describe_index(self._vectorstore.index) if self._vectorstore is not None else None,
+            "metric": describe_metric(self._vectorstore) if self._vectorstore is not None else None,
+            "embedding_model": self.embedding_id,
+            "index_embedding_model": generation_model(self._manifest) if self._manifest else None,
+            "embedding_mismatch": self._manifest is not None and generation_model(self._manifest) != self.embedding_id,
+            "mapped": getattr(self._vectorstore, "index_is_mapped", False),
+            "stale": self._vectorstore is not None and disk_manifest["version"] != loaded_version,
+            "seconds_since_load": round(time.time() - loaded_at, 3) if loaded_at else None,
+        }
+
+
+def _partition(index_path):
+    return VectorStoreManager(
+        index_path,
+        check_interval=settings.VECTORSTORE_RELOAD_CHECK_SECONDS,
+        compact_after=settings.VECTORSTORE_COMPACT_SEGMENTS,
+        mmap=settings.VECTORSTORE_MMAP,
+        embeddings=embedding_model,
+        embedding_id=EMBEDDING_MODEL_ID,
+    )
+
+
+# Job descriptions and resumes are indexed separately, so a search only touches vectors of the
+# type it asks for and each corpus is compacted, rebuilt and re-embedded on its own
+vectorstore_manager = _partition(FAISS_INDEX_PATH)
+resume_vectorstore_manager = _partition(RESUME_INDEX_PATH)
+INDEX_PARTITIONS = {"job": vectorstore_manager, "resume": resume_vectorstore_manager}
+
+
+def partition_manager(doc_type: str = None) -> VectorStoreManager:
+    """The manager holding chunks of a document type; untyped access goes to the job index."""
+    return INDEX_PARTITIONS.get(doc_type, vectorstore_manager)
 
 
 def get_vectorstore():
-    if os.path.exists(FAISS_INDEX_PATH):
+    return vectorstore_manager.get()
 
-        # Load the vectorstore
-        return FAISS.load_local(FAISS_INDEX_PATH, embedding_model,allow_dangerous_deserialization=True)
-    else:
-        return FAISS.from_texts(["placeholder"], embedding_model)
+
+def preload():
+    """Loads the embedding model and the vectorstore up front, e.g. in a serving worker before it takes requests."""
+    start = time.perf_counter()
+    if not settings.EMBEDDING_SERVER_SOCKET:
+        local_embeddings.preload()
+    for manager in INDEX_PARTITIONS.values():
+        manager.get()
+    logger.info(f"Embedding model and vectorstore preloaded in {time.perf_counter() - start:.3f}s (pid {os.getpid()})")
 
 
 def safe_vector_format(vec):
@@ -25,4 +645,3 @@ def safe_vector_format(vec):
     if isinstance(vec, list):
         return vec
     raise ValueError("Unexpected vector format")
-
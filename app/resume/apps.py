@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ResumeConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app.resume'
+
+    def ready(self):
+        from app.resume import signals  # noqa: F401
@@ -0,0 +1,48 @@
+import time
+
+from django.db import transaction
+
+from app.jobrole.ingest import extract_sections, ingest_rows
+from app.resume.models import Resume
+from app.resume.serializers import ResumeSerializer
+from app.langchain_utils.store import iter_document_chunks, store_documents
+from app.langchain_utils.vectorstore import embedding_model
+
+RESUME_FIELDS = ("candidate_name", "content")
+
+
+def _ingest_batch(batch, timer, llm_workers):
+    relevant_texts = extract_sections([item["content"] for item in batch], timer, llm_workers)
+
+    start = time.perf_counter()
+    vectors = embedding_model.embed_documents([item["content"] for item in batch])
+    timer.record("embed", time.perf_counter() - start, len(batch))
+
+    resumes = []
+    for item, vector in zip(batch, vectors):
+        resume = Resume(candidate_name=item["candidate_name"], content=item["content"],
+                        metadata=item.get("metadata", {}))
+        resume.set_vector(vector)
+        resumes.append(resume)
+
+    # Rows are created first, so every chunk can carry the id of its resume. They only commit once
+    # the chunks are in the resume partition, so a failed index leaves no orphan rows
+    with transaction.atomic():
+        start = time.perf_counter()
+        resumes = Resume.objects.bulk_create(resumes)
+        timer.record("db", time.perf_counter() - start, len(batch))
+
+        start = time.perf_counter()
+        chunk_docs = (
+            doc
+            for resume, relevant_text in zip(resumes, relevant_texts)
+            for doc in iter_document_chunks(relevant_text, resume.index_metadata())
+        )
+        chunk_count = store_documents(chunk_docs)
+        timer.record("chunk_embed_index", time.perf_counter() - start, chunk_count)
+
+
+def ingest_resumes(rows, batch_size=64, llm_workers=4, max_errors=100):
+    """Ingests (line_number, row) pairs of resumes with the job description pipeline, into the resume partition."""
+    return ingest_rows(rows, ResumeSerializer, _ingest_batch, batch_size=batch_size, llm_workers=llm_workers,
+                       max_errors=max_errors, label="resumes")
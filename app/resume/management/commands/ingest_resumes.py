@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.jobrole.ingest import parse_job_description_stream, INGEST_FORMATS
+from app.resume.ingest import ingest_resumes, RESUME_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Bulk ingest resumes (candidate_name, content, metadata) from a JSONL or CSV file into the resume index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the input file, or - for stdin")
+        parser.add_argument("--format", choices=INGEST_FORMATS,
+                            help="Input format (defaults to the file extension)")
+        parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+        parser.add_argument("--llm-workers", type=int, default=settings.INGEST_LLM_WORKERS)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if fmt not in INGEST_FORMATS:
+            raise CommandError(f"Cannot infer format from '{path}', pass --format")
+
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+        try:
+            report = ingest_resumes(
+                parse_job_description_stream(stream, fmt, fields=RESUME_FIELDS),
+                batch_size=options["batch_size"],
+                llm_workers=options["llm_workers"],
+            )
+        except ValueError as exc:
+            raise CommandError(f"Could not parse {path}: {exc}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {report['stored']} resumes ({report['failed']} failed) in {report['total_seconds']}s"
+        ))
@@ -0,0 +1,47 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.resume.matching import prepare_run, execute_run
+
+
+class Command(BaseCommand):
+    help = ("Rank all active resumes against all active job roles and store the top matches of each job role. "
+            "Resumes an interrupted run and only rematches rows changed since the last completed run; "
+            "run one process per --shard to split the work.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shard", type=int, default=0, help="Job roles with id %% shards == shard")
+        parser.add_argument("--shards", type=int, default=1)
+        parser.add_argument("--top-k", type=int, default=settings.MATCHING_TOP_K, help="Resumes kept per job role")
+        parser.add_argument("--full", action="store_true", help="Rematch every pair instead of changed rows only")
+        parser.add_argument("--job-block", type=int, default=settings.MATCHING_JOB_BLOCK)
+        parser.add_argument("--resume-block", type=int, default=settings.MATCHING_RESUME_BLOCK)
+
+    def handle(self, *args, **options):
+        try:
+            run = prepare_run(shard=options["shard"], shards=options["shards"], top_k=options["top_k"],
+                              full=options["full"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        mode = "full" if run.since is None else f"changes since {run.since.isoformat()}"
+        resumed = f", resuming after job role {run.cursor}" if run.cursor else ""
+        self.stdout.write(f"Match run {run.id}: shard {run.shard}/{run.shards}, {mode}{resumed}")
+
+        def progress(current):
+            self.stdout.write(f"  job roles up to {current.cursor}: {current.job_roles_matched} matched, "
+                              f"{current.matches_written} matches written")
+
+        try:
+            run = execute_run(run, job_block=options["job_block"], resume_block=options["resume_block"],
+                              progress=progress)
+        except (RuntimeError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(json.dumps({
+            "run": run.id, "job_roles_matched": run.job_roles_matched, "matches_written": run.matches_written,
+            "seconds": round((run.finished - run.started).total_seconds(), 3),
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Match run {run.id} completed"))
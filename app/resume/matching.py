@@ -0,0 +1,263 @@
+"""
+Batch matching of all resumes against all active job roles.
+
+Embeddings are compared block by block: a block of job roles times a block of resumes is one
+matrix product, and only the running top_k resumes of each job role are kept, so memory stays
+bounded however many rows there are. Resume vectors are first copied into a memory-mapped
+matrix, so every job block streams over them without going back to the database.
+
+A run covers one shard of the job roles (id modulo shards), so several processes can share the
+work. Matches are written per job block together with the run's cursor, so an interrupted run
+resumes after the last written block. Once a shard has completed, the next run only rematches
+what changed since: job roles updated since are matched against every resume, and resumes
+updated since are merged into the stored top_k of every other job role. The merge is exact
+because the scores of all other pairs are unchanged.
+"""
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from app.jobrole.models import JobRole, decode_vector
+from app.langchain_utils.locks import file_lock
+from app.langchain_utils.vectorstore import EMBEDDING_MODEL_ID
+from app.resume.models import JobResumeMatch, MatchRun, Resume
+
+logger = logging.getLogger('django')
+
+
+def _normalized(embedding, dtype, legacy=None):
+    if embedding is not None:
+        vector = decode_vector(embedding, dtype).astype(np.float32)
+    elif legacy is not None:
+        vector = np.asarray(legacy, dtype=np.float32)
+    else:
+        return None
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _resume_matrix(queryset, path, batch_size=1000):
+    """Copies normalized resume embeddings into memory-mapped arrays at path; returns (ids, vectors)."""
+    rows = queryset.exclude(embedding__isnull=True).order_by("id").values_list("id", "embedding", "embedding_dtype")
+    total = rows.count()
+    ids = np.lib.format.open_memmap(f"{path}.ids.npy", mode="w+", dtype=np.int64, shape=(total,))
+    vectors, count = None, 0
+    for resume_id, embedding, dtype in rows.iterator(chunk_size=batch_size):
+        if count == total:
+            break  # inserted after count(); picked up by the next run
+        vector = _normalized(embedding, dtype)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(f"{path}.vectors.npy", mode="w+", dtype=np.float32,
+                                                shape=(total, len(vector)))
+        if len(vector) != vectors.shape[1]:
+            raise ValueError(f"Resume {resume_id} has a {len(vector)}-d embedding, expected {vectors.shape[1]}; "
+                             f"run reembed_vectorstore first")
+        ids[count] = resume_id
+        vectors[count] = vector
+        count += 1
+    return ids[:count], vectors[:count] if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+def _merge_top_k(best_scores, best_ids, scores, ids, k):
+    scores = np.concatenate([best_scores, scores], axis=1)
+    ids = np.concatenate([best_ids, np.broadcast_to(ids, scores[:, best_ids.shape[1]:].shape)], axis=1)
+    if scores.shape[1] > k:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores, ids = np.take_along_axis(scores, top, axis=1), np.take_along_axis(ids, top, axis=1)
+    return scores, ids
+
+
+def top_k_resumes(job_vectors, resume_ids, resume_vectors, k: int, block_size: int, best=None):
+    """
+    The k most similar resumes of each job vector as unsorted (scores, resume ids) arrays, with
+    similarities in [0, 1]. best continues from earlier (scores, ids); padding scores of -inf are dropped later.
+    """
+    if best is None:
+        best = (np.zeros((len(job_vectors), 0), dtype=np.float32), np.zeros((len(job_vectors), 0), dtype=np.int64))
+    scores, ids = best
+    for start in range(0, len(resume_ids), block_size):
+        block = slice(start, start + block_size)
+        similarities = np.clip((1 + job_vectors @ resume_vectors[block].T) / 2, 0, 1)
+        scores, ids = _merge_top_k(scores, ids, similarities, resume_ids[block], k)
+    return scores, ids
+
+
+def _ranked(job_ids, scores, ids):
+    """{job role id: [(resume id, score), ...] best first}."""
+    order = np.argsort(-scores, axis=1, kind="stable")
+    scores, ids = np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+    return {
+        int(job_id): [(int(resume_id), float(score)) for resume_id, score in zip(row_ids, row_scores)
+                      if np.isfinite(score)]
+        for job_id, row_scores, row_ids in zip(job_ids, scores, ids)
+    }
+
+
+def _stored_matches(job_ids, k):
+    """Stored matches of job roles as (scores, ids) arrays padded to k with -inf, and as ranked resume id lists."""
+    ranked = {int(job_id): [] for job_id in job_ids}
+    scores = np.full((len(job_ids), k), -np.inf, dtype=np.float32)
+    ids = np.full((len(job_ids), k), -1, dtype=np.int64)
+    positions = {job_id: position for position, job_id in enumerate(ranked)}
+    rows = JobResumeMatch.objects.filter(job_role_id__in=list(ranked), resume__is_active=True).order_by(
+        "job_role_id", "rank")
+    for job_id, resume_id, score in rows.values_list("job_role_id", "resume_id", "score"):
+        column = len(ranked[job_id])
+        ranked[job_id].append(resume_id)
+        if column < k:
+            scores[positions[job_id], column] = score
+            ids[positions[job_id], column] = resume_id
+    return (scores, ids), ranked
+
+
+def _shard_job_roles(run):
+    queryset = JobRole.objects.all()
+    if run.shards > 1:
+        queryset = queryset.annotate(shard=Mod("id", run.shards)).filter(shard=run.shard)
+    return queryset
+
+
+def _job_blocks(queryset, after: int, block_size: int):
+    """Yields (ids, normalized vectors) of active job roles with embeddings, in id order after the given id."""
+    queryset = queryset.filter(Q(embedding__isnull=False) | Q(embedding_vector__isnull=False), is_active=True)
+    while True:
+        rows = list(queryset.filter(id__gt=after).order_by("id").values_list(
+            "id", "embedding", "embedding_dtype", "embedding_vector")[:block_size])
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield (np.array([row[0] for row in rows], dtype=np.int64),
+               np.stack([_normalized(*row[1:]) for row in rows]))
+
+
+def _write_block(run, matches, cursor, computed_at):
+    with transaction.atomic():
+        JobResumeMatch.objects.filter(job_role_id__in=list(matches)).delete()
+        JobResumeMatch.objects.bulk_create([
+            JobResumeMatch(job_role_id=job_id, resume_id=resume_id, score=score, rank=rank,
+                           embedding_model=run.embedding_model, run=run, computed_at=computed_at)
+            for job_id, ranked in matches.items()
+            for rank, (resume_id, score) in enumerate(ranked, start=1)
+        ], batch_size=1000)
+        run.cursor = cursor
+        run.job_roles_matched += len(matches)
+        run.matches_written += sum(len(ranked) for ranked in matches.values())
+        run.save(update_fields=["cursor", "job_roles_matched", "matches_written", "updated"])
+
+
+def _match(run, scratch, job_block, resume_block, progress):
+    computed_at = timezone.now()
+    shard_job_roles = _shard_job_roles(run)
+    JobResumeMatch.objects.filter(job_role__in=shard_job_roles.filter(is_active=False)).delete()
+
+    if run.since is None:
+        rematch, new_ids, new_vectors = None, np.zeros(0, dtype=np.int64), None
+    else:
+        # Job roles that changed, and those holding a changed resume, which may have dropped out of their top_k.
+        # Resumes deactivated by a save no longer have matches and the job roles that held them were marked stale;
+        # those deactivated by a bulk update keep their matches until the job roles holding them are rematched
+        rematch = set(JobRole.objects.filter(updated__gte=run.since).values_list("id", flat=True))
+        rematch.update(JobResumeMatch.objects.filter(Q(resume__updated__gte=run.since) | Q(stale=True) |
+                                                     Q(resume__is_active=False))
+                       .values_list("job_role_id", flat=True).distinct())
+        new_ids, new_vectors = _resume_matrix(Resume.objects.filter(is_active=True, updated__gte=run.since),
+                                              os.path.join(scratch, "changed"))
+        if not rematch and not len(new_ids):
+            return
+
+    if rematch is None or rematch:
+        resume_ids, resume_vectors = _resume_matrix(Resume.objects.filter(is_active=True), os.path.join(scratch, "all"))
+    else:
+        resume_ids, resume_vectors = np.zeros(0, dtype=np.int64), None
+    for job_ids, job_vectors in _job_blocks(shard_job_roles, run.cursor, job_block):
+        for vectors in (resume_vectors, new_vectors):
+            if vectors is not None and len(vectors) and vectors.shape[1] != job_vectors.shape[1]:
+                raise ValueError(f"Job role embeddings have {job_vectors.shape[1]} dimensions and resume embeddings "
+                                 f"{vectors.shape[1]}; run reembed_vectorstore first")
+        full_rows = np.array([rematch is None or int(job_id) in rematch for job_id in job_ids])
+        matches = {}
+        if full_rows.any():
+            scores, ids = top_k_resumes(job_vectors[full_rows], resume_ids, resume_vectors, run.top_k, resume_block)
+            matches.update(_ranked(job_ids[full_rows], scores, ids))
+        if (~full_rows).any() and len(new_ids):
+            merge_ids = job_ids[~full_rows]
+            best, stored = _stored_matches(merge_ids, run.top_k)
+            scores, ids = top_k_resumes(job_vectors[~full_rows], new_ids, new_vectors, run.top_k, resume_block, best)
+            for job_id, ranked in _ranked(merge_ids, scores, ids).items():
+                if [resume_id for resume_id, _ in ranked] != stored[job_id]:
+                    matches[job_id] = ranked
+        _write_block(run, matches, int(job_ids[-1]), computed_at)
+        if progress:
+            progress(run)
+
+
+def prepare_run(shard: int = 0, shards: int = 1, top_k: int = None, full: bool = False) -> MatchRun:
+    """
+    The unfinished run of this shard to resume, or a new one. A new run is incremental from the
+    start of the last completed run with the same top_k and embedding model, unless full is set.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard must be in [0, {shards})")
+    top_k = top_k or settings.MATCHING_TOP_K
+    runs = MatchRun.objects.filter(shard=shard, shards=shards, top_k=top_k, embedding_model=EMBEDDING_MODEL_ID)
+    last_completed = runs.filter(status=MatchRun.STATUS_COMPLETED).order_by("-id").first()
+    if not full:
+        unfinished = runs.exclude(status=MatchRun.STATUS_COMPLETED).filter(
+            id__gt=last_completed.id if last_completed else 0).order_by("-id").first()
+        if unfinished is not None:
+            return unfinished
+    return MatchRun.objects.create(
+        shard=shard, shards=shards, top_k=top_k, embedding_model=EMBEDDING_MODEL_ID,
+        since=None if full or last_completed is None else last_completed.started,
+    )
+
+
+def execute_run(run: MatchRun, job_block: int = None, resume_block: int = None, progress=None) -> MatchRun:
+    """Matches the shard of run from its cursor on. Raises RuntimeError when another process is matching the shard."""
+    os.makedirs(settings.MATCHING_WORK_DIR, exist_ok=True)
+    lock_path = os.path.join(settings.MATCHING_WORK_DIR, f"shard-{run.shard}-of-{run.shards}.lock")
+    with file_lock(lock_path, blocking=False) as acquired:
+        if not acquired:
+            raise RuntimeError(f"Shard {run.shard} of {run.shards} is being matched by another process")
+        run.status, run.error = MatchRun.STATUS_RUNNING, ""
+        run.save(update_fields=["status", "error", "updated"])
+        try:
+            with tempfile.TemporaryDirectory(dir=settings.MATCHING_WORK_DIR) as scratch:
+                _match(run, scratch, job_block or settings.MATCHING_JOB_BLOCK,
+                       resume_block or settings.MATCHING_RESUME_BLOCK, progress)
+        except Exception as exc:
+            run.status, run.error = MatchRun.STATUS_FAILED, f"{type(exc).__name__}: {exc}"
+            run.save(update_fields=["status", "error", "updated"])
+            raise
+        run.status, run.finished = MatchRun.STATUS_COMPLETED, timezone.now()
+        run.save(update_fields=["status", "finished", "updated"])
+    logger.info(f"Match run {run.id} (shard {run.shard}/{run.shards}) wrote {run.matches_written} matches "
+                f"for {run.job_roles_matched} job roles")
+    return run
+
+
+def _execute_in_background(run_id):
+    try:
+        execute_run(MatchRun.objects.get(id=run_id))
+    except Exception:
+        logger.error(f"Match run {run_id} failed", exc_info=True)
+    finally:
+        connections.close_all()
+
+
+def start_matching(shard: int = 0, shards: int = 1, top_k: int = None, full: bool = False) -> MatchRun:
+    """
+    Prepares a run and executes it on a background thread; returns the run to poll. A run cut
+    short by a worker restart is resumed by the next start_matching or match_resumes_to_jobs.
+    """
+    run = prepare_run(shard=shard, shards=shards, top_k=top_k, full=full)
+    threading.Thread(target=_execute_in_background, args=(run.id,), name=f"match-run-{run.id}", daemon=True).start()
+    return run
@@ -0,0 +1,80 @@
+from django.db import models
+
+from app.jobrole.models import JobRole, vector_fields, decode_vector
+
+
+class Resume(models.Model):
+    """ Model: Candidate resume, indexed in the resume partition of the vectorstore """
+
+    candidate_name = models.CharField(max_length=255)
+    content = models.TextField()
+    metadata = models.JSONField(default=dict, blank=True)
+    # Embedding of the full resume, stored like JobRole.embedding
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dtype = models.CharField(max_length=8, default="float32")
+
+    # Additional fields
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    is_active = models.BooleanField(default=True)
+
+    @property
+    def vector(self):
+        return decode_vector(self.embedding, self.embedding_dtype) if self.embedding is not None else None
+
+    def set_vector(self, vector, dtype: str = None):
+        fields = vector_fields(vector, dtype)
+        self.embedding = fields["embedding"]
+        self.embedding_dtype = fields["embedding_dtype"]
+
+    def index_metadata(self):
+        """Metadata of this resume's chunks in the vectorstore."""
+        return {**self.metadata, "type": "resume", "resume_id": self.id, "candidate_name": self.candidate_name}
+
+
+class MatchRun(models.Model):
+    """ Model: Progress of one shard of a batch matching run; the cursor makes it resumable """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [(status, status) for status in (STATUS_PENDING, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED)]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    shard = models.PositiveIntegerField(default=0)
+    shards = models.PositiveIntegerField(default=1)
+    top_k = models.PositiveIntegerField()
+    embedding_model = models.CharField(max_length=255)
+    # Start of the last completed run of this shard; only rows changed since are rematched. Null matches everything
+    since = models.DateTimeField(null=True, blank=True)
+    # Highest JobRole id whose matches are written
+    cursor = models.BigIntegerField(default=0)
+    job_roles_matched = models.PositiveIntegerField(default=0)
+    matches_written = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    started = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+
+class JobResumeMatch(models.Model):
+    """ Model: One of the top resumes of a job role, written by the batch matcher """
+
+    job_role = models.ForeignKey(JobRole, on_delete=models.CASCADE, related_name="resume_matches")
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name="job_matches")
+    # Cosine similarity of the full-text embeddings mapped to [0, 1], like search scores
+    score = models.FloatField()
+    # 1 is the best resume for the job role
+    rank = models.PositiveIntegerField()
+    # Version of the score: the model that embedded both sides and the run that computed it
+    embedding_model = models.CharField(max_length=255)
+    run = models.ForeignKey(MatchRun, on_delete=models.SET_NULL, null=True, blank=True, related_name="matches")
+    computed_at = models.DateTimeField()
+    # Set when the job role or resume changed after computed_at; served until the next run rematches it
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("job_role", "resume")
+        indexes = [models.Index(fields=["job_role", "rank"])]
@@ -0,0 +1,45 @@
+from rest_framework import serializers
+
+from app.resume.models import JobResumeMatch, MatchRun, Resume
+
+
+class ResumeSerializer(serializers.ModelSerializer):
+    """ Serializer: Resume; the embedding is set by the caller through serializer.save() """
+
+    metadata = serializers.DictField(required=False, default=dict)
+
+    class Meta:
+        model = Resume
+        fields = ('id', 'candidate_name', 'content', 'metadata')
+        read_only_fields = ('id',)
+
+    def validate_candidate_name(self, value):
+        if not value.strip():
+            raise serializers.ValidationError("Candidate name cannot be empty.")
+        return value
+
+    def validate_content(self, value):
+        if len(value.strip()) < 100:
+            raise serializers.ValidationError("Resume must be at least 100 characters.")
+        return value
+
+
+class MatchRunSerializer(serializers.ModelSerializer):
+    """ Serializer: Progress of a batch matching run """
+
+    class Meta:
+        model = MatchRun
+        fields = ('id', 'status', 'shard', 'shards', 'top_k', 'embedding_model', 'since', 'cursor',
+                  'job_roles_matched', 'matches_written', 'error', 'started', 'updated', 'finished')
+        read_only_fields = fields
+
+
+class JobResumeMatchSerializer(serializers.ModelSerializer):
+    """ Serializer: Stored match of a job role with a resume """
+
+    candidate_name = serializers.CharField(source='resume.candidate_name', read_only=True)
+
+    class Meta:
+        model = JobResumeMatch
+        fields = ('rank', 'score', 'resume', 'candidate_name', 'stale', 'embedding_model', 'run', 'computed_at')
+        read_only_fields = fields
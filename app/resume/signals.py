@@ -0,0 +1,48 @@
+"""
+Incremental invalidation of stored matches.
+
+Saving a job role or resume marks its stored matches stale, or deletes them when it is
+deactivated, so reads never serve a match for an inactive row. The next match run rematches
+exactly those rows, because they were updated after its start. Matches of another embedding
+model are not served at all (see JobRoleMatchesApiView).
+
+Bulk queryset updates bypass these signals and leave `updated` as it was. Matches of rows
+deactivated that way are still never served and are rematched by the next run, which filters
+on is_active; embeddings changed in bulk are only picked up by a full run.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from app.jobrole.models import JobRole
+from app.resume.models import JobResumeMatch, Resume
+
+# Fields a match score depends on; saves limited to other fields keep the matches
+MATCHED_FIELDS = {"embedding", "embedding_vector", "embedding_dtype", "is_active"}
+
+
+def _affects_matches(created, update_fields):
+    return not created and (update_fields is None or bool(MATCHED_FIELDS & set(update_fields)))
+
+
+@receiver(post_save, sender=JobRole, dispatch_uid="invalidate_job_role_matches")
+def invalidate_job_role_matches(sender, instance, created, update_fields=None, **kwargs):
+    if not _affects_matches(created, update_fields):
+        return
+    matches = JobResumeMatch.objects.filter(job_role_id=instance.id)
+    if instance.is_active:
+        matches.filter(stale=False).update(stale=True)
+    else:
+        matches.delete()
+
+
+@receiver(post_save, sender=Resume, dispatch_uid="invalidate_resume_matches")
+def invalidate_resume_matches(sender, instance, created, update_fields=None, **kwargs):
+    if not _affects_matches(created, update_fields):
+        return
+    matches = JobResumeMatch.objects.filter(resume_id=instance.id)
+    if instance.is_active:
+        matches.filter(stale=False).update(stale=True)
+        return
+    # The job roles it is removed from have a gap in their ranking until rematched
+    JobResumeMatch.objects.filter(job_role_id__in=matches.values("job_role_id"), stale=False).update(stale=True)
+    matches.delete()
@@ -0,0 +1,156 @@
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from app.jobrole.models import JobRole, vector_fields
+from app.langchain_utils.vectorstore import EMBEDDING_MODEL_ID
+from app.resume import ingest
+from app.resume.matching import _merge_top_k, execute_run, prepare_run, top_k_resumes
+from app.resume.models import JobResumeMatch, Resume
+from app.resume.views import JobRoleMatchesApiView
+
+
+def _unit_vectors(rng, count, dimension=8):
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TopKResumesTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.job_vectors = _unit_vectors(rng, 6)
+        self.resume_vectors = _unit_vectors(rng, 53)
+        self.resume_ids = np.arange(100, 153, dtype=np.int64)
+
+    def _brute_force(self, k):
+        similarities = np.clip((1 + self.job_vectors @ self.resume_vectors.T) / 2, 0, 1)
+        order = np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(similarities, order, axis=1), self.resume_ids[order]
+
+    def _assert_matches_brute_force(self, scores, ids, k):
+        expected_scores, expected_ids = self._brute_force(k)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        np.testing.assert_allclose(np.take_along_axis(scores, order, axis=1), expected_scores, rtol=1e-6)
+        np.testing.assert_array_equal(np.take_along_axis(ids, order, axis=1), expected_ids)
+
+    def test_blocks_match_brute_force(self):
+        for k, block_size in [(1, 7), (5, 10), (5, 53), (5, 1000)]:
+            with self.subTest(k=k, block_size=block_size):
+                scores, ids = top_k_resumes(self.job_vectors, self.resume_ids, self.resume_vectors, k, block_size)
+                self._assert_matches_brute_force(scores, ids, k)
+
+    def test_continuing_from_best_matches_one_pass(self):
+        best = top_k_resumes(self.job_vectors, self.resume_ids[:20], self.resume_vectors[:20], 5, 8)
+        scores, ids = top_k_resumes(self.job_vectors, self.resume_ids[20:], self.resume_vectors[20:], 5, 8, best=best)
+        self._assert_matches_brute_force(scores, ids, 5)
+
+    def test_merge_keeps_fewer_than_k_until_enough_arrive(self):
+        empty = (np.zeros((1, 0), dtype=np.float32), np.zeros((1, 0), dtype=np.int64))
+        scores, ids = _merge_top_k(*empty, np.array([[0.2, 0.9]], dtype=np.float32), np.array([1, 2]), 3)
+        self.assertEqual(sorted(ids[0].tolist()), [1, 2])
+
+        scores, ids = _merge_top_k(scores, ids, np.array([[0.5, 0.1]], dtype=np.float32), np.array([3, 4]), 3)
+        self.assertEqual(sorted(ids[0].tolist()), [1, 2, 3])
+        self.assertEqual(sorted(scores[0].tolist()), sorted(np.float32([0.2, 0.9, 0.5]).tolist()))
+
+
+class StaleMatchInvalidationTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.job_role = JobRole.objects.create(title="Engineer", description="Builds things",
+                                               **vector_fields(_unit_vectors(rng, 1)[0]))
+        self.resumes = []
+        for name in ("Ann", "Bo"):
+            resume = Resume(candidate_name=name, content="Resume text")
+            resume.set_vector(_unit_vectors(rng, 1)[0])
+            resume.save()
+            self.resumes.append(resume)
+        for rank, resume in enumerate(self.resumes, start=1):
+            JobResumeMatch.objects.create(job_role=self.job_role, resume=resume, score=1 - rank / 10, rank=rank,
+                                          embedding_model=EMBEDDING_MODEL_ID, computed_at=timezone.now())
+
+    def _stale(self):
+        return dict(JobResumeMatch.objects.values_list("resume__candidate_name", "stale"))
+
+    def _served(self):
+        request = APIRequestFactory().get(f"/api/resume/job-roles/{self.job_role.id}/matches")
+        response = JobRoleMatchesApiView.as_view()(request, job_role_id=self.job_role.id)
+        return [match["resume"] for match in response.data["results"]["matches"]]
+
+    def test_saving_unrelated_fields_keeps_matches(self):
+        self.job_role.title = "Senior Engineer"
+        self.job_role.save(update_fields=["title"])
+        self.assertEqual(self._stale(), {"Ann": False, "Bo": False})
+
+    def test_new_embedding_marks_matches_stale(self):
+        self.job_role.__dict__.update(vector_fields(_unit_vectors(np.random.default_rng(4), 1)[0]))
+        self.job_role.save()
+        self.assertEqual(self._stale(), {"Ann": True, "Bo": True})
+
+    def test_deactivated_job_role_drops_its_matches(self):
+        self.job_role.is_active = False
+        self.job_role.save(update_fields=["is_active"])
+        self.assertFalse(JobResumeMatch.objects.exists())
+
+    def test_deactivated_resume_leaves_a_stale_ranking(self):
+        self.resumes[0].is_active = False
+        self.resumes[0].save(update_fields=["is_active"])
+        self.assertEqual(self._stale(), {"Bo": True})
+
+    def test_resume_deactivated_in_bulk_is_not_served(self):
+        Resume.objects.filter(id=self.resumes[0].id).update(is_active=False)
+        self.assertEqual(self._served(), [self.resumes[1].id])
+
+    def test_resume_deactivated_in_bulk_is_rematched_by_an_incremental_run(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        with override_settings(MATCHING_WORK_DIR=work_dir):
+            execute_run(prepare_run(top_k=2, full=True))
+            Resume.objects.filter(id=self.resumes[0].id).update(is_active=False)
+
+            run = execute_run(prepare_run(top_k=2))
+
+        self.assertIsNotNone(run.since)
+        self.assertEqual(list(JobResumeMatch.objects.values_list("resume_id", "rank")), [(self.resumes[1].id, 1)])
+
+
+class IngestResumesTests(TestCase):
+    ROWS = [(1, {"candidate_name": "Ann", "content": "Python developer. " * 10}),
+            (2, {"candidate_name": "Bo", "content": "React developer. " * 10})]
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        embeddings = mock.Mock(embed_documents=lambda texts: _unit_vectors(rng, len(texts)).tolist())
+        for target, value in (("extract_sections", lambda texts, timer, llm_workers: texts),
+                              ("embedding_model", embeddings)):
+            patcher = mock.patch.object(ingest, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_chunks_carry_the_ids_of_their_resumes(self):
+        stored = []
+
+        def store_documents(docs):
+            stored.extend(docs)
+            return len(stored)
+
+        with mock.patch.object(ingest, "store_documents", store_documents):
+            report = ingest.ingest_resumes(iter(self.ROWS))
+
+        self.assertEqual(report["stored"], 2)
+        self.assertEqual({doc.metadata["resume_id"] for doc in stored},
+                         set(Resume.objects.values_list("id", flat=True)))
+
+    def test_failed_index_rolls_the_batch_back(self):
+        with mock.patch.object(ingest, "store_documents", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                ingest.ingest_resumes(iter(self.ROWS))
+
+        self.assertFalse(Resume.objects.exists())
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from app.resume.views import StoreResumeApiView, StoreResumeBulkApiView, MatchRunApiView, MatchRunStatusApiView, \
+    JobRoleMatchesApiView
+
+urlpatterns = [
+
+    path('store-resume', StoreResumeApiView.as_view(), name='store-resume'),
+    path('store-resume-bulk', StoreResumeBulkApiView.as_view(), name='store-resume-bulk'),
+    path('match-runs', MatchRunApiView.as_view(), name='match-runs'),
+    path('match-runs/<int:run_id>', MatchRunStatusApiView.as_view(), name='match-run-status'),
+    path('job-roles/<int:job_role_id>/matches', JobRoleMatchesApiView.as_view(), name='job-role-matches'),
+
+]
@@ -0,0 +1,169 @@
+import io
+
+from django.conf import settings
+from django.db import transaction
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser, MultiPartParser
+
+from app.global_constants import ErrorMessage, SuccessMessage
+from app.jobrole.models import JobRole
+from app.jobrole.utils import extract_relevant_sections_with_llm
+from app.jobrole.ingest import parse_job_description_stream, INGEST_FORMATS
+from app.resume.ingest import ingest_resumes, RESUME_FIELDS
+from app.resume.matching import start_matching
+from app.resume.models import JobResumeMatch, MatchRun
+from app.resume.serializers import ResumeSerializer, MatchRunSerializer, JobResumeMatchSerializer
+from app.langchain_utils.store import store_resume
+from app.langchain_utils.vectorstore import embedding_model, EMBEDDING_MODEL_ID
+from app.utils import get_response_schema
+
+
+class StoreResumeApiView(GenericAPIView):
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "candidate_name": openapi.Schema(type=openapi.TYPE_STRING, description="Candidate name"),
+                "content": openapi.Schema(type=openapi.TYPE_STRING, description="Full resume text"),
+                "metadata": openapi.Schema(type=openapi.TYPE_OBJECT, description="Optional metadata (e.g., location)")
+            },
+            required=["candidate_name", "content"]
+        )
+    )
+    def post(self, request):
+        serializer = ResumeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return get_response_schema(serializer.errors, "Validation failed", status.HTTP_400_BAD_REQUEST)
+
+        content = serializer.validated_data["content"]
+        relevant_text = extract_relevant_sections_with_llm(content)
+        vector = embedding_model.embed_query(content)
+
+        # The row only commits once its chunks are in the resume partition, so a failed index leaves no orphan row
+        with transaction.atomic():
+            resume = serializer.save()
+            resume.set_vector(vector)
+            resume.save(update_fields=["embedding", "embedding_dtype", "updated"])
+            store_resume(resume.content, resume.index_metadata(), relevant_text=relevant_text)
+        return get_response_schema(serializer.data, "Resume stored successfully", status.HTTP_201_CREATED)
+
+
+class StoreResumeBulkApiView(GenericAPIView):
+    parser_classes = [MultiPartParser, JSONParser]
+
+    @swagger_auto_schema(
+        operation_description="Upload a JSONL or CSV file of resumes (candidate_name, content, metadata), "
+                              "or send a JSON body with an `items` list.",
+        manual_parameters=[
+            openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, description="JSONL or CSV file"),
+            openapi.Parameter("format", openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(INGEST_FORMATS),
+                              default="jsonl"),
+            openapi.Parameter("batch_size", openapi.IN_FORM, type=openapi.TYPE_INTEGER,
+                              default=settings.INGEST_BATCH_SIZE),
+        ]
+    )
+    def post(self, request):
+        batch_size = int(request.data.get("batch_size", settings.INGEST_BATCH_SIZE))
+        upload = request.FILES.get("file")
+
+        if upload:
+            fmt = request.data.get("format", "jsonl")
+            if fmt not in INGEST_FORMATS:
+                return get_response_schema({}, f"Format must be one of {', '.join(INGEST_FORMATS)}",
+                                           status.HTTP_400_BAD_REQUEST)
+            rows = parse_job_description_stream(io.TextIOWrapper(upload.file, encoding="utf-8", newline=""), fmt,
+                                                fields=RESUME_FIELDS)
+        elif isinstance(request.data.get("items"), list):
+            rows = enumerate(request.data["items"], start=1)
+        else:
+            return get_response_schema({}, "A file or an items list is required", status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = ingest_resumes(rows, batch_size=batch_size, llm_workers=settings.INGEST_LLM_WORKERS)
+        except ValueError as exc:
+            return get_response_schema({}, f"Could not parse upload: {exc}", status.HTTP_400_BAD_REQUEST)
+
+        return get_response_schema(report, f"{report['stored']} resumes stored", status.HTTP_201_CREATED)
+
+
+class MatchRunApiView(GenericAPIView):
+
+    @swagger_auto_schema(
+        operation_description="Start (or resume) a batch matching run of all resumes against all active job roles "
+                              "in the background. Poll match-runs/<id> for its progress.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "shard": openapi.Schema(type=openapi.TYPE_INTEGER, default=0),
+                "shards": openapi.Schema(type=openapi.TYPE_INTEGER, default=1),
+                "top_k": openapi.Schema(type=openapi.TYPE_INTEGER, default=settings.MATCHING_TOP_K),
+                "full": openapi.Schema(type=openapi.TYPE_BOOLEAN, default=False,
+                                       description="Rematch every pair instead of changed rows only"),
+            }
+        )
+    )
+    def post(self, request):
+        try:
+            run = start_matching(shard=int(request.data.get("shard", 0)), shards=int(request.data.get("shards", 1)),
+                                 top_k=int(request.data.get("top_k", settings.MATCHING_TOP_K)),
+                                 full=request.data.get("full") in (True, "true", "1"))
+        except ValueError as exc:
+            return get_response_schema({}, str(exc), status.HTTP_400_BAD_REQUEST)
+        return get_response_schema(MatchRunSerializer(run).data, "Match run started", status.HTTP_202_ACCEPTED)
+
+
+class MatchRunStatusApiView(GenericAPIView):
+
+    def get(self, request, run_id):
+        run = MatchRun.objects.filter(id=run_id).first()
+        if run is None:
+            return get_response_schema({}, ErrorMessage.NOT_FOUND.value, status.HTTP_404_NOT_FOUND)
+        return get_response_schema(MatchRunSerializer(run).data, SuccessMessage.RECORD_RETRIEVED.value,
+                                   status.HTTP_200_OK)
+
+
+class MatchPagination(PageNumberPagination):
+    page_size = settings.MATCHING_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.MATCHING_MAX_PAGE_SIZE
+
+
+class JobRoleMatchesApiView(GenericAPIView):
+    serializer_class = JobResumeMatchSerializer
+    pagination_class = MatchPagination
+
+    @swagger_auto_schema(
+        operation_description="Stored top resumes of a job role, best first, as written by the last match run. "
+                              "`stale` is set when the job role or a listed resume changed since, or the matches "
+                              "were computed with another embedding model.",
+        manual_parameters=[
+            openapi.Parameter("page", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=1),
+            openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              default=settings.MATCHING_PAGE_SIZE),
+        ]
+    )
+    def get(self, request, job_role_id):
+        if not JobRole.objects.filter(id=job_role_id, is_active=True).exists():
+            return get_response_schema({}, ErrorMessage.NOT_FOUND.value, status.HTTP_404_NOT_FOUND)
+
+        # Resumes deactivated by a bulk update, which sends no signal, may still have stored matches
+        matches = JobResumeMatch.objects.filter(job_role_id=job_role_id, resume__is_active=True)
+        # Scores of another embedding model are not comparable with current ones, so they are not served
+        current = matches.filter(embedding_model=EMBEDDING_MODEL_ID)
+        page = self.paginate_queryset(current.select_related("resume").order_by("rank"))
+
+        results = {
+            "job_role_id": job_role_id,
+            "count": self.paginator.page.paginator.count,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+            "stale": current.filter(stale=True).exists() or
+                     matches.exclude(embedding_model=EMBEDDING_MODEL_ID).exists(),
+            "matches": self.get_serializer(page, many=True).data,
+        }
+        return get_response_schema(results, SuccessMessage.RECORD_RETRIEVED.value, status.HTTP_200_OK)
@@ -57,6 +57,7 @@ INSTALLED_APPS = [
     'app.user',
     'app.role',
     'app.jobrole',
+    'app.resume',
 
 
 ]
@@ -269,4 +270,125 @@ LOGGING = {
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
+
+# Vector store
+# Seconds between checks of the on-disk index version marker
+VECTORSTORE_RELOAD_CHECK_SECONDS = float(os.getenv('VECTORSTORE_RELOAD_CHECK_SECONDS', 1))
+# Number of pending append-only segments that triggers a background compaction
+VECTORSTORE_COMPACT_SEGMENTS = int(os.getenv('VECTORSTORE_COMPACT_SEGMENTS', 20))
+# Map compacted index generations read-only so workers share their pages instead of each holding a copy
+VECTORSTORE_MMAP = os.getenv('VECTORSTORE_MMAP', 'true').lower() == 'true'
+# Default recall/speed knobs for approximate indexes (see the rebuild_vectorstore command)
+VECTORSTORE_NPROBE = int(os.getenv('VECTORSTORE_NPROBE', 16))
+VECTORSTORE_EF_SEARCH = int(os.getenv('VECTORSTORE_EF_SEARCH', 64))
+# Metric of newly created indexes: "cosine" (inner product over normalized vectors) or "l2"
+VECTORSTORE_METRIC = os.getenv('VECTORSTORE_METRIC', 'cosine')
+
+# Storage type of JobRole.embedding: "float32", or "float16" for half the size at ~3 significant digits
+JOBROLE_EMBEDDING_DTYPE = os.getenv('JOBROLE_EMBEDDING_DTYPE', 'float32')
+# Memory-mapped mirror of JobRole embeddings used when the FAISS index is unavailable
+JOBROLE_MATRIX_PATH = os.getenv('JOBROLE_MATRIX_PATH', 'vectorstore/jobrole_matrix')
+# Seconds between incremental syncs of the mirror from JobRole.updated
+JOBROLE_MATRIX_SYNC_SECONDS = float(os.getenv('JOBROLE_MATRIX_SYNC_SECONDS', 5))
+# Sync the mirror from a background thread of serving processes; turn off when sync_jobrole_matrix --watch runs
+JOBROLE_MATRIX_BACKGROUND_SYNC = os.getenv('JOBROLE_MATRIX_BACKGROUND_SYNC', 'true').lower() == 'true'
+
+# Bulk ingestion
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 64))
+# Concurrent LLM extraction calls per ingestion batch
+INGEST_LLM_WORKERS = int(os.getenv('INGEST_LLM_WORKERS', 4))
+# Background ingestion queue (run_ingest_worker): jobs committed to the index per batch, polling interval of
+# idle workers, and seconds before a job claimed by a worker that died is handed to another one
+INGEST_QUEUE_BATCH_SIZE = int(os.getenv('INGEST_QUEUE_BATCH_SIZE', 32))
+INGEST_QUEUE_POLL_SECONDS = float(os.getenv('INGEST_QUEUE_POLL_SECONDS', 1))
+INGEST_QUEUE_LEASE_SECONDS = float(os.getenv('INGEST_QUEUE_LEASE_SECONDS', 600))
+# Attempts per job, retried with exponential backoff and full jitter
+INGEST_QUEUE_MAX_ATTEMPTS = int(os.getenv('INGEST_QUEUE_MAX_ATTEMPTS', 5))
+INGEST_QUEUE_BACKOFF_BASE_SECONDS = float(os.getenv('INGEST_QUEUE_BACKOFF_BASE_SECONDS', 5))
+INGEST_QUEUE_BACKOFF_MAX_SECONDS = float(os.getenv('INGEST_QUEUE_BACKOFF_MAX_SECONDS', 600))
+# Concurrency limits per stage across the threads of one worker: LLM calls, embedding batches and index commits
+INGEST_QUEUE_LLM_CONCURRENCY = int(os.getenv('INGEST_QUEUE_LLM_CONCURRENCY', 4))
+INGEST_QUEUE_EMBED_CONCURRENCY = int(os.getenv('INGEST_QUEUE_EMBED_CONCURRENCY', 1))
+INGEST_QUEUE_INDEX_CONCURRENCY = int(os.getenv('INGEST_QUEUE_INDEX_CONCURRENCY', 1))
+# Also process queued jobs on a thread of each web process, for deployments without a separate worker
+INGEST_QUEUE_LOCAL_WORKER = os.getenv('INGEST_QUEUE_LOCAL_WORKER', 'false').lower() == 'true'
+
+# Batch matching of resumes against job roles: resumes kept per job role, and job roles and resumes per
+# block of the score matrix (peak memory is about 4 bytes x job block x (resume block + top_k) per process)
+MATCHING_TOP_K = int(os.getenv('MATCHING_TOP_K', 100))
+MATCHING_JOB_BLOCK = int(os.getenv('MATCHING_JOB_BLOCK', 256))
+MATCHING_RESUME_BLOCK = int(os.getenv('MATCHING_RESUME_BLOCK', 8192))
+# Scratch space for the memory-mapped resume matrix and per-shard locks
+MATCHING_WORK_DIR = os.getenv('MATCHING_WORK_DIR', 'vectorstore/matching')
+# Default and largest page of stored matches served per request
+MATCHING_PAGE_SIZE = int(os.getenv('MATCHING_PAGE_SIZE', 20))
+MATCHING_MAX_PAGE_SIZE = int(os.getenv('MATCHING_MAX_PAGE_SIZE', 100))
+
+# Chunking: token budget per chunk including special tokens (the embedding model's max sequence length,
+# 384 for all-mpnet-base-v2) and tokens repeated between consecutive chunks of a section
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 384))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 32))
+# Chunks per embedding call while streaming chunks into the model
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+
+# Embedding cache (in-memory LRU in front of SQLite); an empty path disables the disk tier
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'vectorstore/embedding_cache.sqlite3')
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MEMORY_ENTRIES', 10000))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv('EMBEDDING_CACHE_DISK_ENTRIES', 200000))
+# Load the embedding model and vectorstore when the WSGI/ASGI application starts instead of on first use
+EMBEDDING_PRELOAD = os.getenv('EMBEDDING_PRELOAD', 'false').lower() == 'true'
+# Unix socket of the run_embedding_server process; empty embeds in-process
+EMBEDDING_SERVER_SOCKET = os.getenv('EMBEDDING_SERVER_SOCKET', '')
+EMBEDDING_SERVER_TIMEOUT_SECONDS = float(os.getenv('EMBEDDING_SERVER_TIMEOUT_SECONDS', 30))
+# Micro-batching window of the embedding server: flush at this many texts or after this many milliseconds
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv('EMBEDDING_SERVER_MAX_BATCH', 64))
+EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv('EMBEDDING_SERVER_MAX_WAIT_MS', 5))
+# Intra-op torch threads for the embedding model (0 keeps the torch default of one per core)
+EMBEDDING_TORCH_THREADS = int(os.getenv('EMBEDDING_TORCH_THREADS', 0))
+# Embedding backend: torch, onnx or onnx_int8 (exported by export_embedding_model). Changing the backend or
+# model changes the vectors, so run reembed_vectorstore with the new values before deploying them
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-mpnet-base-v2')
+EMBEDDING_ONNX_DIR = os.getenv('EMBEDDING_ONNX_DIR', 'vectorstore/onnx')
+
+# LLM
+LLM_MODEL = os.getenv('LLM_MODEL', 'openai/gpt-oss-20b')
+# "groq" for the hosted API or "stub" for the offline echo client used in tests
+LLM_CLIENT = os.getenv('LLM_CLIENT', 'groq')
+# LLM result cache (TTL + LRU, persisted to SQLite); an empty path keeps it in memory only
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'cache/llm_results.sqlite3')
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 2000))
+# Pooled provider client
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 30))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv('LLM_CONNECT_TIMEOUT_SECONDS', 5))
+# Retry with exponential backoff and full jitter
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv('LLM_BACKOFF_BASE_SECONDS', 0.5))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv('LLM_BACKOFF_MAX_SECONDS', 8))
+# Circuit breaker: consecutive failures before opening, and seconds before a trial call
+LLM_CIRCUIT_FAILURES = int(os.getenv('LLM_CIRCUIT_FAILURES', 5))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', 30))
+
+# Threads shared by all resume searches for overlapping LLM, embedding and search stages
+RESUME_PIPELINE_WORKERS = int(os.getenv('RESUME_PIPELINE_WORKERS', 8))
+# Threads for CPU-bound embedding and FAISS work offloaded from async views
+ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', os.cpu_count() or 2))
+
+# Hybrid search: weight of vector similarity against BM25, and the fusion method ("rrf" or "weighted")
+HYBRID_SEARCH_ALPHA = float(os.getenv('HYBRID_SEARCH_ALPHA', 0.5))
+HYBRID_SEARCH_FUSION = os.getenv('HYBRID_SEARCH_FUSION', 'rrf')
+
+# Document ranking: chunk scores are aggregated per job/resume (max, mean, top_m_mean, softmax)
+SEARCH_AGGREGATION = os.getenv('SEARCH_AGGREGATION', 'top_m_mean')
+SEARCH_AGGREGATION_TOP_M = int(os.getenv('SEARCH_AGGREGATION_TOP_M', 3))
+# Relative to the best chunk score of the query; lower leans harder towards max
+SEARCH_SOFTMAX_TEMPERATURE = float(os.getenv('SEARCH_SOFTMAX_TEMPERATURE', 0.1))
+# Chunks retrieved per requested result before aggregation
+SEARCH_CHUNKS_PER_RESULT = int(os.getenv('SEARCH_CHUNKS_PER_RESULT', 10))
+# Minimum chunk similarity in [0, 1] for resume search; 0.7 matches the former L2 cut-off of 1.2 on unit-length
+# embeddings. Recalibrate with the calibrate_search_threshold command
+SEARCH_SCORE_THRESHOLD = float(os.getenv('SEARCH_SCORE_THRESHOLD', 0.7))
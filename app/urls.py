@@ -43,6 +43,7 @@ urlpatterns = [
     # App URLs
     path('api/user/', include('app.user.urls')),
     path('api/jobrole/', include('app.jobrole.urls')),
+    path('api/resume/', include('app.resume.urls')),
 ]
 
 if settings.DEBUG:
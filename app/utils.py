@@ -1,3 +1,7 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
 from rest_framework.response import Response
 
 
@@ -14,3 +18,28 @@ def get_response_schema(schema, message, status_code):
     )
 
 
+def get_json_response_schema(schema, message, status_code):
+    """Utility: Standard response structure for plain Django (async) views"""
+
+    return JsonResponse(
+        {
+            "message": message,
+            "status": status_code,
+            "results": schema,
+        },
+        status=status_code,
+    )
+
+
+def get_event_response_schema(event, schema, message, status_code):
+    """Utility: Standard response structure as one Server-Sent Event"""
+
+    payload = json.dumps(
+        {
+            "message": message,
+            "status": status_code,
+            "results": schema,
+        },
+        cls=DjangoJSONEncoder,
+    )
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Serving processes load the embedding model before the first request (with gunicorn --preload,
+# once in the master so forked workers share its pages); management commands keep loading it lazily
+if settings.EMBEDDING_PRELOAD:
+    from app.langchain_utils.vectorstore import preload
+
+    preload()